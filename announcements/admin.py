@@ -1,5 +1,7 @@
+from django import forms
 from django.contrib import admin
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.urls import path
 from django.conf import settings
 import os, datetime, tempfile
 
@@ -14,7 +16,9 @@ from reportlab.lib.enums import TA_JUSTIFY, TA_CENTER
 from PIL import Image as PILImage, ImageDraw
 
 from .models import Announcement, DisciplinaryMessage
+from .recipients import preview_audience
 from teachers.models import Teacher
+from students.models import Student
 from core.sms_utils import send_sms
 
 # --------------------- HELPER FUNCTIONS ---------------------
@@ -140,24 +144,93 @@ def export_disciplinary_letters_pdf(modeladmin, request, queryset):
     return response
 
 
+# --------------------- AUDIENCE FORM ---------------------
+
+def stream_choices():
+    streams = Student.objects.order_by("stream").values_list("stream", flat=True).distinct()
+    return [(s, s) for s in streams]
+
+
+class AnnouncementAdminForm(forms.ModelForm):
+    """Audience lists edited as checkboxes; empty means no restriction."""
+    audience_forms = forms.TypedMultipleChoiceField(
+        choices=Student._meta.get_field("form").choices, coerce=int, required=False,
+        widget=forms.CheckboxSelectMultiple, label="Forms",
+    )
+    audience_streams = forms.MultipleChoiceField(
+        choices=stream_choices, required=False, widget=forms.CheckboxSelectMultiple, label="Streams",
+    )
+    audience_genders = forms.MultipleChoiceField(
+        choices=Student.GENDER_CHOICES, required=False, widget=forms.CheckboxSelectMultiple, label="Student gender",
+    )
+    audience_statuses = forms.MultipleChoiceField(
+        choices=Student.STATUS_CHOICES, required=False, widget=forms.CheckboxSelectMultiple,
+        label="Student status", help_text="Leave empty for active students only",
+    )
+    teacher_roles = forms.MultipleChoiceField(
+        choices=Teacher.ROLE_CHOICES, required=False, widget=forms.CheckboxSelectMultiple, label="Teacher roles",
+    )
+
+    class Meta:
+        model = Announcement
+        fields = "__all__"
+
+
 # --------------------- DJANGO ADMIN ---------------------
 
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
-    list_display = ("title", "target_group", "is_correction", "attachment", "created_at")
-    list_filter = ("target_group", "is_correction", "created_at")
+    form = AnnouncementAdminForm
+    change_form_template = "admin/announcements/announcement/change_form.html"
+    list_display = ("title", "target_group", "is_correction", "attachment", "attachment_status", "sms_sent", "sms_queued", "created_at")
+    list_filter = ("target_group", "is_correction", "sms_sent", "created_at")
     search_fields = ("title", "message")
     date_hierarchy = "created_at"
     ordering = ("-created_at",)
-    readonly_fields = ("created_at",)
-
-    # Optional: send SMS after save
-    def save_model(self, request, obj, form, change):
-        super().save_model(request, obj, form, change)
-        # Only send SMS if newly created
-        if not change:
-            from .signals import send_announcement_sms
-            send_announcement_sms(sender=Announcement, instance=obj, created=True)
+    readonly_fields = (
+        "created_at", "sms_sent", "sms_queued",
+        "attachment_status", "attachment_original_size", "attachment_size", "attachment_bytes_saved",
+    )
+
+    fieldsets = (
+        (None, {"fields": ("title", "message", "target_group", "is_correction", "attachment", "personalize")}),
+        ("Audience", {"fields": (
+            "audience_forms", "audience_streams", "audience_genders", "audience_statuses", "teacher_roles",
+        )}),
+        ("Attachment optimization", {"fields": (
+            "attachment_status", "attachment_original_size", "attachment_size", "attachment_bytes_saved",
+        )}),
+        ("SMS", {"fields": ("sms_sent", "sms_queued", "created_at")}),
+    )
+
+    # SMS are queued by the post_save signal once the announcement is committed
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "audience-preview/",
+                self.admin_site.admin_view(self.audience_preview_view),
+                name="announcements_announcement_audience_preview",
+            ),
+        ]
+        return custom_urls + urls
+
+    def audience_preview_view(self, request):
+        """Recipient count and segment cost for the form as currently filled in."""
+        data = request.GET
+        announcement = Announcement(
+            title=data.get("title", ""),
+            message=data.get("message", ""),
+            target_group=data.get("target_group", ""),
+            audience_forms=[int(f) for f in data.getlist("audience_forms") if f.isdigit()],
+            audience_streams=data.getlist("audience_streams"),
+            audience_genders=data.getlist("audience_genders"),
+            audience_statuses=data.getlist("audience_statuses"),
+            teacher_roles=data.getlist("teacher_roles"),
+            personalize=data.get("personalize") == "on",
+        )
+        return JsonResponse(preview_audience(announcement, has_attachment=bool(data.get("has_attachment"))))
 
 
 @admin.register(DisciplinaryMessage)
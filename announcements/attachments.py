@@ -0,0 +1,126 @@
+"""
+Announcement attachment optimization, run after the upload.
+
+Saving an announcement only stores the file on Cloudinary; this job then
+downloads it, shrinks it and uploads the result over the same public id.
+The original is kept whenever the optimized file is not smaller.
+
+PDFs: streams are recompressed and objects packed into object streams;
+files above ATTACHMENT_RECOMPRESS_FLATE_BYTES also have their existing
+Flate streams recompressed at the highest level (slower, worth it for big
+scans). XLSX: the workbook archive is rewritten with maximum Deflate
+compression, which is lossless and avoids loading the sheet with openpyxl.
+"""
+
+import logging
+import zipfile
+from io import BytesIO
+
+import cloudinary.uploader
+import pikepdf
+import requests
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Announcement
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------- Optimizers ----------------
+def optimize_pdf_bytes(data):
+    with pikepdf.open(BytesIO(data)) as pdf:
+        output = BytesIO()
+        pdf.save(
+            output,
+            compress_streams=True,
+            object_stream_mode=pikepdf.ObjectStreamMode.generate,
+            recompress_flate=len(data) >= settings.ATTACHMENT_RECOMPRESS_FLATE_BYTES,
+        )
+    return output.getvalue()
+
+
+def optimize_xlsx_bytes(data):
+    output = BytesIO()
+    with zipfile.ZipFile(BytesIO(data)) as source, \
+            zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as target:
+        for item in source.infolist():
+            target.writestr(item.filename, source.read(item.filename))
+    return output.getvalue()
+
+
+OPTIMIZERS = {
+    "pdf": optimize_pdf_bytes,
+    "xlsx": optimize_xlsx_bytes,
+}
+
+
+def _extension(resource):
+    name = resource.format or resource.public_id or ""
+    return name.rsplit(".", 1)[-1].lower()
+
+
+# ---------------- Job ----------------
+def optimize_attachment(announcement_id):
+    """
+    Optimize one announcement's attachment and record the outcome.
+    Only runs for attachments still marked 'pending', so scheduling it
+    twice is harmless.
+    """
+    claimed = Announcement.objects.filter(pk=announcement_id, attachment_status="pending").update(
+        attachment_status="optimizing"
+    )
+    if not claimed:
+        return
+
+    announcement = Announcement.objects.get(pk=announcement_id)
+    resource = announcement.attachment
+    optimizer = OPTIMIZERS.get(_extension(resource)) if resource else None
+
+    result = {"attachment_status": "skipped", "attachment_optimized_at": timezone.now()}
+    try:
+        if optimizer is None:
+            return
+
+        response = requests.get(resource.url, timeout=settings.ATTACHMENT_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        original = response.content
+        result.update(attachment_original_size=len(original), attachment_size=len(original), attachment_bytes_saved=0)
+
+        if len(original) < settings.ATTACHMENT_OPTIMIZE_MIN_BYTES:
+            return
+
+        optimized = optimizer(original)
+        if len(optimized) >= len(original):
+            print(f"ℹ️ Attachment for '{announcement.title}' is already compact, keeping the original")
+            return
+
+        uploaded = cloudinary.uploader.upload(
+            BytesIO(optimized),
+            public_id=resource.public_id,
+            resource_type="raw",
+            type=resource.type or "upload",
+            overwrite=True,
+            invalidate=True,
+        )
+        result.update(
+            attachment=CloudinaryResource(
+                uploaded["public_id"],
+                version=uploaded.get("version"),
+                type=uploaded.get("type", "upload"),
+                resource_type="raw",
+            ),
+            attachment_status="optimized",
+            attachment_size=len(optimized),
+            attachment_bytes_saved=len(original) - len(optimized),
+        )
+        print(f"✅ Attachment for '{announcement.title}' optimized, saved {len(original) - len(optimized)} bytes")
+
+    except Exception as e:
+        logger.error(f"Attachment optimization failed for announcement {announcement_id}: {e}", exc_info=True)
+        result["attachment_status"] = "failed"
+
+    finally:
+        # A newer upload resets the status to 'pending'; leave that one alone
+        Announcement.objects.filter(pk=announcement_id, attachment_status="optimizing").update(**result)
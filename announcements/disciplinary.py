@@ -0,0 +1,122 @@
+"""
+Disciplinary SMS to parents.
+
+The class teacher line of every message comes from an in-process cache of
+class name -> (teacher name, phone). The whole map is loaded with one query
+and dropped whenever a Teacher or SchoolClass is saved or deleted (see
+signals); CLASS_TEACHER_CACHE_TIMEOUT bounds how long another worker
+process can keep a stale copy.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .messages import SMS_FOOTER
+from .models import DisciplinaryMessage
+from .utils import normalize_number, form_to_swahili, clean_sms_text
+from teachers.models import Teacher, SchoolClass
+from students.models import Student
+from core.outbox import enqueue_sms
+
+ROMAN_FORMS = {1: "I", 2: "II", 3: "III", 4: "IV"}
+
+_class_teachers = None
+_class_teachers_loaded_at = 0.0
+_class_teachers_lock = threading.Lock()
+
+
+# ---------------- Class Teacher Cache ----------------
+def class_name_for(form, stream):
+    """SchoolClass name of a student, e.g. "FORM II-B"."""
+    return f"FORM {ROMAN_FORMS.get(form, str(form))}-{stream.strip().upper()}"
+
+
+def _load_class_teachers():
+    classes = {name: None for name in SchoolClass.objects.values_list("name", flat=True)}
+    rows = (
+        Teacher.objects.filter(assigned_class__isnull=False)
+        .order_by("-pk")
+        .values_list("assigned_class__name", "full_name", "phone")
+    )
+    # Lowest pk wins when a class has more than one teacher
+    for class_name, full_name, phone in rows:
+        classes[class_name] = (full_name, normalize_number(phone))
+    return classes
+
+
+def get_class_teachers():
+    """{class name: (teacher name, phone) or None when the class has no teacher}"""
+    global _class_teachers, _class_teachers_loaded_at
+
+    with _class_teachers_lock:
+        expired = time.monotonic() - _class_teachers_loaded_at > settings.CLASS_TEACHER_CACHE_TIMEOUT
+        if _class_teachers is None or expired:
+            _class_teachers = _load_class_teachers()
+            _class_teachers_loaded_at = time.monotonic()
+        return _class_teachers
+
+
+def invalidate_class_teachers():
+    global _class_teachers
+    with _class_teachers_lock:
+        _class_teachers = None
+
+
+def class_teacher_info(form, stream):
+    class_teachers = get_class_teachers()
+    class_name = class_name_for(form, stream)
+
+    if class_name not in class_teachers:
+        return "\n\n[Darasa la mwanafunzi halijapatikana.]"
+    if class_teachers[class_name] is None:
+        return "\n\n[Mwalimu wa darasa hajapatikana.]"
+
+    full_name, phone = class_teachers[class_name]
+    return f"\n\nMwalimu wa darasa: {full_name} ({phone})"
+
+
+# ---------------- Messages ----------------
+def build_disciplinary_sms(record):
+    """(number, message) for one DisciplinaryMessage, or None if the parent number is invalid."""
+    student = record.student
+    number = normalize_number(student.parent_contact)
+    if not number:
+        print(f"❌ Invalid parent number for disciplinary message: {student.full_name}")
+        return None
+
+    message = clean_sms_text(
+        f"Mzazi wa {student.full_name} ({form_to_swahili(student.form)}),\n"
+        f"{record.message}{class_teacher_info(student.form, student.stream)}{SMS_FOOTER}"
+    )
+    return number, message
+
+
+def notify_disciplinary(records):
+    """Queue the SMS of several disciplinary messages in one batch. Returns the number queued."""
+    outgoing = [sms for sms in map(build_disciplinary_sms, records) if sms]
+    return enqueue_sms(outgoing, source="disciplinary")
+
+
+def create_disciplinary_messages(entries):
+    """
+    Create disciplinary messages in bulk and notify every parent in one batch.
+    entries: iterable of (student_id, message)
+    Returns the created DisciplinaryMessage objects.
+    """
+    entries = list(entries)
+    students = Student.objects.in_bulk({student_id for student_id, _ in entries})
+
+    # Messages and their outbox rows are saved together or not at all
+    with transaction.atomic():
+        records = DisciplinaryMessage.objects.bulk_create([
+            DisciplinaryMessage(student=students[student_id], message=message)
+            for student_id, message in entries
+        ])
+
+        # bulk_create skips post_save, so the per-message signal does not fire
+        queued = notify_disciplinary(records)
+    print(f"✅ Disciplinary SMS queued for {queued} of {len(records)} message(s)")
+    return records
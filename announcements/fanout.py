@@ -0,0 +1,92 @@
+"""
+Announcement SMS fan-out.
+
+Scheduled after the announcement is committed (see signals). Recipients come
+from announcements.recipients (the announcement's audience filters, one
+message per parent number) and are queued in steps of
+ANNOUNCEMENT_FANOUT_CHUNK: each step locks the announcement, queues its
+messages and moves the group's cursor forward in one transaction, and
+every message carries a dedupe key. A run that dies
+half-way is finished by `manage.py resume_announcement_sms` without
+resending to anyone already queued.
+"""
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Announcement
+from .recipients import TEACHER_GROUPS, PARENT_GROUPS, iter_parent_recipients, iter_teacher_recipients
+from .messages import CompiledAnnouncement
+from core.models import OutboundSMS
+from core.outbox import enqueue_sms
+
+
+# ---------------- Steps ----------------
+def _queue_in_steps(announcement_id, cursor_field, outgoing, limit):
+    """
+    Queue (pk, number, message, dedupe_key) items `limit` at a time, saving
+    the group's cursor with each step.
+    """
+    outgoing = iter(outgoing)
+    while True:
+        step = list(islice(outgoing, limit))
+        if not step:
+            return
+
+        with transaction.atomic():
+            announcement = Announcement.objects.select_for_update().get(pk=announcement_id)
+            if announcement.sms_sent:
+                return
+
+            # Skip anything a concurrent run has already queued
+            cursor = getattr(announcement, cursor_field)
+            step = [item for item in step if item[0] > cursor]
+            if not step:
+                continue
+
+            queued = enqueue_sms([(number, message, key) for _, number, message, key in step], source="announcement")
+            Announcement.objects.filter(pk=announcement_id).update(**{
+                cursor_field: step[-1][0],
+                "sms_queued": announcement.sms_queued + queued,
+            })
+
+
+def _teacher_messages(announcement, compiled):
+    message = compiled.teacher_message
+    teachers = iter_teacher_recipients(announcement.teacher_roles, after_pk=announcement.sms_teacher_cursor)
+    for pk, number in teachers:
+        yield pk, number, message, f"announcement:{announcement.pk}:teacher:{number}"
+
+
+def _parent_messages(announcement, compiled):
+    parents = iter_parent_recipients(after_pk=announcement.sms_parent_cursor, **announcement.student_filters())
+    for pk, number, full_name, form in parents:
+        message = compiled.parent_message(full_name, form)
+        yield pk, number, message, f"announcement:{announcement.pk}:parent:{number}"
+
+
+# ---------------- Job ----------------
+def run_announcement_fanout(announcement_id):
+    """
+    Queue the SMS of one announcement, continuing from its saved cursors.
+    Safe to call again for the same announcement.
+    """
+    announcement = Announcement.objects.get(pk=announcement_id)
+    if announcement.sms_sent:
+        return
+
+    compiled = CompiledAnnouncement(announcement)
+    limit = settings.ANNOUNCEMENT_FANOUT_CHUNK
+
+    if announcement.target_group in TEACHER_GROUPS:
+        _queue_in_steps(announcement_id, "sms_teacher_cursor", _teacher_messages(announcement, compiled), limit)
+
+    if announcement.target_group in PARENT_GROUPS:
+        _queue_in_steps(announcement_id, "sms_parent_cursor", _parent_messages(announcement, compiled), limit)
+
+    # Mark SMS as sent to prevent duplicates; the count drops any re-submitted rows
+    queued = OutboundSMS.objects.filter(dedupe_key__startswith=f"announcement:{announcement_id}:").count()
+    Announcement.objects.filter(pk=announcement_id).update(sms_sent=True, sms_queued=queued)
+    print(f"✅ Announcement SMS queued for {queued} recipients")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from announcements.attachments import optimize_attachment
+from announcements.models import Announcement
+
+
+class Command(BaseCommand):
+    help = "Optimize announcement attachments that are still pending (e.g. after a restart)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry", action="store_true",
+                            help="Also retry failed attachments and ones stuck in 'optimizing'")
+
+    def handle(self, *args, **options):
+        if options["retry"]:
+            Announcement.objects.filter(attachment_status__in=["failed", "optimizing"]).update(attachment_status="pending")
+
+        ids = list(Announcement.objects.filter(attachment_status="pending").order_by("pk").values_list("pk", flat=True))
+        for announcement_id in ids:
+            self.stdout.write(f"📎 Optimizing attachment of announcement {announcement_id}")
+            optimize_attachment(announcement_id)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Processed {len(ids)} attachment(s)"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from announcements.fanout import run_announcement_fanout
+from announcements.models import Announcement
+
+
+class Command(BaseCommand):
+    help = "Finish queueing SMS for announcements whose fan-out did not complete"
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Announcement ids (default: all unfinished)")
+
+    def handle(self, *args, **options):
+        pending = Announcement.objects.filter(sms_sent=False).order_by("pk")
+        if options["ids"]:
+            pending = pending.filter(pk__in=options["ids"])
+
+        ids = list(pending.values_list("pk", flat=True))
+        if not ids:
+            self.stdout.write(self.style.SUCCESS("✅ No unfinished announcement SMS"))
+            return
+
+        for announcement_id in ids:
+            self.stdout.write(f"📢 Resuming announcement {announcement_id}")
+            run_announcement_fanout(announcement_id)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Resumed {len(ids)} announcement(s)"))
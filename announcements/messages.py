@@ -0,0 +1,57 @@
+"""
+Announcement SMS text, compiled once per announcement.
+
+Only the student name and form differ between parents, so the shared body
+(title, message, download link, footer) is built and cleaned once and each
+parent message is a plain concatenation. The result is the same text the
+per-parent `clean_sms_text(f"Mzazi wa ...")` used to produce.
+"""
+
+from .utils import form_to_swahili, clean_sms_text
+
+SMS_FOOTER = ""
+# SMS_FOOTER = "\n\nUjumbe huu umetumwa rasmi na PARANGASEC."
+
+# Salutation when an announcement is not personalized
+GENERIC_PARENT_GREETING = "Mzazi/Mlezi,"
+
+
+# ---------------- Helper ----------------
+def get_download_url(attachment):
+    """
+    Force Cloudinary RAW file download for PDF and Excel
+    """
+    url = attachment.url
+    if "/upload/" in url:
+        url = url.replace("/upload/", "/upload/fl_attachment/")
+    return url
+
+
+# ---------------- Compiled Announcement ----------------
+class CompiledAnnouncement:
+    """
+    attachment_link: pass a stand-in (e.g. for previews) instead of building
+    the Cloudinary URL from the announcement.
+    """
+
+    def __init__(self, announcement, attachment_link=None):
+        if attachment_link is None:
+            attachment_link = ""
+            if announcement.attachment:
+                attachment_link = f"\nDownload: {get_download_url(announcement.attachment)}"
+
+        self.body = clean_sms_text(
+            f"{announcement.title}:\n{announcement.message}{attachment_link}{SMS_FOOTER}"
+        )
+        self.personalize = announcement.personalize
+        self.generic_parent_message = f"{GENERIC_PARENT_GREETING} {self.body}"
+
+    @property
+    def teacher_message(self):
+        return self.body
+
+    def parent_message(self, full_name, form):
+        if not self.personalize:
+            return self.generic_parent_message
+        name = " ".join(str(full_name).split())
+        return " ".join(filter(None, ["Mzazi wa", name, f"({form_to_swahili(form)}),", self.body]))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:47
+
+from django.db import migrations, models
+
+
+def mark_existing_sent(apps, schema_editor):
+    # Announcements saved before the fan-out was scheduled were sent synchronously
+    Announcement = apps.get_model("announcements", "Announcement")
+    Announcement.objects.filter(sms_sent=False).update(sms_sent=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0002_announcement_sms_sent_alter_announcement_attachment_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='sms_parent_cursor',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='sms_queued',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='sms_teacher_cursor',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(mark_existing_sent, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0003_announcement_sms_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='audience_forms',
+            field=models.JSONField(blank=True, default=list, help_text='Parents of these forms only, e.g. [4]'),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='audience_genders',
+            field=models.JSONField(blank=True, default=list, help_text='Parents of "M" or "F" students only'),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='audience_statuses',
+            field=models.JSONField(blank=True, default=list, help_text='Student statuses (default: active)'),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='audience_streams',
+            field=models.JSONField(blank=True, default=list, help_text='Parents of these streams only, e.g. ["A", "B"]'),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='teacher_roles',
+            field=models.JSONField(blank=True, default=list, help_text='Teachers with these roles only, e.g. ["head", "academic"]'),
+        ),
+    ]
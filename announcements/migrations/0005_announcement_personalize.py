@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0004_announcement_audience'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='personalize',
+            field=models.BooleanField(default=True, help_text="Address each parent by the student's name. Turn off to send one identical message in bulk."),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('announcements', '0005_announcement_personalize'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='announcement',
+            name='attachment_bytes_saved',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='attachment_optimized_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='attachment_original_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='attachment_size',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='announcement',
+            name='attachment_status',
+            field=models.CharField(blank=True, choices=[('', 'No attachment'), ('pending', 'Pending'), ('optimizing', 'Optimizing'), ('optimized', 'Optimized'), ('skipped', 'Kept original'), ('failed', 'Failed')], editable=False, max_length=12),
+        ),
+    ]
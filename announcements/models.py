@@ -3,33 +3,7 @@ from django.core.exceptions import ValidationError
 from students.models import Student
 from cloudinary.models import CloudinaryField
 import cloudinary.uploader
-from django.core.files.base import ContentFile
-from io import BytesIO
-import pikepdf
-from openpyxl import load_workbook
-
-# ---------------- Helper functions ----------------
-def optimize_pdf(file):
-    try:
-        output = BytesIO()
-        pdf = pikepdf.open(file)
-        pdf.save(output, optimize_streams=True, compress_streams=True)
-        pdf.close()
-        return ContentFile(output.getvalue(), name=file.name)
-    except Exception as e:
-        print(f"❌ PDF optimization failed: {e}")
-        return file
-
-def optimize_excel(file):
-    try:
-        wb = load_workbook(filename=file)
-        output = BytesIO()
-        wb.save(output)
-        wb.close()
-        return ContentFile(output.getvalue(), name=file.name)
-    except Exception as e:
-        print(f"❌ Excel optimization failed: {e}")
-        return file
+from django.core.files.uploadedfile import UploadedFile
 
 # ---------------- Announcement ----------------
 class Announcement(models.Model):
@@ -43,6 +17,17 @@ class Announcement(models.Model):
     message = models.TextField()
     target_group = models.CharField(max_length=20, choices=TARGET_CHOICES)
     is_correction = models.BooleanField(default=False)
+    personalize = models.BooleanField(
+        default=True,
+        help_text="Address each parent by the student's name. Turn off to send one identical message in bulk."
+    )
+
+    # ---------------- Audience (empty list = no restriction) ----------------
+    audience_forms = models.JSONField(default=list, blank=True, help_text="Parents of these forms only, e.g. [4]")
+    audience_streams = models.JSONField(default=list, blank=True, help_text='Parents of these streams only, e.g. ["A", "B"]')
+    audience_genders = models.JSONField(default=list, blank=True, help_text='Parents of "M" or "F" students only')
+    audience_statuses = models.JSONField(default=list, blank=True, help_text="Student statuses (default: active)")
+    teacher_roles = models.JSONField(default=list, blank=True, help_text='Teachers with these roles only, e.g. ["head", "academic"]')
 
     attachment = CloudinaryField(
         resource_type='raw',
@@ -51,14 +36,43 @@ class Announcement(models.Model):
         help_text="PDF or Excel only"
     )
 
+    # Attachment optimization (announcements.attachments runs after the upload)
+    ATTACHMENT_STATUS_CHOICES = [
+        ('', 'No attachment'),
+        ('pending', 'Pending'),
+        ('optimizing', 'Optimizing'),
+        ('optimized', 'Optimized'),
+        ('skipped', 'Kept original'),
+        ('failed', 'Failed'),
+    ]
+    attachment_status = models.CharField(max_length=12, choices=ATTACHMENT_STATUS_CHOICES, blank=True, editable=False)
+    attachment_original_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    attachment_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    attachment_bytes_saved = models.PositiveBigIntegerField(default=0, editable=False)
+    attachment_optimized_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     # Prevent duplicate SMS
     sms_sent = models.BooleanField(default=False, editable=False)
 
+    # SMS fan-out progress (see announcements.fanout): last pk queued per group
+    sms_teacher_cursor = models.PositiveBigIntegerField(default=0, editable=False)
+    sms_parent_cursor = models.PositiveBigIntegerField(default=0, editable=False)
+    sms_queued = models.PositiveIntegerField(default=0, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.title
 
+    def student_filters(self):
+        """Audience filters in the form announcements.recipients expects."""
+        return {
+            "forms": self.audience_forms,
+            "streams": self.audience_streams,
+            "genders": self.audience_genders,
+            "statuses": self.audience_statuses,
+        }
+
     # ---------------- Validation ----------------
     def clean(self):
         # Validate file type if a file is uploaded during this save
@@ -70,16 +84,25 @@ class Announcement(models.Model):
             pass  # no file uploaded yet, safe
 
     # ---------------- Save ----------------
+    def attachment_changed(self):
+        """True when this save stores a different file than the one in the database."""
+        if isinstance(self.attachment, UploadedFile):
+            return True
+        previous = None
+        if self.pk:
+            previous = Announcement.objects.filter(pk=self.pk).values_list("attachment", flat=True).first()
+        return getattr(previous, "public_id", None) != getattr(self.attachment, "public_id", None)
+
     def save(self, *args, **kwargs):
-        # Optimize file if it exists locally during upload
-        try:
-            filename = self.attachment.name.lower()
-            if filename.endswith('.pdf'):
-                self.attachment.file = optimize_pdf(self.attachment.file)
-            elif filename.endswith('.xlsx'):
-                self.attachment.file = optimize_excel(self.attachment.file)
-        except Exception:
-            pass  # CloudinaryResource, skip optimization
+        # A new file is optimized in the background once the save has committed (see signals)
+        if self.attachment_changed():
+            self.attachment_status = "pending" if self.attachment else ""
+            self.attachment_original_size = self.attachment_size = self.attachment_optimized_at = None
+            self.attachment_bytes_saved = 0
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "attachment_status", "attachment_original_size",
+                                           "attachment_size", "attachment_bytes_saved", "attachment_optimized_at"}
 
         super().save(*args, **kwargs)
 
@@ -0,0 +1,116 @@
+"""
+Who an announcement goes to.
+
+Recipients are streamed from one query that selects only the columns the
+message needs (`values_list(...).iterator()`), so memory stays flat however
+large the roll grows. Numbers are normalized and deduplicated on the way
+out: each phone number is yielded once per group.
+"""
+
+from django.conf import settings
+
+from .messages import CompiledAnnouncement
+from .utils import normalize_number
+from teachers.models import Teacher
+from students.models import Student
+from core.sms_encoding import count_segments
+
+TEACHER_GROUPS = ["teachers", "all", "everyone"]
+PARENT_GROUPS = ["parents", "all", "everyone"]
+
+# Stands in for the Cloudinary link in previews (the file is uploaded on save)
+PREVIEW_ATTACHMENT_LINK = "\nDownload: " + "x" * 110
+
+
+# ---------------- Audience ----------------
+def student_audience(forms=None, streams=None, genders=None, statuses=None):
+    """Students whose parents are targeted. Only active students unless `statuses` says otherwise."""
+    students = Student.objects.filter(status__in=statuses or ["active"])
+    if forms:
+        students = students.filter(form__in=forms)
+    if streams:
+        students = students.filter(stream__in=streams)
+    if genders:
+        students = students.filter(gender__in=genders)
+    return students
+
+
+def teacher_audience(roles=None):
+    teachers = Teacher.objects.all()
+    if roles:
+        teachers = teachers.filter(role__in=roles)
+    return teachers
+
+
+# ---------------- Recipients ----------------
+def iter_parent_recipients(after_pk=0, log_invalid=True, **filters):
+    """
+    Yield (student_pk, number, full_name, form) for the targeted students,
+    in pk order, one per parent number. A parent with several children is
+    yielded for the first of them.
+    filters: forms / streams / genders / statuses, see student_audience
+    after_pk: resume point (students up to this pk are skipped)
+    log_invalid: print the students whose parent number is invalid
+    """
+    seen = set()
+    rows = (
+        student_audience(**filters)
+        .filter(pk__gt=after_pk)
+        .order_by("pk")
+        .values_list("pk", "full_name", "form", "parent_contact")
+    )
+    for pk, full_name, form, parent_contact in rows.iterator(chunk_size=settings.ANNOUNCEMENT_FANOUT_CHUNK):
+        number = normalize_number(parent_contact)
+        if not number:
+            if log_invalid:
+                print(f"❌ Invalid parent number for {full_name}")
+            continue
+        if number in seen:
+            continue
+        seen.add(number)
+        yield pk, number, full_name, form
+
+
+def iter_teacher_recipients(roles=None, after_pk=0):
+    """Yield (teacher_pk, number) in pk order, one per number."""
+    seen = set()
+    rows = teacher_audience(roles).filter(pk__gt=after_pk).order_by("pk").values_list("pk", "phone")
+    for pk, phone in rows.iterator(chunk_size=settings.ANNOUNCEMENT_FANOUT_CHUNK):
+        number = normalize_number(phone)
+        if number and number not in seen:
+            seen.add(number)
+            yield pk, number
+
+
+# ---------------- Preview ----------------
+def preview_audience(announcement, has_attachment=False):
+    """
+    Recipient counts and estimated segments/cost for the admin preview of an
+    (unsaved) announcement. Recipients come from the same iterators as the
+    send, so invalid numbers are dropped and normalized numbers deduplicated
+    the same way; each parent message is sized as it will be sent.
+    """
+    compiled = CompiledAnnouncement(announcement, PREVIEW_ATTACHMENT_LINK if has_attachment else "")
+    teachers = parents = segments = 0
+
+    if announcement.target_group in TEACHER_GROUPS:
+        teachers = sum(1 for _ in iter_teacher_recipients(announcement.teacher_roles))
+        segments += teachers * count_segments(compiled.teacher_message)
+
+    if announcement.target_group in PARENT_GROUPS:
+        sizes = {}  # message -> segments, most messages repeat
+        for _, _, full_name, form in iter_parent_recipients(log_invalid=False, **announcement.student_filters()):
+            message = compiled.parent_message(full_name, form)
+            if message not in sizes:
+                sizes[message] = count_segments(message)
+            parents += 1
+            segments += sizes[message]
+
+    return {
+        "teachers": teachers,
+        "parents": parents,
+        "recipients": teachers + parents,
+        "segments": segments,
+        "cost": round(segments * settings.SMS_COST_PER_SEGMENT, 2),
+        "currency": settings.SMS_COST_CURRENCY,
+    }
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Announcement
+from students.models import Student
 
 class AnnouncementSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,3 +11,35 @@ class AnnouncementSerializer(serializers.ModelSerializer):
         if not value.strip():
             raise serializers.ValidationError("Message cannot be empty.")
         return value
+
+
+class DisciplinaryMessageListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        attrs = super().to_internal_value(data)
+
+        # One query for every student of the batch instead of one per item
+        students = Student.objects.in_bulk({item["student"] for item in attrs})
+        errors = [
+            {} if item["student"] in students
+            else {"student": [f'Invalid pk "{item["student"]}" - object does not exist.']}
+            for item in attrs
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        for item in attrs:
+            item["student"] = students[item["student"]]
+        return attrs
+
+
+class DisciplinaryMessageSerializer(serializers.Serializer):
+    student = serializers.IntegerField(min_value=1)
+    message = serializers.CharField()
+
+    def validate_message(self, value):
+        if not value.strip():
+            raise serializers.ValidationError("Message cannot be empty.")
+        return value
+
+    class Meta:
+        list_serializer_class = DisciplinaryMessageListSerializer
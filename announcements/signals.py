@@ -1,25 +1,20 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 
 from .models import Announcement, DisciplinaryMessage
 from teachers.models import Teacher, SchoolClass
-from students.models import Student
-from core.sms_utils import send_sms
-from .utils import normalize_number, form_to_swahili, clean_sms_text
+from core.background import run_after_commit
+from .attachments import optimize_attachment
+from .disciplinary import notify_disciplinary, invalidate_class_teachers
+from .fanout import run_announcement_fanout
 
-SMS_FOOTER = ""
-# SMS_FOOTER = "\n\nUjumbe huu umetumwa rasmi na PARANGASEC."
 
-# ---------------- Helper ----------------
-def get_download_url(attachment):
-    """
-    Force Cloudinary RAW file download for PDF and Excel
-    """
-    url = attachment.url
-    if "/upload/" in url:
-        url = url.replace("/upload/", "/upload/fl_attachment/")
-    return url
+# ================= ANNOUNCEMENT ATTACHMENT =================
+@receiver(post_save, sender=Announcement, dispatch_uid="announcement_attachment_optimize")
+def schedule_attachment_optimization(sender, instance, **kwargs):
+    if instance.attachment_status == "pending":
+        run_after_commit(optimize_attachment, instance.pk)
 
 
 # ================= ANNOUNCEMENT SMS =================
@@ -28,53 +23,8 @@ def send_announcement_sms(sender, instance, created, **kwargs):
     if not created or instance.sms_sent:
         return
 
-    # Build download link if attachment exists
-    attachment_link = ""
-    if instance.attachment:
-        attachment_link = f"\nDownload: {get_download_url(instance.attachment)}"
-
-    # ---------- TEACHERS ----------
-    if instance.target_group in ["teachers", "all", "everyone"]:
-        teacher_numbers = list({
-            normalize_number(t.phone)
-            for t in Teacher.objects.all()
-            if normalize_number(t.phone)
-        })
-
-        if teacher_numbers:
-            try:
-                message = clean_sms_text(
-                    f"{instance.title}:\n{instance.message}{attachment_link}{SMS_FOOTER}"
-                )
-                send_sms(teacher_numbers, message)
-                print(f"✅ SMS sent to {len(teacher_numbers)} teachers")
-            except Exception as e:
-                print(f"❌ Failed to send SMS to teachers: {e}")
-
-    # ---------- PARENTS ----------
-    if instance.target_group in ["parents", "all", "everyone"]:
-        for student in Student.objects.all():
-            try:
-                number = normalize_number(student.parent_contact)
-                if not number:
-                    print(f"❌ Invalid parent number for {student.full_name}")
-                    continue
-
-                message = clean_sms_text(
-                    f"Mzazi wa {student.full_name} ({form_to_swahili(student.form)}),\n"
-                    f"{instance.title}:\n{instance.message}{attachment_link}{SMS_FOOTER}"
-                )
-
-                send_sms([number], message)
-                print(f"✅ SMS sent to parent: {number}")
-
-            except Exception as e:
-                print(f"❌ Failed SMS to parent {student.full_name}: {e}")
-                continue
-
-    # Mark SMS as sent to prevent duplicates
-    instance.sms_sent = True
-    instance.save(update_fields=["sms_sent"])
+    # Saving returns straight away; recipients are queued in the background
+    run_after_commit(run_announcement_fanout, instance.pk)
 
 
 # ================= DISCIPLINARY SMS =================
@@ -83,36 +33,15 @@ def send_disciplinary_sms(sender, instance, created, **kwargs):
     if not created:
         return
 
-    student = instance.student
-    number = normalize_number(student.parent_contact)
-    if not number:
-        print(f"❌ Invalid parent number for disciplinary message: {student.full_name}")
-        return
+    if notify_disciplinary([instance]):
+        print(f"✅ Disciplinary SMS queued for {instance.student.full_name}")
 
-    roman_forms = {1: "I", 2: "II", 3: "III", 4: "IV"}
-    form_roman = roman_forms.get(student.form, str(student.form))
-    class_name = f"FORM {form_roman}-{student.stream.strip().upper()}"
-
-    try:
-        school_class = SchoolClass.objects.get(name=class_name)
-        class_teacher = Teacher.objects.get(assigned_class=school_class)
-        teacher_info = f"\n\nMwalimu wa darasa: {class_teacher.full_name} ({normalize_number(class_teacher.phone)})"
-    except SchoolClass.DoesNotExist:
-        teacher_info = "\n\n[Darasa la mwanafunzi halijapatikana.]"
-    except Teacher.DoesNotExist:
-        teacher_info = "\n\n[Mwalimu wa darasa hajapatikana.]"
-
-    message = clean_sms_text(
-        f"Mzazi wa {student.full_name} ({form_to_swahili(student.form)}),\n"
-        f"{instance.message}{teacher_info}{SMS_FOOTER}"
-    )
-
-    try:
-        send_sms([number], message)
-        print(f"✅ Disciplinary SMS sent to {number}")
-    except Exception as e:
-        print(f"❌ Failed disciplinary SMS to {student.full_name}: {e}")
 
+# ================= CLASS TEACHER CACHE =================
+@receiver([post_save, post_delete], sender=Teacher, dispatch_uid="class_teachers_teacher_changed")
+@receiver([post_save, post_delete], sender=SchoolClass, dispatch_uid="class_teachers_class_changed")
+def refresh_class_teachers(sender, **kwargs):
+    invalidate_class_teachers()
 
 
 
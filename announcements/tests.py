@@ -1,3 +1,364 @@
-from django.test import TestCase
+import datetime
+import zipfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from cloudinary import CloudinaryResource
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import OutboundSMS
+from core.outbox import enqueue_sms
+from students.models import Student
+from teachers.models import SchoolClass, Teacher
+from .attachments import optimize_attachment, optimize_xlsx_bytes
+from .disciplinary import class_teacher_info, invalidate_class_teachers
+from .fanout import run_announcement_fanout
+from .messages import GENERIC_PARENT_GREETING, SMS_FOOTER, CompiledAnnouncement
+from .models import Announcement, DisciplinaryMessage
+from .recipients import iter_parent_recipients, iter_teacher_recipients, preview_audience, student_audience
+from .utils import clean_sms_text, form_to_swahili
+
+
+def add_student(name, parent_contact, **fields):
+    values = {"gender": "F", "dob": datetime.date(2010, 1, 1), "form": 2, "stream": "A", "parent_name": "Mzazi"}
+    return Student.objects.create(full_name=name, parent_contact=parent_contact, **{**values, **fields})
+
+
+def add_teacher(name, phone, **fields):
+    return Teacher.objects.create(full_name=name, gender="M", phone=phone, **fields)
+
+
+# ---------------- Fan-out ----------------
+class AnnouncementFanoutTests(TestCase):
+    def setUp(self):
+        for i in range(5):
+            add_student(f"STUDENT {i}", f"07100000{i:02d}")
+        add_teacher("MWALIMU", "0720000001")
+
+    def create_announcement(self, **fields):
+        with mock.patch("announcements.signals.run_after_commit") as run_after_commit:
+            announcement = Announcement.objects.create(title="Kikao", message="Kikao cha wazazi Jumamosi", **fields)
+        return announcement, run_after_commit
+
+    def test_save_only_schedules_the_fanout(self):
+        announcement, run_after_commit = self.create_announcement(target_group="all")
+
+        run_after_commit.assert_called_once_with(run_announcement_fanout, announcement.pk)
+        self.assertFalse(OutboundSMS.objects.exists())
+
+    def test_fanout_queues_every_recipient_once(self):
+        announcement, _ = self.create_announcement(target_group="all")
+        run_announcement_fanout(announcement.pk)
+
+        announcement.refresh_from_db()
+        self.assertTrue(announcement.sms_sent)
+        self.assertEqual(announcement.sms_queued, 6)
+        self.assertEqual(OutboundSMS.objects.filter(source="announcement").count(), 6)
+
+        # A second run for a finished announcement does nothing
+        run_announcement_fanout(announcement.pk)
+        self.assertEqual(OutboundSMS.objects.count(), 6)
+
+    @override_settings(ANNOUNCEMENT_FANOUT_CHUNK=2)
+    def test_interrupted_fanout_resumes_without_resending(self):
+        announcement, _ = self.create_announcement(target_group="parents")
+
+        # The worker dies after queueing the first step
+        steps = [enqueue_sms, mock.Mock(side_effect=RuntimeError("worker stopped"))]
+        with mock.patch("announcements.fanout.enqueue_sms", side_effect=lambda *args, **kwargs: steps.pop(0)(*args, **kwargs)):
+            with self.assertRaises(RuntimeError):
+                run_announcement_fanout(announcement.pk)
+
+        announcement.refresh_from_db()
+        self.assertFalse(announcement.sms_sent)
+        self.assertEqual(OutboundSMS.objects.count(), 2)
+
+        run_announcement_fanout(announcement.pk)
+        announcement.refresh_from_db()
+        self.assertTrue(announcement.sms_sent)
+        self.assertEqual(announcement.sms_queued, 5)
+        self.assertEqual(OutboundSMS.objects.count(), 5)
+
+
+# ---------------- Recipients ----------------
+class RecipientTests(TestCase):
+    def test_one_parent_per_number(self):
+        first = add_student("AMINA JUMA", "0710000001")
+        add_student("ASHA JUMA", "+255710000001")
+        add_student("NO NUMBER", "12345")
+        other = add_student("BARAKA ALLY", "255710000002", form=3)
+
+        self.assertEqual(list(iter_parent_recipients(log_invalid=False)), [
+            (first.pk, "+255710000001", "AMINA JUMA", 2),
+            (other.pk, "+255710000002", "BARAKA ALLY", 3),
+        ])
+
+    def test_resumes_after_a_pk(self):
+        first = add_student("AMINA JUMA", "0710000001")
+        second = add_student("BARAKA ALLY", "0710000002")
+
+        self.assertEqual([pk for pk, *_ in iter_parent_recipients(after_pk=first.pk)], [second.pk])
+
+    def test_teachers_one_per_number(self):
+        head = add_teacher("MKUU", "0720000001", role="head")
+        add_teacher("MWALIMU", "0720000002")
+
+        self.assertEqual(len(list(iter_teacher_recipients())), 2)
+        self.assertEqual(list(iter_teacher_recipients(["head"])), [(head.pk, "+255720000001")])
+
+    def test_one_query_for_the_whole_roll(self):
+        add_student("AMINA JUMA", "0710000001")
+        with self.assertNumQueries(1):
+            list(iter_parent_recipients())
+
+
+# ---------------- Audience ----------------
+@override_settings(SMS_COST_PER_SEGMENT=25, SMS_COST_CURRENCY="TZS")
+class AudienceTests(TestCase):
+    def setUp(self):
+        add_student("FORM FOUR A", "0710000001", form=4, stream="A", gender="M")
+        add_student("FORM FOUR B", "0710000002", form=4, stream="B")
+        add_student("FORM TWO A", "0710000003")
+        add_student("LEFT SCHOOL", "0710000004", form=4, status="transferred")
+        add_teacher("MKUU", "0720000001", role="head")
+        add_teacher("MWALIMU", "0720000002")
+
+    def names(self, **filters):
+        return set(student_audience(**filters).values_list("full_name", flat=True))
+
+    def test_filters(self):
+        self.assertEqual(self.names(), {"FORM FOUR A", "FORM FOUR B", "FORM TWO A"})
+        self.assertEqual(self.names(forms=[4]), {"FORM FOUR A", "FORM FOUR B"})
+        self.assertEqual(self.names(forms=[4], streams=["A"]), {"FORM FOUR A"})
+        self.assertEqual(self.names(genders=["M"]), {"FORM FOUR A"})
+        self.assertEqual(self.names(forms=[4], statuses=["transferred"]), {"LEFT SCHOOL"})
+
+    def test_fanout_follows_the_audience(self):
+        with mock.patch("announcements.signals.run_after_commit"):
+            announcement = Announcement.objects.create(
+                title="Mtihani", message="Mtihani wa taifa", target_group="all",
+                audience_forms=[4], teacher_roles=["head"],
+            )
+        run_announcement_fanout(announcement.pk)
+
+        self.assertEqual(
+            set(OutboundSMS.objects.values_list("number", flat=True)),
+            {"+255710000001", "+255710000002", "+255720000001"},
+        )
+
+    def test_preview_counts_recipients_and_cost(self):
+        announcement = Announcement(title="Mtihani", message="Mtihani wa taifa", target_group="parents", audience_forms=[4])
+        self.assertEqual(preview_audience(announcement), {
+            "teachers": 0, "parents": 2, "recipients": 2, "segments": 2, "cost": 50, "currency": "TZS",
+        })
+
+        # The download link pushes every message into a second part
+        announcement.message = "x" * 60
+        self.assertEqual(preview_audience(announcement, has_attachment=True)["segments"], 4)
+
+    def test_admin_preview_reads_the_form(self):
+        admin_user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(admin_user)
+
+        response = self.client.get(reverse("admin:announcements_announcement_audience_preview"), {
+            "title": "Kikao", "message": "Kikao", "target_group": "all",
+            "audience_forms": ["4"], "audience_streams": ["B"], "teacher_roles": ["head"],
+        })
+        self.assertEqual((response.json()["teachers"], response.json()["parents"]), (1, 1))
+
+
+# ---------------- Message Rendering ----------------
+class CompiledAnnouncementTests(SimpleTestCase):
+    def per_parent_message(self, announcement, full_name, form, attachment_link=""):
+        # How each parent message was built before the body was compiled once
+        return clean_sms_text(
+            f"Mzazi wa {full_name} ({form_to_swahili(form)}),\n"
+            f"{announcement.title}:\n{announcement.message}{attachment_link}{SMS_FOOTER}"
+        )
+
+    def test_parent_message_matches_per_parent_rendering(self):
+        announcement = Announcement(title="Kikao  cha wazazi", message="Tarehe 5\n\nSaa 3 asubuhi.", target_group="parents")
+        link = "\nDownload: https://res.cloudinary.com/demo/raw/upload/fl_attachment/v1/kikao.pdf"
+        compiled = CompiledAnnouncement(announcement, link)
+
+        for full_name, form in [("AMINA JUMA", 1), ("  BARAKA   ALLY ", 4), ("ZAWADI", 5)]:
+            self.assertEqual(
+                compiled.parent_message(full_name, form),
+                self.per_parent_message(announcement, full_name, form, link),
+            )
+
+    def test_teacher_message_is_the_shared_body(self):
+        announcement = Announcement(title="Kikao", message="Kesho saa 2", target_group="teachers")
+        self.assertEqual(CompiledAnnouncement(announcement).teacher_message, "Kikao: Kesho saa 2")
+
+    def test_download_link_forces_an_attachment(self):
+        announcement = Announcement(title="Ratiba", message="Ratiba mpya", target_group="teachers")
+        announcement.attachment = mock.Mock(url="https://res.cloudinary.com/demo/raw/upload/v1/ratiba.pdf")
+
+        self.assertEqual(
+            CompiledAnnouncement(announcement).teacher_message,
+            "Ratiba: Ratiba mpya Download: https://res.cloudinary.com/demo/raw/upload/fl_attachment/v1/ratiba.pdf",
+        )
+
+    def test_generic_message_when_not_personalized(self):
+        announcement = Announcement(title="Likizo", message="Shule itafungwa", target_group="parents", personalize=False)
+        compiled = CompiledAnnouncement(announcement)
+
+        self.assertEqual(compiled.parent_message("AMINA JUMA", 2), f"{GENERIC_PARENT_GREETING} Likizo: Shule itafungwa")
+        self.assertEqual(compiled.parent_message("BARAKA ALLY", 3), compiled.parent_message("AMINA JUMA", 2))
+
+
+# ---------------- Attachments ----------------
+def stored_xlsx(size=20000):
+    """An uncompressed workbook archive, as some spreadsheet tools write them."""
+    output = BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("[Content_Types].xml", "<Types/>")
+        archive.writestr("xl/worksheets/sheet1.xml", "<row><c>1</c></row>" * (size // 20))
+    return output.getvalue()
+
+
+@override_settings(ATTACHMENT_OPTIMIZE_MIN_BYTES=1000)
+class AttachmentOptimizationTests(TestCase):
+    def create_announcement(self, public_id="ratiba.xlsx"):
+        attachment = CloudinaryResource(public_id, version=1, type="upload", resource_type="raw")
+        with mock.patch("announcements.signals.run_after_commit") as run_after_commit:
+            announcement = Announcement.objects.create(
+                title="Ratiba", message="Ratiba mpya", target_group="teachers", sms_sent=True, attachment=attachment,
+            )
+        run_after_commit.assert_called_once_with(optimize_attachment, announcement.pk)
+        return announcement
+
+    def optimize(self, announcement, content):
+        download = mock.Mock(content=content)
+        with mock.patch("announcements.attachments.requests.get", return_value=download), \
+                mock.patch("announcements.attachments.cloudinary.uploader.upload") as upload:
+            upload.return_value = {"public_id": announcement.attachment.public_id, "version": 2, "type": "upload"}
+            optimize_attachment(announcement.pk)
+        announcement.refresh_from_db()
+        return upload
+
+    def test_xlsx_is_recompressed_losslessly(self):
+        original = stored_xlsx()
+        optimized = optimize_xlsx_bytes(original)
+
+        self.assertLess(len(optimized), len(original) // 10)
+        with zipfile.ZipFile(BytesIO(original)) as before, zipfile.ZipFile(BytesIO(optimized)) as after:
+            self.assertEqual(
+                {name: before.read(name) for name in before.namelist()},
+                {name: after.read(name) for name in after.namelist()},
+            )
+
+    def test_smaller_file_is_uploaded_over_the_original(self):
+        announcement = self.create_announcement()
+        self.assertEqual(announcement.attachment_status, "pending")
+
+        original = stored_xlsx()
+        upload = self.optimize(announcement, original)
+
+        upload.assert_called_once()
+        self.assertEqual(upload.call_args.kwargs["public_id"], "ratiba")
+        self.assertEqual(announcement.attachment_status, "optimized")
+        self.assertEqual(announcement.attachment_original_size, len(original))
+        self.assertEqual(announcement.attachment_bytes_saved, len(original) - announcement.attachment_size)
+
+    def test_small_file_is_kept(self):
+        announcement = self.create_announcement()
+        upload = self.optimize(announcement, stored_xlsx(size=200))
+
+        upload.assert_not_called()
+        self.assertEqual((announcement.attachment_status, announcement.attachment_bytes_saved), ("skipped", 0))
+
+    def test_broken_file_is_marked_failed(self):
+        announcement = self.create_announcement()
+        self.optimize(announcement, b"not a zip file" * 100)
+        self.assertEqual(announcement.attachment_status, "failed")
+
+    def test_runs_once_per_upload(self):
+        announcement = self.create_announcement()
+        self.optimize(announcement, stored_xlsx())
+
+        upload = self.optimize(announcement, stored_xlsx())
+        upload.assert_not_called()
+
+
+# ---------------- Disciplinary Messages ----------------
+class ClassTeacherCacheTests(TestCase):
+    def setUp(self):
+        invalidate_class_teachers()
+        self.addCleanup(invalidate_class_teachers)
+        self.form_two_a = SchoolClass.objects.create(name="FORM II-A", level="Form II")
+        SchoolClass.objects.create(name="FORM II-B", level="Form II")
+
+    def test_teacher_line(self):
+        add_teacher("ASHA MWALIMU", "0720000001", assigned_class=self.form_two_a)
+        add_teacher("JUMA MWALIMU", "0720000002", assigned_class=self.form_two_a)
+
+        self.assertEqual(class_teacher_info(2, " a "), "\n\nMwalimu wa darasa: ASHA MWALIMU (+255720000001)")
+        self.assertEqual(class_teacher_info(2, "B"), "\n\n[Mwalimu wa darasa hajapatikana.]")
+        self.assertEqual(class_teacher_info(3, "A"), "\n\n[Darasa la mwanafunzi halijapatikana.]")
+
+    def test_lookups_are_cached_until_a_teacher_changes(self):
+        teacher = add_teacher("ASHA MWALIMU", "0720000001", assigned_class=self.form_two_a)
+        class_teacher_info(2, "A")
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                class_teacher_info(2, "A")
+
+        teacher.phone = "0720000009"
+        teacher.save()
+        self.assertIn("+255720000009", class_teacher_info(2, "A"))
+
+    @override_settings(CLASS_TEACHER_CACHE_TIMEOUT=0)
+    def test_cache_expires(self):
+        class_teacher_info(2, "A")
+        Teacher.objects.bulk_create([Teacher(full_name="ASHA MWALIMU", gender="F", phone="0720000001", assigned_class=self.form_two_a)])
+        self.assertIn("ASHA MWALIMU", class_teacher_info(2, "A"))
+
+
+class DisciplinaryBulkCreateTests(TestCase):
+    def setUp(self):
+        invalidate_class_teachers()
+        self.addCleanup(invalidate_class_teachers)
+        admin_user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(admin_user)
+        self.url = reverse("disciplinary-bulk-create")
+
+    def post(self, data):
+        return self.client.post(self.url, data, content_type="application/json")
+
+    def test_messages_are_saved_and_queued_together(self):
+        students = [add_student(f"STUDENT {i}", f"07100000{i:02d}") for i in range(3)]
+        add_student("NO NUMBER", "12345")
+
+        response = self.post([{"student": s.pk, "message": "Amechelewa shule"} for s in Student.objects.all()])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"created": 4})
+        self.assertEqual(DisciplinaryMessage.objects.count(), 4)
+        self.assertEqual(
+            set(OutboundSMS.objects.filter(source="disciplinary").values_list("number", flat=True)),
+            {f"+2557100000{i:02d}" for i in range(len(students))},
+        )
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        def count_queries(students):
+            with CaptureQueriesContext(connection) as queries:
+                self.post([{"student": s.pk, "message": "Amechelewa shule"} for s in students])
+            return len(queries)
+
+        students = [add_student(f"STUDENT {i}", f"07100000{i:02d}") for i in range(12)]
+        count_queries(students[:1])  # fills the class teacher cache
+        self.assertEqual(count_queries(students[:2]), count_queries(students[2:]))
+
+    def test_unknown_student_is_reported_against_its_item(self):
+        student = add_student("AMINA JUMA", "0710000001")
+
+        response = self.post([{"student": student.pk, "message": "Sawa"}, {"student": 999, "message": "Sawa"}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn("student", response.json()[1])
+        self.assertFalse(DisciplinaryMessage.objects.exists())
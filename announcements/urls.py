@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import AnnouncementListCreateView
+from .views import AnnouncementListCreateView, DisciplinaryMessageBulkCreateView
 
 urlpatterns = [
     path('', AnnouncementListCreateView.as_view(), name='announcement-list-create'),
+    path('disciplinary/bulk/', DisciplinaryMessageBulkCreateView.as_view(), name='disciplinary-bulk-create'),
 ]
@@ -1,9 +1,29 @@
-from rest_framework import generics
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from .models import Announcement
-from .serializers import AnnouncementSerializer
+from .serializers import AnnouncementSerializer, DisciplinaryMessageSerializer
+from .disciplinary import create_disciplinary_messages
 
 class AnnouncementListCreateView(generics.ListCreateAPIView):
     queryset = Announcement.objects.all().order_by('-created_at')
     serializer_class = AnnouncementSerializer
 
     # No need to override perform_create here
+
+
+class DisciplinaryMessageBulkCreateView(APIView):
+    """
+    POST a list of {"student": id, "message": "..."}; every notice is saved
+    and its SMS queued in one batch.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = DisciplinaryMessageSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        records = create_disciplinary_messages(
+            (item["student"].pk, item["message"]) for item in serializer.validated_data
+        )
+        return Response({"created": len(records)}, status=status.HTTP_201_CREATED)
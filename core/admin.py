@@ -0,0 +1,44 @@
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from .models import OutboundSMS, SMSAuditLog
+
+
+@admin.register(OutboundSMS)
+class OutboundSMSAdmin(admin.ModelAdmin):
+    list_display = ("number", "source", "status", "attempts", "short_message", "created_at", "sent_at")
+    list_filter = ("status", "source", "created_at")
+    search_fields = ("number", "message", "message_id")
+    date_hierarchy = "created_at"
+    ordering = ("-created_at",)
+    readonly_fields = ("created_at", "sent_at", "message_id", "cost", "last_error", "locked_until")
+    actions = ["retry_messages"]
+
+    def short_message(self, obj):
+        return obj.message[:50] + "..." if len(obj.message) > 50 else obj.message
+    short_message.short_description = "Message"
+
+    @admin.action(description="🔁 Retry selected messages")
+    def retry_messages(self, request, queryset):
+        updated = queryset.exclude(status="sent").update(
+            status="pending",
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            locked_until=None,
+        )
+        self.message_user(request, f"{updated} message(s) queued for retry.", level=messages.SUCCESS)
+
+
+@admin.register(SMSAuditLog)
+class SMSAuditLogAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "number", "status", "source", "student", "exam_session")
+    list_filter = ("source", "exam_session", "created_at")
+    search_fields = ("number", "message", "status", "student__full_name", "student__admission_number")
+    list_select_related = ("student", "exam_session")
+    date_hierarchy = "created_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,109 @@
+"""
+Run work after the current transaction commits, on a small thread pool.
+
+Jobs must be safe to run twice and should record their own progress: the
+pool lives in the web process, so anything still running when a worker
+restarts is picked up again by the job's resume command.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+_timers = {}
+_timers_pid = None
+_timers_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide executor, recreated after a fork."""
+    global _executor, _executor_pid
+
+    if _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor_pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.BACKGROUND_WORKERS,
+                    thread_name_prefix="background",
+                )
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _run(fn, args, kwargs):
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Background job {fn.__name__} failed: {e}", exc_info=True)
+        raise
+    finally:
+        close_old_connections()
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Submit `fn(*args, **kwargs)` to the pool now. Returns the Future."""
+    return get_executor().submit(_run, fn, args, kwargs)
+
+
+def run_after_commit(fn, *args, **kwargs):
+    """Submit `fn` once the surrounding transaction has committed."""
+    transaction.on_commit(lambda: run_in_background(fn, *args, **kwargs))
+
+
+def run_debounced(key, delay, fn, *args, **kwargs):
+    """
+    Submit `fn` to the pool `delay` seconds after the last call with the
+    same key. Every call restarts the wait, so a burst of calls (e.g. one
+    per uploaded subject) runs `fn` once. Calls still waiting when the
+    process exits (a management command, a worker restart) are run by
+    flush_debounced instead of being dropped.
+    """
+    global _timers, _timers_pid
+
+    def fire():
+        with _timers_lock:
+            if _timers.get(key, (None,))[0] is timer:
+                del _timers[key]
+            else:
+                return  # already run by flush_debounced
+        run_in_background(fn, *args, **kwargs)
+
+    with _timers_lock:
+        if _timers_pid != os.getpid():
+            _timers, _timers_pid = {}, os.getpid()
+            atexit.register(flush_debounced)
+        previous = _timers.get(key)
+        if previous:
+            previous[0].cancel()
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        _timers[key] = (timer, fn, args, kwargs)
+        timer.start()
+
+
+def flush_debounced():
+    """Run every debounced call that is still waiting, now and in this thread."""
+    with _timers_lock:
+        if _timers_pid != os.getpid():
+            return
+        pending = list(_timers.values())
+        _timers.clear()
+
+    for timer, fn, args, kwargs in pending:
+        timer.cancel()
+        try:
+            _run(fn, args, kwargs)
+        except Exception:
+            pass  # logged by _run
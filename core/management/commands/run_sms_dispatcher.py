@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.outbox import claim_batch, dispatch_batch
+
+
+class Command(BaseCommand):
+    help = "Send queued SMS from the outbox (runs until stopped unless --once is given)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.SMS_DISPATCHER_CONCURRENCY,
+                            help="Provider requests sent in parallel")
+        parser.add_argument("--batch-size", type=int, default=settings.SMS_DISPATCH_BATCH_SIZE,
+                            help="Messages claimed from the outbox per cycle")
+        parser.add_argument("--max-attempts", type=int, default=settings.SMS_MAX_ATTEMPTS,
+                            help="Attempts before a message is marked failed")
+        parser.add_argument("--backoff", type=int, default=settings.SMS_RETRY_BACKOFF,
+                            help="Seconds before the first retry; doubles on each attempt")
+        parser.add_argument("--lease", type=int, default=settings.SMS_DISPATCH_LEASE,
+                            help="Seconds a claimed message stays locked to this worker")
+        parser.add_argument("--poll-interval", type=float, default=5,
+                            help="Seconds to sleep when the outbox is empty")
+        parser.add_argument("--once", action="store_true",
+                            help="Drain what is due now and exit")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f"📤 SMS dispatcher started (concurrency={options['concurrency']}, batch={options['batch_size']})"
+        ))
+
+        try:
+            while True:
+                close_old_connections()
+                rows = claim_batch(options["batch_size"], options["lease"])
+
+                if not rows:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                sent, retried, failed = dispatch_batch(
+                    rows,
+                    concurrency=options["concurrency"],
+                    max_attempts=options["max_attempts"],
+                    backoff=options["backoff"],
+                )
+                self.stdout.write(f"✔ Sent {sent} | 🔁 Retry later {retried} | ❌ Failed {failed}")
+
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("✅ SMS dispatcher stopped"))
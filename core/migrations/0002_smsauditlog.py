@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('results', '0003_alter_examsession_term'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSAuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(blank=True, max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('status', models.CharField(max_length=255)),
+                ('source', models.CharField(blank=True, max_length=50)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('exam_session', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sms_audit_logs', to='results.examsession')),
+                ('student', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sms_audit_logs', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'SMS Audit Log',
+                'verbose_name_plural': 'SMS Audit Logs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
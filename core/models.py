@@ -0,0 +1,73 @@
+from django.db import models
+from django.utils import timezone
+
+
+# ---------------- Outbound SMS ----------------
+class OutboundSMS(models.Model):
+    """
+    One queued message to one phone number.
+    Rows are written by the app and drained by `manage.py run_sms_dispatcher`.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    number = models.CharField(max_length=20)
+    message = models.TextField()
+    source = models.CharField(max_length=50, blank=True, help_text="e.g. announcement, disciplinary, results")
+    # Set by jobs that may run twice (e.g. announcement fan-out) so a message is only queued once
+    dedupe_key = models.CharField(max_length=100, unique=True, null=True, blank=True, editable=False)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    # Provider response
+    message_id = models.CharField(max_length=100, blank=True)
+    cost = models.CharField(max_length=30, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Outbound SMS"
+        verbose_name_plural = "Outbound SMS"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.number} ({self.status})"
+
+
+# ---------------- SMS Audit Log ----------------
+class SMSAuditLog(models.Model):
+    """
+    SMS events written by core.sms_audit when SMS_AUDIT_BACKEND = "db".
+    """
+    number = models.CharField(max_length=20, blank=True)
+    message = models.TextField(blank=True)
+    status = models.CharField(max_length=255)
+    source = models.CharField(max_length=50, blank=True)
+
+    student = models.ForeignKey(
+        "students.Student", on_delete=models.SET_NULL, null=True, blank=True, related_name="sms_audit_logs"
+    )
+    exam_session = models.ForeignKey(
+        "results.ExamSession", on_delete=models.SET_NULL, null=True, blank=True, related_name="sms_audit_logs"
+    )
+
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "SMS Audit Log"
+        verbose_name_plural = "SMS Audit Logs"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"{self.number} - {self.status}"
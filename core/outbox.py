@@ -0,0 +1,210 @@
+"""
+SMS outbox: queue messages in the database and send them from a worker.
+
+Request handlers call `enqueue_sms` and return straight away;
+`manage.py run_sms_dispatcher` drains the table with `dispatch_batch`.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import OutboundSMS
+from .sms_audit import log_sms
+from .sms_utils import get_gateway, parse_recipients, _chunked
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_sms(messages, source=""):
+    """
+    Queue messages for the dispatcher.
+    messages: iterable of (number, message) or (number, message, dedupe_key)
+    Rows whose dedupe_key is already in the outbox are skipped, so a job
+    that is re-run does not queue the same message twice.
+    Returns the number of rows submitted.
+    """
+    rows = []
+    for number, message, *key in messages:
+        if number and message:
+            rows.append(OutboundSMS(
+                number=number, message=message, source=source, dedupe_key=key[0] if key else None,
+            ))
+    OutboundSMS.objects.bulk_create(rows, batch_size=500, ignore_conflicts=any(r.dedupe_key for r in rows))
+    return len(rows)
+
+
+def claim_batch(limit, lease_seconds):
+    """
+    Lock up to `limit` due messages for this worker (plus earlier parts to the same numbers).
+    Rows left in 'sending' by a worker that died are picked up again once
+    their lease runs out. Every claim counts as an attempt, so a row that
+    keeps killing its worker still reaches max_attempts.
+
+    A row is only claimed together with every earlier unsent row to the same
+    number (e.g. the parts of one long message), so parts never go out of
+    order across batches, backoffs or workers.
+    """
+    now = timezone.now()
+    due = Q(status="pending", next_attempt_at__lte=now) | Q(status="sending", locked_until__lt=now)
+    unsent = Q(status__in=["pending", "sending"])
+    # An earlier part still waiting for its retry or held by another worker
+    waiting_sibling = OutboundSMS.objects.filter(unsent, number=OuterRef("number"), pk__lt=OuterRef("pk")).exclude(due)
+
+    with transaction.atomic():
+        rows = list(
+            OutboundSMS.objects.select_for_update(skip_locked=True)
+            .filter(due)
+            .exclude(Exists(waiting_sibling))
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+
+        if rows:
+            # Due earlier parts that `limit` cut off come along with the later ones
+            rows += list(
+                OutboundSMS.objects.select_for_update(skip_locked=True)
+                .filter(due, number__in={row.number for row in rows}, pk__lt=max(row.pk for row in rows))
+                .exclude(pk__in=[row.pk for row in rows])
+            )
+
+            # Earlier parts locked by another worker hold the later ones back
+            claimed = {row.pk for row in rows}
+            first_left_out = {}
+            left_out = (
+                OutboundSMS.objects.filter(unsent, number__in={row.number for row in rows}, pk__lt=max(claimed))
+                .exclude(pk__in=claimed)
+                .values_list("number", "pk")
+            )
+            for number, pk in left_out:
+                first_left_out[number] = min(pk, first_left_out.get(number, pk))
+            rows = [row for row in rows if row.pk < first_left_out.get(row.number, row.pk + 1)]
+
+        if rows:
+            OutboundSMS.objects.filter(pk__in=[r.pk for r in rows]).update(
+                status="sending",
+                locked_until=now + timedelta(seconds=lease_seconds),
+                attempts=F("attempts") + 1,
+            )
+            for row in rows:
+                row.attempts += 1
+    return rows
+
+
+def _send_group(message, numbers):
+    try:
+        return parse_recipients(get_gateway().send(numbers, message)), ""
+    except Exception as e:
+        logger.error(f"Outbox send failed for {len(numbers)} recipient(s): {e}", exc_info=True)
+        return {}, str(e)
+
+
+def _send_in_order(number, rows):
+    """
+    Send several messages to one number one after another (e.g. the parts
+    of a long results SMS), stopping at the first failure.
+    Returns {row pk: (info, error)}; rows after a failure are left out.
+    """
+    outcomes = {}
+    for row in rows:
+        parsed, error = _send_group(row.message, [number])
+        info = parsed.get(number)
+        outcomes[row.pk] = (info, error)
+        if not (info and info["ok"]):
+            break
+    return outcomes
+
+
+def _send_shared(message, numbers, rows_by_number):
+    parsed, error = _send_group(message, numbers)
+    return {rows_by_number[number].pk: (parsed.get(number), error) for number in numbers}
+
+
+def dispatch_batch(rows, concurrency=None, max_attempts=None, backoff=None, batch_size=None):
+    """
+    Send claimed rows and record the outcome of each one.
+    Numbers with a single row share provider requests with every other
+    number getting the same body. Numbers with several rows are sent in row
+    order within one job, so parts of a message arrive in sequence; when
+    one fails, the rest wait and are retried after it. Jobs run on up to
+    `concurrency` threads. Failed rows are retried with exponential backoff
+    until `max_attempts` is reached (attempts are counted in claim_batch).
+    Returns (sent, retried, failed) counts.
+    """
+    concurrency = concurrency or settings.SMS_DISPATCHER_CONCURRENCY
+    max_attempts = max_attempts or settings.SMS_MAX_ATTEMPTS
+    backoff = backoff if backoff is not None else settings.SMS_RETRY_BACKOFF
+    batch_size = batch_size or settings.AFRICASTALKING_BATCH_SIZE
+
+    by_number = {}
+    for row in sorted(rows, key=lambda r: r.pk):
+        by_number.setdefault(row.number, []).append(row)
+
+    # Single-row numbers: body -> {number: row}
+    shared = {}
+    jobs = []
+    for number, number_rows in by_number.items():
+        if len(number_rows) == 1:
+            shared.setdefault(number_rows[0].message, {})[number] = number_rows[0]
+        else:
+            jobs.append((_send_in_order, (number, number_rows)))
+    for message, rows_by_number in shared.items():
+        for chunk in _chunked(list(rows_by_number), batch_size):
+            jobs.append((_send_shared, (message, chunk, rows_by_number)))
+
+    outcomes = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for result in executor.map(lambda job: job[0](*job[1]), jobs):
+            outcomes.update(result)
+
+    now = timezone.now()
+    sent = retried = failed = 0
+
+    for number_rows in by_number.values():
+        retry_at = now
+        for row in number_rows:
+            row.locked_until = None
+            if row.pk not in outcomes:
+                # Not sent because an earlier part failed: not an attempt, goes out after that part
+                row.attempts -= 1
+                row.status = "pending"
+                row.next_attempt_at = retry_at
+                row.last_error = "Waiting for an earlier message to this number"
+                retried += 1
+                continue
+
+            info, error = outcomes[row.pk]
+            if info and info["ok"]:
+                row.status = "sent"
+                row.sent_at = now
+                row.message_id = info["message_id"] or ""
+                row.cost = info["cost"] or ""
+                row.last_error = ""
+                sent += 1
+            else:
+                row.last_error = error or (info["status"] if info else "No status returned")
+                if row.attempts >= max_attempts:
+                    row.status = "failed"
+                    failed += 1
+                else:
+                    row.status = "pending"
+                    row.next_attempt_at = now + timedelta(seconds=backoff * 2 ** (row.attempts - 1))
+                    retry_at = row.next_attempt_at
+                    retried += 1
+
+    OutboundSMS.objects.bulk_update(
+        rows,
+        ["status", "attempts", "locked_until", "sent_at", "message_id", "cost", "last_error", "next_attempt_at"],
+        batch_size=500,
+    )
+
+    for row in rows:
+        if row.status == "sent":
+            log_sms(row.number, row.message, "Sent", source=row.source)
+        elif row.status == "failed":
+            log_sms(row.number, row.message, f"Failed: {row.last_error}", source=row.source)
+    return sent, retried, failed
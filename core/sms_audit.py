@@ -0,0 +1,231 @@
+"""
+Structured SMS audit log.
+
+`log_sms` hands each record to a QueueHandler and returns straight away; a
+QueueListener thread writes it either as one JSON line to a rotating file
+that several gunicorn workers can share (SMS_AUDIT_BACKEND = "file") or to
+the SMSAuditLog table (SMS_AUDIT_BACKEND = "db"), where it can be filtered
+by student and exam session.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import date, datetime, timezone as dt_timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: no cross-process lock
+    fcntl = None
+
+from django.conf import settings
+from django.db import close_old_connections
+
+AUDIT_LOGGER_NAME = "sms.audit"
+
+_audit_logger = logging.getLogger(AUDIT_LOGGER_NAME)
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+# ---------------- Formatting ----------------
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line: time plus the fields passed to log_sms."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="seconds"),
+            **record.sms,
+        }
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# ---------------- File sink ----------------
+class LockingRotatingFileHandler(logging.FileHandler):
+    """
+    Appends under an exclusive flock on `<file>.lock` and rotates when the
+    file would grow past `max_bytes` or on the first write of a new day.
+    If another process has already rotated the file, the stale stream is
+    reopened before writing, so no worker keeps writing to a backup.
+    """
+
+    def __init__(self, filename, max_bytes=0, backup_count=5, daily=True, encoding="utf-8"):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        super().__init__(filename, mode="a", encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.daily = daily
+        self._lock_file = None
+
+    def _acquire_file_lock(self):
+        if fcntl is None:
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.baseFilename + ".lock", "a")
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _release_file_lock(self):
+        if fcntl is not None and self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            rotated = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self.stream.close()
+            self.stream = None
+
+    def _should_rollover(self, incoming_bytes):
+        try:
+            st = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            return False
+        if st.st_size == 0:
+            return False
+        if self.max_bytes and st.st_size + incoming_bytes > self.max_bytes:
+            return True
+        return self.daily and date.fromtimestamp(st.st_mtime) < date.today()
+
+    def _rollover(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+        if not self.backup_count:
+            open(self.baseFilename, "w").close()
+            return
+
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.baseFilename}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.baseFilename}.{i + 1}")
+        os.replace(self.baseFilename, f"{self.baseFilename}.1")
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+            self._acquire_file_lock()
+            try:
+                self._reopen_if_rotated()
+                if self._should_rollover(len(line.encode(self.encoding))):
+                    self._rollover()
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(line)
+                self.stream.flush()
+            finally:
+                self._release_file_lock()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+# ---------------- Database sink ----------------
+class DatabaseAuditHandler(logging.handlers.BufferingHandler):
+    """
+    Collects records and saves them with one bulk_create whenever the queue
+    has been drained or the buffer is full.
+    """
+
+    def __init__(self, source_queue, capacity=200):
+        super().__init__(capacity)
+        self.source_queue = source_queue
+
+    def shouldFlush(self, record):
+        return len(self.buffer) >= self.capacity or self.source_queue.empty()
+
+    def flush(self):
+        from .models import SMSAuditLog
+
+        self.acquire()
+        try:
+            if not self.buffer:
+                return
+            # Provider / exception text can run past the column sizes; one overlong
+            # value would fail the whole bulk insert and drop the buffer
+            limits = {
+                field.name: field.max_length
+                for field in SMSAuditLog._meta.concrete_fields
+                if field.get_internal_type() == "CharField"
+            }
+            rows = [
+                SMSAuditLog(
+                    created_at=datetime.fromtimestamp(record.created, tz=dt_timezone.utc),
+                    **{
+                        name: value[:limits[name]] if name in limits and isinstance(value, str) else value
+                        for name, value in record.sms.items()
+                    },
+                )
+                for record in self.buffer
+            ]
+            try:
+                close_old_connections()
+                SMSAuditLog.objects.bulk_create(rows, batch_size=500)
+            except Exception:
+                self.handleError(self.buffer[0])
+            self.buffer.clear()
+        finally:
+            self.release()
+
+
+# ---------------- Setup ----------------
+def _build_handler(source_queue):
+    if settings.SMS_AUDIT_BACKEND == "db":
+        return DatabaseAuditHandler(source_queue)
+
+    handler = LockingRotatingFileHandler(
+        settings.SMS_AUDIT_LOG_FILE,
+        max_bytes=settings.SMS_AUDIT_MAX_BYTES,
+        backup_count=settings.SMS_AUDIT_BACKUP_COUNT,
+        daily=settings.SMS_AUDIT_ROTATE_DAILY,
+    )
+    handler.setFormatter(JsonLinesFormatter())
+    return handler
+
+
+def get_audit_logger():
+    """
+    The queue-backed audit logger. The listener thread is started on first
+    use in each process (threads do not survive a gunicorn fork).
+    """
+    global _listener, _listener_pid
+
+    if _listener_pid != os.getpid():
+        with _listener_lock:
+            if _listener_pid != os.getpid():
+                source_queue = queue.Queue(-1)
+                _audit_logger.handlers = [logging.handlers.QueueHandler(source_queue)]
+                _audit_logger.setLevel(logging.INFO)
+                _audit_logger.propagate = False
+
+                _listener = logging.handlers.QueueListener(source_queue, _build_handler(source_queue))
+                _listener.start()
+                atexit.register(_listener.stop)
+                _listener_pid = os.getpid()
+    return _audit_logger
+
+
+def log_sms(number, message, status, source="", student=None, exam_session=None):
+    """Record one SMS event. `student` / `exam_session` may be instances or ids."""
+    get_audit_logger().info(status, extra={"sms": {
+        "number": number or "",
+        "message": message or "",
+        "status": status,
+        "source": source,
+        "student_id": getattr(student, "pk", student),
+        "exam_session_id": getattr(exam_session, "pk", exam_session),
+    }})
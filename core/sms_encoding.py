@@ -0,0 +1,117 @@
+"""
+SMS encoding, segmentation and cost estimation.
+
+A GSM-7 message fits 160 septets in one SMS; once it is concatenated each
+part carries 153 because of the UDH header, and extension characters such
+as [ ] { } € take two septets. Anything outside GSM-7 is sent as UCS-2:
+70 UTF-16 units in one SMS, 67 per concatenated part.
+"""
+
+from django.conf import settings
+
+# =======================================================
+# GSM-7 CHARACTER SET
+# =======================================================
+
+GSM_7_BASIC = (
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ"
+    " !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿"
+    "abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM_7_EXT = "^{}\\[~]|€"
+GSM_7 = set(GSM_7_BASIC + GSM_7_EXT)
+GSM_7_EXT_SET = set(GSM_7_EXT)
+
+GSM_SMS_LIMIT = 160
+GSM_SEGMENT_LIMIT = 153
+UCS2_SMS_LIMIT = 70
+UCS2_SEGMENT_LIMIT = 67
+
+
+def is_gsm7(text: str) -> bool:
+    return all(c in GSM_7 for c in text)
+
+
+def _char_widths(text: str, gsm: bool):
+    """Septets (GSM-7) or UTF-16 units (UCS-2) taken by each character."""
+    if gsm:
+        return [2 if c in GSM_7_EXT_SET else 1 for c in text]
+    return [2 if ord(c) > 0xFFFF else 1 for c in text]
+
+
+def message_length(text: str) -> int:
+    """Length in septets (GSM-7) or UTF-16 units (UCS-2)."""
+    return sum(_char_widths(text, is_gsm7(text)))
+
+
+def count_segments(text: str) -> int:
+    """Number of billable SMS parts needed to send `text` as one message."""
+    if not text:
+        return 0
+
+    gsm = is_gsm7(text)
+    widths = _char_widths(text, gsm)
+    if sum(widths) <= (GSM_SMS_LIMIT if gsm else UCS2_SMS_LIMIT):
+        return 1
+
+    # Escape sequences and surrogate pairs are never split across parts
+    limit = GSM_SEGMENT_LIMIT if gsm else UCS2_SEGMENT_LIMIT
+    segments, used = 1, 0
+    for width in widths:
+        if used + width > limit:
+            segments += 1
+            used = 0
+        used += width
+    return segments
+
+
+def split_message(message: str, separator: str = " | ") -> list[str]:
+    """
+    Plan how to send `message` with the fewest billable segments.
+    Fields (split on `separator`) are packed greedily into single-SMS
+    chunks; if sending the whole text as one concatenated message is
+    cheaper, that single message is returned instead.
+    """
+    if not message:
+        return []
+
+    gsm = is_gsm7(message)
+    limit = GSM_SMS_LIMIT if gsm else UCS2_SMS_LIMIT
+    sep_length = sum(_char_widths(separator, gsm))
+
+    chunks, current, used = [], [], 0
+    for part in message.split(separator):
+        length = sum(_char_widths(part, gsm))
+        if current and used + sep_length + length > limit:
+            chunks.append(separator.join(current).strip())
+            current, used = [], 0
+        used += length if not current else sep_length + length
+        current.append(part)
+    if current:
+        chunks.append(separator.join(current).strip())
+
+    chunk_segments = sum(count_segments(c) for c in chunks)
+    if count_segments(message) < chunk_segments:
+        return [message]
+    return chunks
+
+
+def estimate_cost(messages) -> dict:
+    """
+    Total segments and estimated price of a batch.
+    messages: iterable of message strings or (number, message) pairs
+    """
+    count = segments = 0
+    for item in messages:
+        text = item[1] if isinstance(item, tuple) else item
+        count += 1
+        segments += count_segments(text)
+
+    per_segment = getattr(settings, "SMS_COST_PER_SEGMENT", 0)
+    return {
+        "messages": count,
+        "segments": segments,
+        "cost": round(segments * per_segment, 2),
+        "currency": getattr(settings, "SMS_COST_CURRENCY", ""),
+    }
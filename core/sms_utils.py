@@ -1,25 +1,188 @@
-import africastalking
-from decouple import config
+import threading
+import time
 import logging
 
+import requests
+from requests.adapters import HTTPAdapter
+from africastalking import SMSService
+from africastalking.Service import AfricasTalkingException
+from django.conf import settings
+
 logger = logging.getLogger(__name__)
 
+
+class SMSThrottled(AfricasTalkingException):
+    """Raised when the provider answers 429 Too Many Requests."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    `rate` tokens are added per second, up to `burst`. acquire() blocks
+    until enough tokens are available instead of failing.
+    A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(self.rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                # A request larger than the bucket waits for a full bucket and goes into debt
+                needed = min(amount, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every sender back for `seconds` (e.g. after a 429)."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class _PooledSMSService(SMSService):
+    """
+    Africa's Talking SMS service that sends through a shared requests.Session
+    instead of opening a new connection for every message.
+    """
+
+    def __init__(self, username, api_key, session, timeout):
+        self._session = session
+        self._timeout = timeout
+        super().__init__(username, api_key)
+
+    def _make_request(self, url, method, headers, data, params, callback=None):
+        res = self._session.request(
+            method.upper(),
+            url,
+            headers=headers,
+            data=data,
+            params=params,
+            timeout=self._timeout,
+        )
+        if 200 <= res.status_code < 300:
+            if res.headers.get("content-type", "").startswith("application/json"):
+                return res.json()
+            return res.text
+        if res.status_code == 429:
+            retry_after = res.headers.get("Retry-After")
+            raise SMSThrottled(res.text, float(retry_after) if retry_after and retry_after.isdigit() else None)
+        raise AfricasTalkingException(res.text)
+
+
+class SMSGateway:
+    """
+    Process-wide Africa's Talking client.
+    Credentials are read once and the HTTP connection pool is kept alive
+    between calls. A single instance can be shared by all threads.
+
+    Every send goes through a token bucket (`rate` messages per second) and
+    at most `max_in_flight` provider requests run at once; callers wait
+    for capacity rather than fail. A 429 from the provider pauses all
+    senders and the request is retried up to `throttle_retries` times.
+    """
+
+    def __init__(self, username, api_key, sender_id, pool_size=10, timeout=30,
+                 rate=0, burst=None, max_in_flight=4, throttle_retries=3):
+        self.sender_id = sender_id or None
+        self.throttle_retries = throttle_retries
+
+        self._bucket = TokenBucket(rate, burst)
+        self._in_flight = threading.BoundedSemaphore(max(1, max_in_flight))
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+
+        self._sms = _PooledSMSService(username, api_key, self._session, timeout)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            username=settings.AFRICASTALKING_USERNAME,
+            api_key=settings.AFRICASTALKING_API_KEY,
+            sender_id=settings.AFRICASTALKING_SENDER_ID,
+            pool_size=getattr(settings, "AFRICASTALKING_POOL_SIZE", 10),
+            timeout=getattr(settings, "AFRICASTALKING_TIMEOUT", 30),
+            rate=getattr(settings, "SMS_RATE_LIMIT", 0),
+            burst=getattr(settings, "SMS_RATE_BURST", None),
+            max_in_flight=getattr(settings, "SMS_MAX_IN_FLIGHT", 4),
+        )
+
+    def send(self, numbers, message):
+        """Send one message to a list of numbers. Raises on provider errors."""
+        numbers = list(numbers)
+        attempt = 0
+        while True:
+            # One token per recipient: the provider bills and throttles per message
+            self._bucket.acquire(len(numbers))
+            try:
+                with self._in_flight:
+                    return self._sms.send(message, numbers, self.sender_id)
+            except SMSThrottled as e:
+                attempt += 1
+                wait = e.retry_after or 2 ** attempt
+                logger.warning(f"SMS provider throttled us; pausing {wait}s (attempt {attempt})")
+                if attempt > self.throttle_retries:
+                    raise
+                if self._bucket.rate > 0:
+                    self._bucket.pause(wait)
+                else:
+                    # Rate limiting is off, so there is no bucket to hold senders back: wait here
+                    time.sleep(wait)
+
+    def close(self):
+        self._session.close()
+
+
+# Africa's Talking status codes that mean the message was accepted
+SUCCESS_STATUS_CODES = {100, 101, 102}
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return the shared SMSGateway, building it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = SMSGateway.from_settings()
+    return _gateway
+
+
 def send_sms(numbers, message):
     """
     Send SMS using Africa's Talking.
     numbers: list of phone numbers (e.g. ['+255710000000'])
     message: plain text to send
     """
-    username = config("AFRICASTALKING_USERNAME")
-    api_key = config("AFRICASTALKING_API_KEY")
-    sender_id = config("AFRICASTALKING_SENDER_ID")
-
-    africastalking.initialize(username, api_key)
-    sms = africastalking.SMS
-
     try:
-        # ✅ This actually sends the message
-        response = sms.send(message, numbers, sender_id)
+        response = get_gateway().send(numbers, message)
 
         # Log details to the console only (not inside the SMS)
         logger.info(f"SMS sent successfully to {numbers}: {response}")
@@ -30,3 +193,73 @@ def send_sms(numbers, message):
     except Exception as e:
         logger.error(f"SMS sending failed: {e}", exc_info=True)
         return {"error": str(e)}
+
+
+def _chunked(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def parse_recipients(response):
+    """
+    Map each number in an Africa's Talking send response to its delivery info.
+    """
+    if not isinstance(response, dict):
+        return {}
+    recipients = response.get("SMSMessageData", {}).get("Recipients", [])
+    parsed = {}
+    for r in recipients:
+        status_code = r.get("statusCode")
+        parsed[r.get("number")] = {
+            "number": r.get("number"),
+            "status": r.get("status", ""),
+            "status_code": status_code,
+            "message_id": r.get("messageId"),
+            "cost": r.get("cost"),
+            "ok": status_code in SUCCESS_STATUS_CODES,
+        }
+    return parsed
+
+
+def send_bulk_sms(messages, batch_size=None):
+    """
+    Send many messages with as few provider calls as possible.
+    messages: iterable of (number, message) pairs
+    Recipients that get an identical body are sent together, in chunks of
+    at most AFRICASTALKING_BATCH_SIZE numbers per request.
+    Returns one status dict per recipient.
+    """
+    batch_size = batch_size or getattr(settings, "AFRICASTALKING_BATCH_SIZE", 100)
+
+    # Group numbers by body, keeping first-seen order and dropping repeats
+    grouped = {}
+    for number, message in messages:
+        numbers = grouped.setdefault(message, {})
+        numbers[number] = None
+
+    results = []
+    gateway = get_gateway()
+
+    for message, numbers in grouped.items():
+        for chunk in _chunked(list(numbers), batch_size):
+            try:
+                response = gateway.send(chunk, message)
+                logger.info(f"Bulk SMS sent to {len(chunk)} recipient(s): {response}")
+                parsed = parse_recipients(response)
+                error = ""
+            except Exception as e:
+                logger.error(f"Bulk SMS sending failed for {len(chunk)} recipient(s): {e}", exc_info=True)
+                parsed = {}
+                error = str(e)
+
+            for number in chunk:
+                results.append(parsed.get(number) or {
+                    "number": number,
+                    "status": error or "No status returned",
+                    "status_code": None,
+                    "message_id": None,
+                    "cost": None,
+                    "ok": False,
+                })
+
+    return results
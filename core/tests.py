@@ -0,0 +1,432 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import background, outbox, sms_utils
+from .models import OutboundSMS, SMSAuditLog
+from .sms_audit import DatabaseAuditHandler, JsonLinesFormatter, LockingRotatingFileHandler
+from .sms_encoding import count_segments, estimate_cost, message_length, split_message
+from .sms_utils import SMSGateway, SMSThrottled, TokenBucket
+
+
+def provider_response(status_code=201, payload=None, headers=None):
+    response = mock.Mock(status_code=status_code, text="", headers={"content-type": "application/json", **(headers or {})})
+    response.json.return_value = payload or {}
+    return response
+
+
+def recipients_payload(numbers, status_code=101):
+    return {"SMSMessageData": {"Recipients": [
+        {"number": number, "status": "Success", "statusCode": status_code, "messageId": f"ATX-{number}", "cost": "TZS 20"}
+        for number in numbers
+    ]}}
+
+
+# ---------------- Gateway ----------------
+class SMSGatewayTests(SimpleTestCase):
+    def setUp(self):
+        self.gateway = SMSGateway("sandbox", "key", "PARANGA")
+        self.addCleanup(self.gateway.close)
+
+    def test_get_gateway_builds_one_client(self):
+        with mock.patch.object(sms_utils, "_gateway", None):
+            self.assertIs(sms_utils.get_gateway(), sms_utils.get_gateway())
+
+    def test_send_reuses_the_session(self):
+        with mock.patch.object(self.gateway._session, "request") as request:
+            request.side_effect = lambda *args, **kwargs: provider_response(payload=recipients_payload(["+255710000001"]))
+            self.gateway.send(["+255710000001"], "Habari")
+            self.gateway.send(["+255710000001"], "Habari tena")
+
+        self.assertEqual(request.call_count, 2)
+        self.assertEqual(request.call_args.args[0], "POST")
+
+
+    def test_throttled_response_is_retried(self):
+        # Rate limiting is off by default, so the gateway itself waits
+        responses = [
+            provider_response(429, headers={"Retry-After": "0"}),
+            provider_response(payload=recipients_payload(["+255710000001"])),
+        ]
+        with mock.patch.object(self.gateway._session, "request", side_effect=responses), \
+                mock.patch.object(sms_utils.time, "sleep") as sleep:
+            response = self.gateway.send(["+255710000001"], "Habari")
+
+        self.assertEqual(response["SMSMessageData"]["Recipients"][0]["statusCode"], 101)
+        sleep.assert_called_once()
+
+    def test_throttled_too_often_raises(self):
+        gateway = SMSGateway("sandbox", "key", "PARANGA", throttle_retries=1)
+        self.addCleanup(gateway.close)
+        with mock.patch.object(gateway._session, "request", return_value=provider_response(429)), \
+                mock.patch.object(sms_utils.time, "sleep"):
+            with self.assertRaises(SMSThrottled):
+                gateway.send(["+255710000001"], "Habari")
+
+    def test_throttled_response_pauses_the_bucket(self):
+        gateway = SMSGateway("sandbox", "key", "PARANGA", rate=10)
+        self.addCleanup(gateway.close)
+        responses = [
+            provider_response(429, headers={"Retry-After": "3"}),
+            provider_response(payload=recipients_payload(["+255710000001"])),
+        ]
+        with mock.patch.object(gateway._session, "request", side_effect=responses), \
+                mock.patch.object(gateway._bucket, "pause") as pause:
+            gateway.send(["+255710000001"], "Habari")
+
+        pause.assert_called_once_with(3.0)
+
+
+# ---------------- Rate limiting ----------------
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = 100.0
+        self.sleeps = []
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.clock += seconds
+
+        clock = mock.Mock(monotonic=lambda: self.clock, sleep=sleep)
+        patcher = mock.patch.object(sms_utils, "time", clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_zero_rate_never_waits(self):
+        bucket = TokenBucket(0)
+        for _ in range(1000):
+            bucket.acquire(100)
+        self.assertEqual(self.sleeps, [])
+
+    def test_burst_then_waits_for_tokens(self):
+        bucket = TokenBucket(rate=8, burst=16)
+        bucket.acquire(16)
+        self.assertEqual(self.sleeps, [])
+
+        bucket.acquire(4)
+        self.assertEqual(self.sleeps, [0.5])
+
+    def test_request_larger_than_the_bucket_goes_into_debt(self):
+        bucket = TokenBucket(rate=8, burst=16)
+        bucket.acquire(40)
+        self.assertEqual(self.sleeps, [])
+
+        # 24 tokens owed plus the 8 asked for
+        bucket.acquire(8)
+        self.assertEqual(self.sleeps, [4.0])
+
+    def test_pause_holds_senders_back(self):
+        bucket = TokenBucket(rate=8, burst=16)
+        bucket.pause(2)
+        bucket.acquire(4)
+        self.assertEqual(self.sleeps, [2.5])
+
+
+# ---------------- Bulk sending ----------------
+class SendBulkSMSTests(SimpleTestCase):
+    def setUp(self):
+        self.gateway = mock.Mock()
+        self.gateway.send.side_effect = lambda numbers, message: recipients_payload(numbers)
+        patcher = mock.patch.object(sms_utils, "get_gateway", return_value=self.gateway)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_body_is_sent_in_chunks(self):
+        numbers = [f"+2557100000{i:02d}" for i in range(5)]
+        results = sms_utils.send_bulk_sms([(number, "Habari") for number in numbers], batch_size=2)
+
+        self.assertEqual([call.args[0] for call in self.gateway.send.call_args_list], [numbers[:2], numbers[2:4], numbers[4:]])
+        self.assertEqual([r["number"] for r in results], numbers)
+        self.assertTrue(all(r["ok"] for r in results))
+
+    def test_bodies_are_grouped_and_repeats_dropped(self):
+        messages = [
+            ("+255710000001", "A"),
+            ("+255710000002", "B"),
+            ("+255710000003", "A"),
+            ("+255710000001", "A"),
+        ]
+        results = sms_utils.send_bulk_sms(messages)
+
+        self.assertEqual(
+            [call.args for call in self.gateway.send.call_args_list],
+            [(["+255710000001", "+255710000003"], "A"), (["+255710000002"], "B")],
+        )
+        self.assertEqual(len(results), 3)
+
+    def test_failed_request_marks_its_recipients(self):
+        self.gateway.send.side_effect = [Exception("timeout"), recipients_payload(["+255710000002"])]
+        results = sms_utils.send_bulk_sms([("+255710000001", "A"), ("+255710000002", "B")])
+
+        self.assertEqual(results[0]["status"], "timeout")
+        self.assertFalse(results[0]["ok"])
+        self.assertTrue(results[1]["ok"])
+
+
+# ---------------- Outbox ----------------
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.gateway = mock.Mock()
+        self.gateway.send.side_effect = lambda numbers, message: recipients_payload(numbers)
+        for target, value in (("get_gateway", mock.Mock(return_value=self.gateway)), ("log_sms", mock.Mock())):
+            patcher = mock.patch.object(outbox, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def drain(self, limit=100):
+        return outbox.dispatch_batch(outbox.claim_batch(limit, 60), concurrency=1, max_attempts=3, backoff=30)
+
+    def sent_messages(self):
+        return [call.args[1] for call in self.gateway.send.call_args_list]
+
+    def test_enqueue_skips_repeated_dedupe_keys(self):
+        outbox.enqueue_sms([("+255710000001", "A", "key-1"), ("+255710000002", "B", "key-2")])
+        outbox.enqueue_sms([("+255710000001", "A", "key-1"), ("", "no number", "key-3")])
+
+        self.assertEqual(OutboundSMS.objects.count(), 2)
+
+    def test_shared_body_goes_out_in_one_request(self):
+        outbox.enqueue_sms([("+255710000001", "A"), ("+255710000002", "A")])
+
+        self.assertEqual(self.drain(), (2, 0, 0))
+        self.gateway.send.assert_called_once()
+        self.assertFalse(OutboundSMS.objects.exclude(status="sent").exists())
+
+    def test_failed_send_backs_off_then_fails(self):
+        self.gateway.send.side_effect = Exception("timeout")
+        outbox.enqueue_sms([("+255710000001", "A")])
+
+        self.assertEqual(self.drain(), (0, 1, 0))
+        row = OutboundSMS.objects.get()
+        self.assertEqual((row.status, row.attempts, row.last_error), ("pending", 1, "timeout"))
+        self.assertGreater(row.next_attempt_at, timezone.now() + timedelta(seconds=25))
+        # Not due yet
+        self.assertEqual(outbox.claim_batch(100, 60), [])
+
+        for expected in ((0, 1, 0), (0, 0, 1)):
+            OutboundSMS.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(self.drain(), expected)
+        self.assertEqual(OutboundSMS.objects.get().status, "failed")
+
+    def test_expired_lease_is_claimed_again(self):
+        outbox.enqueue_sms([("+255710000001", "A")])
+        self.assertEqual(len(outbox.claim_batch(100, 60)), 1)
+        self.assertEqual(outbox.claim_batch(100, 60), [])
+
+        OutboundSMS.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([row.attempts for row in outbox.claim_batch(100, 60)], [2])
+
+    def test_parts_to_one_number_go_out_in_order(self):
+        outbox.enqueue_sms([("+255710000001", f"part {i}") for i in (1, 2, 3)])
+
+        self.assertEqual(self.drain(), (3, 0, 0))
+        self.assertEqual(self.sent_messages(), ["part 1", "part 2", "part 3"])
+
+    def test_later_parts_wait_for_a_failed_part(self):
+        self.gateway.send.side_effect = [Exception("timeout")]
+        outbox.enqueue_sms([("+255710000001", f"part {i}") for i in (1, 2, 3)])
+
+        self.assertEqual(self.drain(), (0, 3, 0))
+        first, *later = OutboundSMS.objects.order_by("pk")
+        self.assertEqual(first.attempts, 1)
+        self.assertEqual([row.attempts for row in later], [0, 0])
+        self.assertTrue(all(row.next_attempt_at == first.next_attempt_at for row in later))
+
+        # A later part made due on its own is still held back by the first one
+        OutboundSMS.objects.filter(pk__in=[row.pk for row in later]).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.claim_batch(100, 60), [])
+
+        self.gateway.send.side_effect = lambda numbers, message: recipients_payload(numbers)
+        OutboundSMS.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(self.drain(), (3, 0, 0))
+        self.assertEqual(self.sent_messages()[1:], ["part 1", "part 2", "part 3"])
+
+    def test_earlier_parts_cut_by_the_limit_are_claimed(self):
+        outbox.enqueue_sms([("+255710000001", "part 1"), ("+255710000002", "B"), ("+255710000001", "part 2")])
+        now = timezone.now()
+        # Oldest due last, so a limit of 1 picks part 2 first
+        for row, seconds in zip(OutboundSMS.objects.order_by("pk"), (1, 3, 5)):
+            OutboundSMS.objects.filter(pk=row.pk).update(next_attempt_at=now - timedelta(seconds=seconds))
+
+        claimed = outbox.claim_batch(1, 60)
+        self.assertEqual(sorted(row.message for row in claimed), ["part 1", "part 2"])
+
+
+# ---------------- Segmentation ----------------
+class SegmentationTests(SimpleTestCase):
+    def test_gsm7_limits(self):
+        self.assertEqual(count_segments(""), 0)
+        self.assertEqual(count_segments("a" * 160), 1)
+        self.assertEqual(count_segments("a" * 161), 2)
+        self.assertEqual(count_segments("a" * 306), 2)
+        self.assertEqual(count_segments("a" * 307), 3)
+
+    def test_extension_characters_take_two_septets(self):
+        self.assertEqual(message_length("[€]"), 6)
+        self.assertEqual(count_segments("€" * 80), 1)
+        self.assertEqual(count_segments("€" * 81), 2)
+        # 306 septets would fit two parts of 153 if the escape sequence could be split
+        self.assertEqual(count_segments("a" * 152 + "€" + "a" * 152), 3)
+
+    def test_ucs2_limits(self):
+        self.assertEqual(count_segments("ş" * 70), 1)
+        self.assertEqual(count_segments("ş" * 71), 2)
+        self.assertEqual(count_segments("ş" * 134), 2)
+        self.assertEqual(count_segments("ş" * 135), 3)
+
+    def test_surrogate_pairs_are_not_split(self):
+        self.assertEqual(message_length("🎉"), 2)
+        self.assertEqual(count_segments("🎉" * 35), 1)
+        self.assertEqual(count_segments("🎉" * 36), 2)
+        # 134 units would fit two parts of 67 if a pair could be split
+        self.assertEqual(count_segments("aa" + "🎉" * 66), 3)
+
+    def test_split_keeps_fields_whole(self):
+        fields = [f"SUBJECT{i:02d}: {i}" for i in range(20)]
+        chunks = split_message(" | ".join(fields))
+
+        self.assertTrue(all(count_segments(chunk) == 1 for chunk in chunks))
+        self.assertEqual(" | ".join(chunks).split(" | "), fields)
+
+    def test_split_keeps_text_whole_when_cheaper(self):
+        # Two long fields: as chunks they take two SMS each, whole they take three parts
+        message = " | ".join(["a" * 200, "b" * 200])
+        self.assertEqual(split_message(message), [message])
+
+    @override_settings(SMS_COST_PER_SEGMENT=25, SMS_COST_CURRENCY="TZS")
+    def test_estimate_cost(self):
+        estimate = estimate_cost([("+255710000001", "a" * 161), "b"])
+        self.assertEqual(estimate, {"messages": 2, "segments": 3, "cost": 75, "currency": "TZS"})
+
+
+# ---------------- Audit Log ----------------
+def audit_record(status="Sent", **sms):
+    record = logging.LogRecord("sms.audit", logging.INFO, __file__, 0, status, None, None)
+    record.sms = {"number": "+255710000001", "message": "Habari", "status": status, "source": "results", **sms}
+    return record
+
+
+class AuditFileTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "sms_audit.jsonl")
+
+    def handler(self, **kwargs):
+        handler = LockingRotatingFileHandler(self.path, **kwargs)
+        handler.setFormatter(JsonLinesFormatter())
+        self.addCleanup(handler.close)
+        return handler
+
+    def read(self, path=None):
+        with open(path or self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_one_json_line_per_record(self):
+        handler = self.handler()
+        handler.emit(audit_record(student_id=4))
+        handler.emit(audit_record("Failed: timeout"))
+
+        lines = self.read()
+        self.assertEqual([line["status"] for line in lines], ["Sent", "Failed: timeout"])
+        self.assertEqual(lines[0]["student_id"], 4)
+        self.assertIn("time", lines[0])
+
+    def test_rotates_by_size_and_keeps_backup_count(self):
+        handler = self.handler(max_bytes=300, backup_count=2, daily=False)
+        for i in range(12):
+            handler.emit(audit_record(f"Sent {i}"))
+
+        self.assertTrue(os.path.exists(f"{self.path}.2"))
+        self.assertFalse(os.path.exists(f"{self.path}.3"))
+        self.assertLessEqual(os.path.getsize(self.path), 300)
+        self.assertEqual(self.read()[-1]["status"], "Sent 11")
+
+    def test_rotates_on_the_first_write_of_a_day(self):
+        handler = self.handler(daily=True)
+        handler.emit(audit_record("yesterday"))
+        yesterday = time.time() - 24 * 60 * 60
+        os.utime(self.path, (yesterday, yesterday))
+
+        handler.emit(audit_record("today"))
+        self.assertEqual([line["status"] for line in self.read()], ["today"])
+        self.assertEqual([line["status"] for line in self.read(f"{self.path}.1")], ["yesterday"])
+
+    def test_reopens_after_another_process_rotated(self):
+        handler = self.handler(daily=False)
+        handler.emit(audit_record("before"))
+        os.replace(self.path, f"{self.path}.1")
+
+        handler.emit(audit_record("after"))
+        self.assertEqual([line["status"] for line in self.read()], ["after"])
+
+
+@mock.patch("core.sms_audit.close_old_connections")
+class AuditDatabaseTests(TestCase):
+    def test_buffer_is_saved_when_the_queue_is_drained(self, close_old_connections):
+        source_queue = queue.Queue()
+        handler = DatabaseAuditHandler(source_queue)
+
+        source_queue.put("pending")
+        handler.handle(audit_record("Sent 1"))
+        self.assertFalse(SMSAuditLog.objects.exists())
+
+        source_queue.get()
+        handler.handle(audit_record("Sent 2"))
+        self.assertEqual(sorted(SMSAuditLog.objects.values_list("status", flat=True)), ["Sent 1", "Sent 2"])
+
+    def test_overlong_values_are_truncated(self, close_old_connections):
+        handler = DatabaseAuditHandler(queue.Queue())
+        handler.handle(audit_record("Failed: " + "x" * 400, number="+255" * 10, source="s" * 80))
+
+        row = SMSAuditLog.objects.get()
+        self.assertEqual((len(row.status), len(row.number), len(row.source)), (255, 20, 50))
+
+
+# ---------------- Debounced Jobs ----------------
+@mock.patch("core.background.close_old_connections")
+class DebounceTests(SimpleTestCase):
+    def setUp(self):
+        # Run jobs in the timer thread instead of the shared pool
+        patcher = mock.patch.object(background, "run_in_background", lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(background.flush_debounced)
+
+    def test_burst_runs_once_with_the_last_arguments(self, close_old_connections):
+        done = threading.Event()
+        job = mock.Mock(side_effect=lambda *args: done.set())
+        for i in range(5):
+            background.run_debounced("test:burst", 0.05, job, i)
+
+        self.assertTrue(done.wait(2))
+        time.sleep(0.1)
+        job.assert_called_once_with(4)
+
+    def test_waiting_calls_run_on_flush(self, close_old_connections):
+        job = mock.Mock()
+        background.run_debounced("test:flush", 60, job, "session-1")
+        job.assert_not_called()
+
+        background.flush_debounced()
+        job.assert_called_once_with("session-1")
+
+        # Flushed calls are gone and not run a second time
+        background.flush_debounced()
+        job.assert_called_once()
+
+    def test_flushed_timer_does_not_fire(self, close_old_connections):
+        job = mock.Mock()
+        background.run_debounced("test:fired", 0.05, job)
+        background.flush_debounced()
+        time.sleep(0.1)
+        job.assert_called_once()
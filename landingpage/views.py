@@ -1,8 +1,8 @@
 from django.shortcuts import render
-from django.db.models import Avg
+from django.db.models import Sum
 from students.models import Student
 from teachers.models import Teacher, Subject
-from results.models import ExamSession, ExamResult
+from results.models import ExamSession, StudentSessionSummary
 from announcements.models import Announcement
 from datetime import timedelta
 from django.utils import timezone
@@ -14,12 +14,20 @@ def landing_page(request):
     teachers_count = Teacher.objects.count()
     subjects_count = Subject.objects.count()
     exam_sessions_count = ExamSession.objects.count()
-    results_uploaded = ExamResult.objects.exclude(score__isnull=True).count()
 
-    performance_dict = {
-        f"Form {i}": ExamResult.objects.filter(student__form=i).aggregate(avg=Avg("score"))["avg"] or 0
-        for i in range(1, 5)
+    # Average score per form from the session summaries, in one query
+    per_form = {
+        row["student__form"]: row
+        for row in StudentSessionSummary.objects.values("student__form").annotate(
+            total=Sum("total"), scores=Sum("subjects_count")
+        )
     }
+    results_uploaded = sum(row["scores"] or 0 for row in per_form.values())
+
+    performance_dict = {}
+    for i in range(1, 5):
+        row = per_form.get(i)
+        performance_dict[f"Form {i}"] = row["total"] / row["scores"] if row and row["scores"] else 0
 
     # Convert dict to lists for Chart.js
     performance_labels = list(performance_dict.keys())
@@ -233,6 +233,73 @@ SIMPLE_JWT = {
 AFRICASTALKING_USERNAME = config("AFRICASTALKING_USERNAME", default="dispute_app")
 AFRICASTALKING_API_KEY = config("AFRICASTALKING_API_KEY", default="atsk_default_api_key")
 AFRICASTALKING_SENDER_ID = config("AFRICASTALKING_SENDER_ID", default="PARANGASEC")
+AFRICASTALKING_POOL_SIZE = config("AFRICASTALKING_POOL_SIZE", cast=int, default=10)
+AFRICASTALKING_TIMEOUT = config("AFRICASTALKING_TIMEOUT", cast=int, default=30)
+AFRICASTALKING_BATCH_SIZE = config("AFRICASTALKING_BATCH_SIZE", cast=int, default=100)
+
+# Outgoing SMS rate limit for every sender in a process (0 = unlimited)
+SMS_RATE_LIMIT = config("SMS_RATE_LIMIT", cast=float, default=10)
+SMS_RATE_BURST = config("SMS_RATE_BURST", cast=int, default=100)
+SMS_MAX_IN_FLIGHT = config("SMS_MAX_IN_FLIGHT", cast=int, default=4)
+
+# SMS outbox dispatcher (manage.py run_sms_dispatcher)
+SMS_DISPATCHER_CONCURRENCY = config("SMS_DISPATCHER_CONCURRENCY", cast=int, default=4)
+SMS_DISPATCH_BATCH_SIZE = config("SMS_DISPATCH_BATCH_SIZE", cast=int, default=500)
+SMS_DISPATCH_LEASE = config("SMS_DISPATCH_LEASE", cast=int, default=300)
+SMS_MAX_ATTEMPTS = config("SMS_MAX_ATTEMPTS", cast=int, default=5)
+SMS_RETRY_BACKOFF = config("SMS_RETRY_BACKOFF", cast=int, default=30)
+
+# Price of one SMS segment, used for cost previews before bulk sends
+SMS_COST_PER_SEGMENT = config("SMS_COST_PER_SEGMENT", cast=float, default=25)
+SMS_COST_CURRENCY = config("SMS_COST_CURRENCY", default="TZS")
+
+# SMS audit log: "file" (JSON lines, rotated) or "db" (core.SMSAuditLog)
+SMS_AUDIT_BACKEND = config("SMS_AUDIT_BACKEND", default="file")
+SMS_AUDIT_LOG_FILE = config("SMS_AUDIT_LOG_FILE", default=str(BASE_DIR / "logs" / "sms_audit.jsonl"))
+SMS_AUDIT_MAX_BYTES = config("SMS_AUDIT_MAX_BYTES", cast=int, default=10 * 1024 * 1024)
+SMS_AUDIT_BACKUP_COUNT = config("SMS_AUDIT_BACKUP_COUNT", cast=int, default=14)
+SMS_AUDIT_ROTATE_DAILY = config("SMS_AUDIT_ROTATE_DAILY", cast=bool, default=True)
+
+# Threads for post-commit background jobs (core.background)
+BACKGROUND_WORKERS = config("BACKGROUND_WORKERS", cast=int, default=2)
+
+# Recipients processed per step of an announcement SMS fan-out
+ANNOUNCEMENT_FANOUT_CHUNK = config("ANNOUNCEMENT_FANOUT_CHUNK", cast=int, default=500)
+
+# Seconds a worker may reuse its class-teacher map for disciplinary SMS
+CLASS_TEACHER_CACHE_TIMEOUT = config("CLASS_TEACHER_CACHE_TIMEOUT", cast=int, default=300)
+
+# Announcement attachments are optimized after upload (announcements.attachments)
+ATTACHMENT_OPTIMIZE_MIN_BYTES = config("ATTACHMENT_OPTIMIZE_MIN_BYTES", cast=int, default=100 * 1024)
+ATTACHMENT_RECOMPRESS_FLATE_BYTES = config("ATTACHMENT_RECOMPRESS_FLATE_BYTES", cast=int, default=2 * 1024 * 1024)
+ATTACHMENT_DOWNLOAD_TIMEOUT = config("ATTACHMENT_DOWNLOAD_TIMEOUT", cast=int, default=60)
+
+# --------------------------------------------------------------
+# Results
+# --------------------------------------------------------------
+# Seconds a computed class ranking stays cached (also dropped on score changes)
+RESULTS_RANKING_CACHE_TIMEOUT = config("RESULTS_RANKING_CACHE_TIMEOUT", cast=int, default=300)
+
+# Filled rows accepted in one teacher score sheet (see results/uploads.py)
+RESULTS_UPLOAD_MAX_ROWS = config("RESULTS_UPLOAD_MAX_ROWS", cast=int, default=2000)
+
+# Largest teacher score sheet accepted, in bytes (checked before the file is stored)
+RESULTS_UPLOAD_MAX_BYTES = config("RESULTS_UPLOAD_MAX_BYTES", cast=int, default=5 * 1024 * 1024)
+
+# Seconds after which an upload still 'processing' is taken to have lost its
+# worker and may be picked up again
+RESULTS_UPLOAD_STALE_AFTER = config("RESULTS_UPLOAD_STALE_AFTER", cast=int, default=600)
+
+# Seconds to wait after the last score change of a session before its summaries
+# are recomputed; uploads of several subjects within this window share one run
+RESULTS_SUMMARY_DEBOUNCE = config("RESULTS_SUMMARY_DEBOUNCE", cast=float, default=5)
+
+# Grade scales per exam type and year (see results/grading.py); first match wins,
+# anything unmatched uses the NECTA CSEE scale. Example:
+# RESULTS_GRADING_SCALES = [
+#     {"term": "Monthly Test", "from_year": 2026, "thresholds": (80, 70, 50, 35)},
+# ]
+RESULTS_GRADING_SCALES = []
 
 # --------------------------------------------------------------
 # Jazzmin Admin Configuration
@@ -9,12 +9,14 @@ from datetime import date
 from PIL import Image
 import numpy as np
 
-from .models import ExamSession, SubjectAssignment, ExamResult
+from .models import ExamSession, SubjectAssignment, ExamResult, StudentSessionSummary, ScoreUpload
 from students.models import Student
 from teachers.models import Subject
-from .utils import get_grade_and_remark, score_to_necta_point, get_division_from_total_points
+from .grading import scale_for_session
 
-from .sms_utils import send_student_sms 
+from .sms_utils import iter_session_sms, plan_results_sms, queue_results_sms
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
 
 
 from reportlab.lib.pagesizes import A4
@@ -25,6 +27,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
 import datetime
 from django.http import HttpResponse
+import json
 import logging
 from datetime import datetime
 
@@ -48,38 +51,6 @@ from students.models import Student
 from teachers.models import Subject
 
 
-# Utility functions
-def get_necta_grade(score):
-    if score is None:
-        return "-"
-    if score >= 75: return "A"
-    if score >= 65: return "B"
-    if score >= 45: return "C"
-    if score >= 30: return "D"
-    if score >= 20: return "E"
-    return "F"
-
-def necta_points(score):
-    if score is None:
-        return 0
-    if score >= 75: return 1
-    if score >= 65: return 2
-    if score >= 45: return 3
-    if score >= 30: return 4
-    return 5  # F
-
-def get_division(total_points):
-    if total_points <= 17: return "I"
-    if total_points <= 21: return "II"
-    if total_points <= 25: return "III"
-    if total_points <= 33: return "IV"
-    return "0"
-
-
-
-
-
-
 # -------------------- ExamSession Admin --------------------
 @admin.register(ExamSession)
 class ExamSessionAdmin(admin.ModelAdmin):
@@ -251,33 +222,6 @@ class ExportScopeForm(forms.Form):
     )
 
 
-# -------------------- Helper: NECTA Grading --------------------
-def get_grade_and_remark(score):
-    if score is None or pd.isna(score):
-        return "–", "No Score"
-
-    try:
-        score = float(score)
-    except (ValueError, TypeError):
-        return "–", "Invalid"
-
-    if score >= 75:
-        return "A", "Excellent"
-    elif score >= 65:
-        return "B", "Very Good"
-    elif score >= 45:
-        return "C", "Good"
-    elif score >= 30:
-        return "D", "Satisfactory"
-    elif score >= 20:
-        return "E", "Unsatisfactory"
-    else:
-        return "F", "Fail"
-
-# ---------------- NECTA GPA POINTS ----------------
-
-
-
 # -------------------- ExamResult Admin --------------------
 # -------------------- ExamResult Admin --------------------
 @admin.register(ExamResult)
@@ -308,34 +252,11 @@ class ExamResultAdmin(admin.ModelAdmin):
             self.message_user(request, "No results selected.", level=messages.ERROR)
             return
 
-        # -------------------- Helper Functions --------------------
-        def get_grade_and_remark(score):
-            if score >= 75: return "A", "Excellent"
-            elif score >= 65: return "B", "Very Good"
-            elif score >= 45: return "C", "Good"
-            elif score >= 30: return "D", "Pass"
-            else: return "F", "Fail"
-
-        # GPA points mapping (different from score points)
-        def get_gpa_points(score):
-            if score >= 75: return 5
-            elif score >= 65: return 4
-            elif score >= 45: return 3
-            elif score >= 30: return 2
-            else: return 0
-
-        # Score points for division calculation (NECTA)
-        def get_score_points(score):
-            if score >= 75: return 1
-            elif score >= 65: return 2
-            elif score >= 45: return 3
-            elif score >= 30: return 4
-            else: return 5
-
         # -------------------- Detect Export Scope --------------------
         exam_session = queryset.first().assignment.exam_session
         selected_form = exam_session.form
         selected_stream = exam_session.stream
+        scale = scale_for_session(exam_session)
 
         same_form_sessions = ExamSession.objects.filter(
             form=selected_form,
@@ -346,13 +267,13 @@ class ExamResultAdmin(admin.ModelAdmin):
         if same_form_sessions.count() > 1:
             all_results = ExamResult.objects.filter(
                 assignment__exam_session__in=same_form_sessions
-            ).select_related("student", "assignment", "assignment__subject", "assignment__exam_session")
+            ).select_related("assignment__subject", "assignment__exam_session")
             students = Student.objects.filter(form=selected_form).order_by("admission_number")
             export_scope = f"Form {selected_form} (All Streams)"
         else:
             all_results = ExamResult.objects.filter(
                 assignment__exam_session=exam_session
-            ).select_related("student", "assignment", "assignment__subject", "assignment__exam_session")
+            ).select_related("assignment__subject", "assignment__exam_session")
             students = Student.objects.filter(form=selected_form, stream=selected_stream).order_by("admission_number")
             export_scope = f"Form {selected_form} {selected_stream}"
 
@@ -362,17 +283,18 @@ class ExamResultAdmin(admin.ModelAdmin):
 
         # -------------------- Build Student Result Data --------------------
         student_results = {
-            s.admission_number: {"Full Name": s.full_name, "Stream": s.stream, "Gender": s.gender}
+            s.id: {"Full Name": s.full_name, "Stream": s.stream, "Gender": s.gender}
             for s in students
         }
 
         for result in all_results:
-            subj_name = result.assignment.subject.code
-            student_results[result.student.admission_number][subj_name] = result.score
+            # Results of students who have since left the form are not exported
+            if result.student_id in student_results:
+                student_results[result.student_id][result.assignment.subject.code] = result.score
 
         rows, missing_count = [], 0
         for student in students:
-            s_data = student_results.get(student.admission_number, {})
+            s_data = student_results.get(student.id, {})
             total, count = 0, 0
             row = {
                 "Admission No": student.admission_number,
@@ -395,37 +317,7 @@ class ExamResultAdmin(admin.ModelAdmin):
                 missing_count += 1
 
             mean = round(total / count, 2) if count else 0
-            grade, remark = get_grade_and_remark(mean)
-            row.update({"Total": total, "Mean": mean, "Grade": grade, "Remark": remark})
-
-            # ---------------- NECTA Division (Best 7 Subjects) ----------------
-            valid_scores = [v for k, v in s_data.items() if isinstance(v, (int, float)) and not pd.isna(v)]
-            best7_scores = sorted(valid_scores, reverse=True)[:7]
-
-            if len(valid_scores) < 7:
-                row["Division"] = "N/A"
-                row["Division Points"] = None
-                row["Remark"] = "Insufficient Subjects"
-            else:
-                best7_points = [get_score_points(s) for s in best7_scores]
-                total_points = sum(best7_points)
-                passed_subjects = len([s for s in best7_scores if s >= 30])
-                if passed_subjects < 2:
-                    division = "0"
-                elif total_points <= 17:
-                    division = "I"
-                elif total_points <= 21:
-                    division = "II"
-                elif total_points <= 25:
-                    division = "III"
-                elif total_points <= 33:
-                    division = "IV"
-                else:
-                    division = "0"
-
-                row["Division Points"] = total_points
-                row["Division"] = division
-
+            row.update({"Total": total, "Mean": mean})
             rows.append(row)
 
         # ---------------- DataFrame & Sorting --------------------
@@ -441,6 +333,19 @@ class ExamResultAdmin(admin.ModelAdmin):
         numeric_cols = all_subjects + ["Total", "Mean", "Division Points"]
         df[numeric_cols] = df[numeric_cols].replace([np.inf, -np.inf], np.nan)
 
+        # ---------------- Grades & NECTA Division (Best 7 Subjects) --------------------
+        df["Grade"] = scale.grades_array(df["Mean"])
+        df["Remark"] = scale.remarks_array(df["Mean"])
+
+        graded = scale.grade_session(df[all_subjects].to_numpy(dtype=float))
+        insufficient = graded["counts"] < scale.best_of
+        # At least two passes among the best subjects, otherwise Division 0
+        passes = np.minimum((graded["points"] < scale.points_table[-1]).sum(axis=1), scale.best_of)
+
+        df["Division"] = np.where(insufficient, "N/A", np.where(passes < 2, "0", graded["divisions"]))
+        df["Division Points"] = np.where(insufficient, np.nan, graded["totals"])
+        df.loc[insufficient, "Remark"] = "Insufficient Subjects"
+
         # ---------------- Global Sorting by Total/Mean --------------------
         df = df.sort_values(by=["Total", "Mean"], ascending=False).reset_index(drop=True)
         df.index += 1
@@ -534,18 +439,18 @@ class ExamResultAdmin(admin.ModelAdmin):
             summary_header_fmt = workbook.add_format({'bold': True, 'bg_color': '#D9E1F2', 'border': 1, 'align': 'center'})
             summary_cell_fmt = workbook.add_format({'border': 1, 'align': 'center'})
 
+            subject_scores = df[all_subjects].to_numpy(dtype=float)
+            subject_grades = scale.grades_array(subject_scores)
+            subject_points = scale.points_array(subject_scores)
+            bands = scale.bands()
+
             subject_summary = []
-            for subj in all_subjects:
-                subj_scores = df[subj].dropna()
-                subj_total = len(subj_scores)
-                a_count = sum(subj_scores >= 75)
-                b_count = sum((subj_scores >= 65) & (subj_scores < 75))
-                c_count = sum((subj_scores >= 45) & (subj_scores < 65))
-                d_count = sum((subj_scores >= 30) & (subj_scores < 45))
-                f_count = sum(subj_scores < 30)
-                subject_summary.append([subj, subj_total, a_count, b_count, c_count, d_count, f_count])
-
-            summary_cols = ["Subject", "Total Students", "A (75-100)", "B (65-74)", "C (45-64)", "D (30-44)", "F (<30)"]
+            for col, subj in enumerate(all_subjects):
+                grades = subject_grades[:, col]
+                counts = [int((grades == grade).sum()) for grade, _ in bands]
+                subject_summary.append([subj, int((grades != "").sum())] + counts)
+
+            summary_cols = ["Subject", "Total Students"] + [label for _, label in bands]
             for col_num, col_name in enumerate(summary_cols):
                 sheet.write(subject_summary_start, col_num, col_name, summary_header_fmt)
 
@@ -558,15 +463,12 @@ class ExamResultAdmin(admin.ModelAdmin):
             gpa_table_start_col = len(summary_cols) + 2
             subject_gpa_rows = []
 
-            for subj in all_subjects:
-                subj_scores = df[subj].dropna()
-                if subj_scores.empty:
-                    avg_points = None
-                else:
-                    points = [score_to_necta_point(s) for s in subj_scores]
-                    avg_points = round(sum(points) / len(points), 2)
+            for col, subj in enumerate(all_subjects):
+                points = subject_points[:, col]
+                points = points[~np.isnan(points)]
+                avg_points = round(float(points.mean()), 2) if points.size else None
 
-                subject_gpa_rows.append([subj, avg_points, len(subj_scores)])
+                subject_gpa_rows.append([subj, avg_points, int(points.size)])
 
             gpa_summary_cols = ["Subject", "Average NECTA Points", "Total Students"]
             for col_num, col_name in enumerate(gpa_summary_cols):
@@ -592,25 +494,13 @@ class ExamResultAdmin(admin.ModelAdmin):
 
             # ---------------- Overall School GPA and Comment --------------------
             # ---------------- Overall School GPA and Comment (Corrected) --------------------
-            all_student_points = []
-
-            for student in students:
-                # Get all results for this student in this exam session
-                student_results_qs = all_results.filter(student=student)
-                student_points = []
-
-                for res in student_results_qs:
-                    if res.score is not None:
-                        student_points.append(score_to_necta_point(res.score))
-
-                if student_points:
-                    # Average points for this student
-                    avg_student_points = sum(student_points) / len(student_points)
-                    all_student_points.append(avg_student_points)
+            # Average points of every student with at least one score
+            graded_rows = subject_points[~np.isnan(subject_points).all(axis=1)]
+            all_student_points = np.nanmean(graded_rows, axis=1) if graded_rows.size else []
 
             # Compute overall school GPA as mean of individual student GPAs
-            if all_student_points:
-                school_gpa = round(np.nanmean(all_student_points), 2)
+            if len(all_student_points):
+                school_gpa = round(float(np.mean(all_student_points)), 2)
             else:
                 school_gpa = 0
 
@@ -653,7 +543,7 @@ class ExamResultAdmin(admin.ModelAdmin):
             # Conditional formatting for failing subjects
             for col_num, subj in enumerate(all_subjects, start=4):
                 sheet.conditional_format(start_table + 1, col_num, start_table + len(df), col_num, {
-                    'type': 'cell', 'criteria': '<', 'value': 40,
+                    'type': 'cell', 'criteria': '<', 'value': scale.pass_mark,
                     'format': workbook.add_format({'bg_color': '#FF9999', 'border': 1})
                 })
 
@@ -701,7 +591,6 @@ class ExamResultAdmin(admin.ModelAdmin):
             self.message_user(request, "Please select at least one result.", level=messages.ERROR)
             return
 
-        exam_session = queryset.first().assignment.exam_session
         success = 0
         failed = 0
 
@@ -711,30 +600,52 @@ class ExamResultAdmin(admin.ModelAdmin):
         # Simulate Django GET request log at start
         logger.info(f'[{datetime.now():%d/%b/%Y %H:%M:%S}] "GET {request.path}?q=&o=-1 HTTP/1.1" 200 0')
 
-        logger.info(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] Starting SMS sending for {queryset.count()} student(s) in {exam_session.term} {exam_session.year}")
-
-        for result in queryset:
-            student = result.student
-            parent_phone = student.parent_contact
-
-            if not parent_phone:
-                failed += 1
-                logger.warning(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] WARNING: Parent contact missing for {student.full_name} (Admission: {student.admission_number})")
-                continue
+        # Selected rows are one per subject: collapse to distinct students per session.
+        # The confirmation posts these back as one field instead of every row pk
+        selected = {}
+        targets = request.POST.get("sms_targets")
+        if targets:
+            for session_id, student_ids in json.loads(targets).items():
+                selected[int(session_id)] = {int(pk) for pk in student_ids}
+        else:
+            for session_id, student_id in queryset.values_list("assignment__exam_session_id", "student_id").distinct():
+                selected.setdefault(session_id, set()).add(student_id)
 
+        entries = []
+        for exam_session in ExamSession.objects.filter(pk__in=selected):
+            student_ids = selected[exam_session.pk]
+            logger.info(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] Building SMS for {len(student_ids)} student(s) in {exam_session.term} {exam_session.year}")
             try:
-                if send_student_sms(student, exam_session):
-                    success += 1
-                    logger.info(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] SUCCESS: SMS sent to {student.parent_name} (Student: {student.full_name}, Admission: {student.admission_number})")
-                else:
-                    failed += 1
-                    logger.warning(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] FAILED: SMS NOT sent to {student.parent_name} (Student: {student.full_name}, Admission: {student.admission_number})")
+                entries.extend(iter_session_sms(exam_session, student_ids))
             except Exception as e:
-                failed += 1
-                logger.error(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] ERROR sending SMS to {student.parent_name} (Student: {student.full_name}, Admission: {student.admission_number}) | Exception: {e}")
+                failed += len(student_ids)
+                logger.error(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] ERROR building SMS for {exam_session} | Exception: {e}")
+
+        # Show the segment count and estimated cost before anything is queued
+        if request.POST.get("confirm") != "yes":
+            plan = plan_results_sms(entries)
+            context = {
+                **self.admin_site.each_context(request),
+                "title": "Confirm results SMS",
+                "opts": self.model._meta,
+                # One row pk so the admin runs the action again; the students travel in sms_targets
+                "selected": queryset.values_list("pk", flat=True)[:1],
+                "sms_targets": json.dumps({session_id: sorted(ids) for session_id, ids in selected.items()}),
+                "students": plan["students"],
+                "parents": len(plan["parents"]),
+                "failed": plan["failed"] + failed,
+                "estimate": plan["estimate"],
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            }
+            return TemplateResponse(request, "admin/results/examresult/send_sms_confirmation.html", context)
+
+        # One set of messages per parent number; siblings are combined where it saves SMS
+        queued, not_queued, parents = queue_results_sms(entries)
+        success += queued
+        failed += not_queued
 
         # Summary logs
-        logger.info(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] SMS sending complete. Success: {success}, Failed: {failed}")
+        logger.info(f"[{datetime.now():%d/%b/%Y %H:%M:%S}] SMS queueing complete. Queued: {success}, Parents: {parents}, Failed: {failed}")
 
         # Simulate Django POST request log at end
         logger.info(f'[{datetime.now():%d/%b/%Y %H:%M:%S}] "POST {request.path}?q=&o=-1 HTTP/1.1" 302 0')
@@ -742,7 +653,7 @@ class ExamResultAdmin(admin.ModelAdmin):
         # Admin feedback
         self.message_user(
             request,
-            f"SMS sending complete. ✅ Success: {success} | ⚠️ Failed: {failed}",
+            f"SMS queued for sending. ✅ Students: {success} | 👪 Parents: {parents} | ⚠️ Failed: {failed}",
             level=messages.SUCCESS
         )
 
@@ -790,47 +701,7 @@ class ExamResultAdmin(admin.ModelAdmin):
             ).values_list('subject_id', flat=True)
         ).order_by("name")
 
-        # ----------------------------------------
-        # NECTA GRADING SYSTEM
-        # ----------------------------------------
-        def get_necta_grade(score):
-            if score is None: return "-"
-            if score >= 75: return "A"
-            if score >= 65: return "B"
-            if score >= 45: return "C"
-            if score >= 30: return "D"
-            return "F"
-
-        def necta_points(score):
-            if score is None: return 0
-            if score >= 75: return 1
-            if score >= 65: return 2
-            if score >= 45: return 3
-            if score >= 30: return 4
-            return 5
-
-        def get_division(total_points):
-            if total_points <= 17: return "Daraja I"
-            elif total_points <= 21: return "Daraja II"
-            elif total_points <= 25: return "Daraja III"
-            elif total_points <= 33: return "Daraja IV"
-            else: return "Daraja 0"
-
-        # ----------------------------------------
-        # MAONI KWA KIWANGO CHA MTIHANI (NECTA REMARKS IN SWAHILI)
-        # ----------------------------------------
-        def get_remark(score):
-            if score is None:
-                return "-"
-            if score >= 75:
-                return "Vizuri Sana"
-            if score >= 65:
-                return "Vizuri"
-            if score >= 45:
-                return "Wastani"
-            if score >= 30:
-                return "Dhaifu"
-            return "Mbaya Sana"
+        scale = scale_for_session(exam_session)
 
         # Optional: Convert terms to Swahili
         def sw_term(term):
@@ -845,30 +716,26 @@ class ExamResultAdmin(admin.ModelAdmin):
         # ----------------------------------------
         students_data = []
 
-        for student in students:
-            results = ExamResult.objects.filter(
-                student=student,
-                assignment__exam_session__form=form,
-                assignment__exam_session__stream=stream
-            ).select_related("assignment__subject")
+        # Every Mid Term / Annual score of the class in one query; the first
+        # result (lowest pk) of a student, subject and term wins
+        scores = {}
+        class_results = ExamResult.objects.filter(
+            assignment__exam_session__form=form,
+            assignment__exam_session__stream=stream,
+            assignment__exam_session__term__in=["Mid Term", "Annual"],
+        ).order_by("pk").values_list(
+            "student_id", "assignment__subject_id", "assignment__exam_session__term", "score"
+        )
+        for student_id, subject_id, term, score in class_results:
+            scores.setdefault((student_id, subject_id, term), score)
 
+        for student in students:
             student_subjects = []
             points_list = []
 
             for subj in subjects:
-
-                mid = results.filter(
-                    assignment__subject=subj,
-                    assignment__exam_session__term="Mid Term"
-                ).first()
-
-                ann = results.filter(
-                    assignment__subject=subj,
-                    assignment__exam_session__term="Annual"
-                ).first()
-
-                mid_score = mid.score if mid else None
-                ann_score = ann.score if ann else None
+                mid_score = scores.get((student.id, subj.id, "Mid Term"))
+                ann_score = scores.get((student.id, subj.id, "Annual"))
 
                 # SIMPLE AVERAGE
                 if mid_score is not None and ann_score is not None:
@@ -876,9 +743,9 @@ class ExamResultAdmin(admin.ModelAdmin):
                 else:
                     final_score = mid_score if mid_score is not None else ann_score
 
-                grade = get_necta_grade(final_score)
-                points = necta_points(final_score) if final_score is not None else None
-                remark = get_remark(final_score)
+                grade = scale.grade(final_score) or "-"
+                points = scale.points(final_score)
+                remark = scale.remark(final_score, swahili=True) or "-"
 
                 if points is not None:
                     points_list.append(points)
@@ -893,13 +760,12 @@ class ExamResultAdmin(admin.ModelAdmin):
                     "remark": remark,
                 })
 
-            best_7_points = sorted(points_list)[:7]
-            total_points = sum(best_7_points)
+            total_points = scale.best_total(points_list)
 
             valid_finals = [s["final"] for s in student_subjects if s["final"] is not None]
             mean = round(sum(valid_finals) / max(1, len(valid_finals)), 2)
 
-            division = get_division(total_points)
+            division = f"Daraja {scale.division(total_points)}"
 
             students_data.append({
                 "student": student,
@@ -1077,3 +943,34 @@ class ExamResultAdmin(admin.ModelAdmin):
         return response
 
 
+# -------------------- Student Session Summary Admin --------------------
+@admin.register(StudentSessionSummary)
+class StudentSessionSummaryAdmin(admin.ModelAdmin):
+    list_display = ("student", "exam_session", "subjects_count", "total", "mean", "best7_points", "division", "position")
+    list_filter = ("exam_session__form", "exam_session__term", "exam_session__year", "division")
+    search_fields = ("student__full_name", "student__admission_number")
+    list_select_related = ("student", "exam_session")
+    ordering = ("exam_session", "position")
+
+    # Maintained from ExamResult changes (see results/summaries.py)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# -------------------- Score Upload Admin --------------------
+@admin.register(ScoreUpload)
+class ScoreUploadAdmin(admin.ModelAdmin):
+    list_display = ("filename", "assignment", "status", "rows_parsed", "matched", "missing", "written", "created_at")
+    list_filter = ("status", "created_at")
+    search_fields = ("filename", "sha256", "assignment__subject__name", "assignment__teacher__full_name")
+    list_select_related = ("assignment__subject", "assignment__exam_session", "assignment__teacher")
+    exclude = ("content",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
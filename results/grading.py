@@ -0,0 +1,211 @@
+"""
+NECTA grading engine: the one definition of grades, points and divisions.
+
+Default scale (CSEE):
+    A 75–100 → 1 point    B 65–74 → 2    C 45–64 → 3    D 30–44 → 4    F 0–29 → 5
+Divisions from the total points of the best 7 subjects:
+    I 7–17    II 18–21    III 22–25    IV 26–33    0 otherwise (also below 7,
+    i.e. fewer than 7 graded subjects)
+
+Other scales can be set per exam type (term) and year with
+RESULTS_GRADING_SCALES; see get_scale.
+
+Every rule has a scalar form (one score) and a NumPy form that grades a
+whole session at once. Missing scores are None for the scalar API and NaN
+in arrays; they get no grade and no points.
+"""
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from django.conf import settings
+
+
+class GradeScale:
+    """
+    thresholds: lowest score of each grade, best grade first, e.g. (75, 65, 45, 30);
+                scores below the last one get the last grade
+    grades / points / remarks / remarks_sw: one entry per grade (len(thresholds) + 1)
+    division_limits: highest total points of each division, best first;
+                     totals above the last one get the last division
+    Totals below best_of x the best points (7 for NECTA) cannot come from
+    `best_of` graded subjects and also get the last division.
+    """
+
+    def __init__(
+        self,
+        thresholds=(75, 65, 45, 30),
+        grades=("A", "B", "C", "D", "F"),
+        points=(1, 2, 3, 4, 5),
+        remarks=("Excellent", "Very Good", "Good", "Pass", "Fail"),
+        remarks_sw=("Vizuri Sana", "Vizuri", "Wastani", "Dhaifu", "Mbaya Sana"),
+        division_limits=(17, 21, 25, 33),
+        divisions=("I", "II", "III", "IV", "0"),
+        division_remarks=("Excellent", "Very Good", "Good", "Pass", "Fail"),
+        best_of=7,
+    ):
+        self.thresholds = tuple(thresholds)
+        self.grades = tuple(grades)
+        self.points_table = tuple(points)
+        self.remarks = tuple(remarks)
+        self.remarks_sw = tuple(remarks_sw)
+        self.division_limits = tuple(division_limits)
+        self.divisions = tuple(divisions)
+        self.division_remarks = tuple(division_remarks)
+        self.best_of = best_of
+        self.min_total = best_of * min(self.points_table)
+
+        if not (len(self.grades) == len(self.points_table) == len(self.remarks)
+                == len(self.remarks_sw) == len(self.thresholds) + 1):
+            raise ValueError("A grade scale needs one grade, point and remark per threshold, plus one")
+        if not len(self.divisions) == len(self.division_remarks) == len(self.division_limits) + 1:
+            raise ValueError("A grade scale needs one division and remark per limit, plus one")
+
+        # Ascending copies for bisect / searchsorted
+        self._bounds = self.thresholds[::-1]
+        self._points = np.array(self.points_table, dtype=float)
+        self._grades = np.array(self.grades + ("",), dtype=object)
+        self._divisions = np.array(self.divisions, dtype=object)
+
+    @property
+    def pass_mark(self):
+        return self.thresholds[-1]
+
+    def bands(self):
+        """(grade, label) pairs for summaries, e.g. ("A", "A (75-100)"), ("F", "F (<30)")."""
+        upper = [100] + [t - 1 for t in self.thresholds]
+        labels = [f"{g} ({lo}-{hi})" for g, lo, hi in zip(self.grades, self.thresholds, upper)]
+        labels.append(f"{self.grades[-1]} (<{self.pass_mark})")
+        return list(zip(self.grades, labels))
+
+    # ---------------- Scalar API ----------------
+    def grade_index(self, score):
+        """Position of the score's grade (0 = best), or None for a missing score."""
+        if score is None:
+            return None
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            return None
+        if score != score:  # NaN
+            return None
+        return len(self._bounds) - bisect_right(self._bounds, score)
+
+    def grade(self, score):
+        i = self.grade_index(score)
+        return None if i is None else self.grades[i]
+
+    def points(self, score):
+        i = self.grade_index(score)
+        return None if i is None else self.points_table[i]
+
+    def remark(self, score, swahili=False):
+        i = self.grade_index(score)
+        if i is None:
+            return None
+        return (self.remarks_sw if swahili else self.remarks)[i]
+
+    def best_total(self, points):
+        """Sum of the best `best_of` points (lowest first); missing points are ignored."""
+        return sum(sorted(p for p in points if p is not None)[:self.best_of])
+
+    def division_index(self, total_points):
+        if total_points < self.min_total:
+            return len(self.division_limits)
+        return bisect_left(self.division_limits, total_points)
+
+    def division(self, total_points):
+        return self.divisions[self.division_index(total_points)]
+
+    def division_remark(self, total_points):
+        return self.division_remarks[self.division_index(total_points)]
+
+    # ---------------- Vectorized API ----------------
+    def grade_indices(self, scores):
+        """Grade positions of an array of scores; -1 where the score is NaN."""
+        scores = np.asarray(scores, dtype=float)
+        indices = len(self._bounds) - np.searchsorted(self._bounds, scores, side="right")
+        return np.where(np.isnan(scores), -1, indices)
+
+    def grades_array(self, scores):
+        """Object array of grade letters; "" where the score is NaN."""
+        return self._grades[self.grade_indices(scores)]
+
+    def remarks_array(self, scores, swahili=False):
+        """Object array of remarks; "" where the score is NaN."""
+        remarks = np.array((self.remarks_sw if swahili else self.remarks) + ("",), dtype=object)
+        return remarks[self.grade_indices(scores)]
+
+    def points_array(self, scores):
+        """Float array of points; NaN where the score is NaN."""
+        indices = self.grade_indices(scores)
+        return np.where(indices < 0, np.nan, self._points[np.clip(indices, 0, None)])
+
+    def best_totals(self, points):
+        """
+        points: 2D array, one row per student, NaN for missing subjects.
+        Returns (totals, counts): best-`best_of` totals and the number of
+        graded subjects per row.
+        """
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2 or points.shape[1] == 0:
+            rows = points.shape[0] if points.ndim else 0
+            return np.zeros(rows, dtype=int), np.zeros(rows, dtype=int)
+        best = np.sort(points, axis=1)[:, :self.best_of]  # NaN sorts last
+        return np.nansum(best, axis=1).astype(int), (~np.isnan(points)).sum(axis=1)
+
+    def division_indices(self, totals):
+        totals = np.asarray(totals)
+        indices = np.searchsorted(self.division_limits, totals, side="left")
+        return np.where(totals < self.min_total, len(self.division_limits), indices)
+
+    def divisions_array(self, totals):
+        return self._divisions[self.division_indices(totals)]
+
+    def grade_session(self, scores):
+        """
+        Grade a whole session in one go.
+        scores: 2D array (students x subjects), NaN for missing.
+        Returns a dict of arrays: grades, points, totals, counts, divisions.
+        """
+        scores = np.asarray(scores, dtype=float)
+        points = self.points_array(scores)
+        totals, counts = self.best_totals(points)
+        return {
+            "grades": self.grades_array(scores),
+            "points": points,
+            "totals": totals,
+            "counts": counts,
+            "divisions": self.divisions_array(totals),
+        }
+
+
+NECTA_SCALE = GradeScale()
+
+_scales = {}
+
+
+def get_scale(term=None, year=None):
+    """
+    Grade scale of an exam type and year.
+
+    RESULTS_GRADING_SCALES entries are tried in order; the first one whose
+    "term" / "from_year" / "to_year" (each optional) match wins, and its
+    other keys are GradeScale arguments. Falls back to NECTA_SCALE.
+    """
+    for i, entry in enumerate(getattr(settings, "RESULTS_GRADING_SCALES", [])):
+        if entry.get("term") not in (None, term):
+            continue
+        if year is not None and entry.get("from_year") is not None and year < entry["from_year"]:
+            continue
+        if year is not None and entry.get("to_year") is not None and year > entry["to_year"]:
+            continue
+        if i not in _scales:
+            options = {k: v for k, v in entry.items() if k not in ("term", "from_year", "to_year")}
+            _scales[i] = GradeScale(**options)
+        return _scales[i]
+    return NECTA_SCALE
+
+
+def scale_for_session(exam_session):
+    return get_scale(exam_session.term, exam_session.year)
@@ -0,0 +1,106 @@
+import random
+import re
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand
+
+from results.sms_utils import GSM_7, sanitize_unicode, final_clean, _sanitize_cached
+
+FIRST_NAMES = ["ASHA", "JUMA", "ZAWADI", "RÉHEMA", "MOHAMEDI", "NASRA", "HAMISI", "SALMA", "ÉLIA", "KULUTHUMU"]
+LAST_NAMES = ["ATHUMANI", "O’BRIEN", "KIPUNDE", "HUSSEIN", "MAULIDI", "SWALEHE", "ISSA", "TAI"]
+SUBJECT_CODES = ["CIV", "HIST", "GEO", "KISW", "ENG", "MATH", "BIO", "PHY", "CHEM", "B/STUDIES"]
+TERMS = ["Mid Term", "Terminal", "Annual"]
+FORMS = ["Kidato cha Kwanza", "Kidato cha Pili", "Kidato cha Tatu", "Kidato cha Nne"]
+
+
+# ---------------- Previous implementation (reference) ----------------
+def legacy_sanitize_unicode(text):
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    REPLACEMENTS = {
+        "—": "-", "–": "-", "…": "...",
+        "“": '"', "”": '"', "‘": "'", "’": "'",
+        "•": "-", "·": "-", "`": "'", "´": "'",
+        "\u00A0": " ", "\u200B": "", "\u200C": "", "\u200D": "", "\u2060": "",
+        "$": "", "£": "", "€": "", "¥": "Y", "¢": "c",
+        "©": "(c)", "®": "(R)", "™": "(TM)"
+    }
+    for bad, good in REPLACEMENTS.items():
+        text = text.replace(bad, good)
+    allowed = set(GSM_7) | set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ") | set(",.!?;:'\"-()|")
+    text = ''.join(c for c in text if c in allowed)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def legacy_final_clean(text):
+    text = legacy_sanitize_unicode(text)
+    text = text.replace("\n", " | ")
+    text = re.sub(r"\s{2,}", " ", text)
+    text = re.sub(r"^\W+|\W+$", "", text)
+    return text.strip()
+
+
+class Command(BaseCommand):
+    help = "Benchmark results SMS sanitizing on a synthetic full-school message batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=600)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=2025)
+
+    def build_batch(self, students, seed):
+        """Fragments and messages in the order format_student_sms cleans them."""
+        rng = random.Random(seed)
+        batch = []
+        for _ in range(students):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+            form, term = rng.choice(FORMS), rng.choice(TERMS)
+            scores = [(code, rng.choice([None, *range(101)])) for code in SUBJECT_CODES]
+            message = " | ".join(
+                [f"Matokeo ya {name}", f"{form} | {term} 2025"]
+                + [f"{code}: {score if score is not None else 'NA'}" for code, score in scores]
+                + ["Pointi: 17 | Wastani: 61.4", "Daraja: Daraja 1 | Nafasi Darasani: 3 — “Hongera”…"]
+            )
+            batch.append(([name, form, term, *SUBJECT_CODES], message))
+        return batch
+
+    def run(self, batch, sanitize, clean):
+        out = []
+        for fragments, message in batch:
+            out.extend(sanitize(f) for f in fragments)
+            out.append(clean(message))
+        return out
+
+    def best_time(self, repeat, fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def handle(self, *args, **options):
+        batch = self.build_batch(options["students"], options["seed"])
+        repeat = options["repeat"]
+
+        legacy_time, legacy_out = self.best_time(
+            repeat, lambda: self.run(batch, legacy_sanitize_unicode, legacy_final_clean)
+        )
+
+        _sanitize_cached.cache_clear()
+        cold_time, cold_out = self.best_time(1, lambda: self.run(batch, sanitize_unicode, final_clean))
+        warm_time, warm_out = self.best_time(repeat, lambda: self.run(batch, sanitize_unicode, final_clean))
+
+        if not (legacy_out == cold_out == warm_out):
+            self.stderr.write(self.style.ERROR("❌ Output differs from the previous implementation"))
+            return
+
+        self.stdout.write(f"Messages: {len(batch)} ({options['students']} students)")
+        self.stdout.write(f"Previous implementation: {legacy_time * 1000:.1f} ms")
+        self.stdout.write(f"Translate table (cold cache): {cold_time * 1000:.1f} ms ({legacy_time / cold_time:.1f}x)")
+        self.stdout.write(f"Translate table (warm cache): {warm_time * 1000:.1f} ms ({legacy_time / warm_time:.1f}x)")
+        self.stdout.write(self.style.SUCCESS("✅ Output is byte-identical"))
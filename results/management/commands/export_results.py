@@ -31,6 +31,7 @@ class Command(BaseCommand):
             data.append({
                 "student_uuid": str(result.student.uuid) if hasattr(result.student, 'uuid') else result.student.id,
                 "student_name": result.student.full_name,
+                "admission_number": result.student.admission_number,
                 "form": result.assignment.exam_session.form,
                 "stream": result.assignment.exam_session.stream,
                 "term": result.assignment.exam_session.term,
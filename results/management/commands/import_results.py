@@ -6,6 +6,7 @@ from django.db import transaction, close_old_connections, connections
 
 from results.models import ExamResult, SubjectAssignment, ExamSession
 from students.models import Student
+from students.utils import resolve_admission_numbers
 from teachers.models import Teacher, Subject
 
 SUBJECT_MAP = {
@@ -45,9 +46,21 @@ class Command(BaseCommand):
         results_imported = 0
         skipped = 0
 
-        for index, item in enumerate(data[start_index:], start=start_index + 1):
+        # STUDENTS resolved up front: by admission number when the file has one, else by name
+        items = data[start_index:]
+        by_admission = resolve_admission_numbers(
+            item["admission_number"] for item in items if item.get("admission_number")
+        )
+        by_name = {}
+        names = {item.get("student_name", "").strip() for item in items}
+        # Lowest id wins for repeated names
+        for student_id, full_name in Student.objects.filter(full_name__in=names).order_by("-id").values_list("id", "full_name"):
+            by_name[full_name] = student_id
+
+        for index, item in enumerate(items, start=start_index + 1):
             try:
                 close_old_connections()
+                created_student = None
 
                 with transaction.atomic():
                     # SUBJECT
@@ -61,11 +74,12 @@ class Command(BaseCommand):
                         continue
 
                     # STUDENT
-                    student = Student.objects.filter(
-                        full_name=item.get("student_name", "").strip()
-                    ).first()
-                    if not student:
-                        student = Student.objects.create(
+                    student_id = (
+                        by_admission.get(item.get("admission_number"))
+                        or by_name.get(item.get("student_name", "").strip())
+                    )
+                    if not student_id:
+                        created_student = Student.objects.create(
                             full_name=item.get("student_name", "").strip(),
                             gender=item.get("gender", "M"),
                             dob=date(2008, 1, 1),
@@ -75,6 +89,7 @@ class Command(BaseCommand):
                             parent_contact=item.get("parent_contact", "0000000000"),
                             status="active",
                         )
+                        student_id = created_student.id
                         students_created += 1
 
                     # TEACHER
@@ -111,12 +126,14 @@ class Command(BaseCommand):
 
                     # EXAM RESULT
                     ExamResult.objects.update_or_create(
-                        student=student,
+                        student_id=student_id,
                         assignment=assignment,
                         defaults={"score": item.get("score")},
                     )
 
                 results_imported += 1
+                if created_student:
+                    by_name[created_student.full_name] = created_student.id
 
                 # Save checkpoint
                 with open(CHECKPOINT_FILE, "w") as cf:
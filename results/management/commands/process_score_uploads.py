@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from results.models import ScoreUpload
+from results.uploads import process_score_upload
+
+
+class Command(BaseCommand):
+    help = "Process teacher score uploads that are still pending or stuck (e.g. after a restart)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--retry", action="store_true",
+                            help="Also retry failed uploads")
+
+    def handle(self, *args, **options):
+        if options["retry"]:
+            # Latest upload of each file only; uploads a live worker holds are left alone
+            newer = ScoreUpload.objects.filter(
+                assignment=OuterRef("assignment"), sha256=OuterRef("sha256"), pk__gt=OuterRef("pk")
+            )
+            in_flight = ScoreUpload.objects.filter(
+                assignment=OuterRef("assignment"), sha256=OuterRef("sha256"), status__in=ScoreUpload.IN_FLIGHT
+            )
+            ScoreUpload.objects.filter(status="failed").exclude(Exists(newer)).exclude(Exists(in_flight)).update(
+                status="pending", error="", finished_at=None
+            )
+
+        # Pending ones and ones stuck in 'processing' (process_score_upload claims each once)
+        ids = list(ScoreUpload.objects.filter(ScoreUpload.claimable()).order_by("pk").values_list("pk", flat=True))
+        for upload_id in ids:
+            self.stdout.write(f"📄 Processing score upload {upload_id}")
+            process_score_upload(upload_id)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Processed {len(ids)} upload(s)"))
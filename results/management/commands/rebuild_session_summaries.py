@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from results.models import ExamSession, StudentSessionSummary
+from results.summaries import refresh_summaries, flush_dirty_summaries
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-student session summaries (total, mean, best-7 points, division, position)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="ExamSession ids (default: all)")
+        parser.add_argument("--year", type=int, help="Only sessions of this year")
+        parser.add_argument("--form", type=int, help="Only sessions of this form")
+        parser.add_argument(
+            "--dirty", action="store_true",
+            help="Only recompute summaries still marked dirty (e.g. after a restart)",
+        )
+
+    def handle(self, *args, **options):
+        sessions = ExamSession.objects.order_by("year", "form", "stream", "term")
+        if options["ids"]:
+            sessions = sessions.filter(pk__in=options["ids"])
+        if options["year"]:
+            sessions = sessions.filter(year=options["year"])
+        if options["form"]:
+            sessions = sessions.filter(form=options["form"])
+        if options["dirty"]:
+            sessions = sessions.filter(
+                pk__in=StudentSessionSummary.objects.filter(dirty=True).values("exam_session_id")
+            )
+
+        total = 0
+        for exam_session in sessions:
+            if options["dirty"]:
+                written = flush_dirty_summaries(exam_session.pk)
+            else:
+                written = refresh_summaries(exam_session)
+            total += written
+            self.stdout.write(f"📊 {exam_session}: {written} summaries")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt {total} summaries in {len(sessions)} session(s)"))
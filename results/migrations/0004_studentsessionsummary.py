@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0003_alter_examsession_term'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentSessionSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subjects_count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('best7_points', models.PositiveIntegerField(default=0)),
+                ('division', models.CharField(blank=True, max_length=5)),
+                ('position', models.PositiveIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='results.examsession')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='session_summaries', to='students.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['exam_session', 'position'], name='results_stu_exam_se_347ac6_idx')],
+                'unique_together': {('student', 'exam_session')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 21:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0004_studentsessionsummary'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentsessionsummary',
+            name='dirty',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='studentsessionsummary',
+            index=models.Index(fields=['exam_session', 'dirty'], name='results_stu_exam_se_bf55e9_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+import numpy as np
+from django.db import migrations
+from django.utils import timezone
+
+from results.grading import scale_for_session
+
+
+def build_session_summaries(apps, schema_editor):
+    """
+    Summaries for the results entered before StudentSessionSummary existed.
+    Rows are saved dirty, so positions are filled in by the first read or
+    by `rebuild_session_summaries --dirty`.
+    """
+    ExamSession = apps.get_model("results", "ExamSession")
+    ExamResult = apps.get_model("results", "ExamResult")
+    StudentSessionSummary = apps.get_model("results", "StudentSessionSummary")
+    now = timezone.now()
+
+    for exam_session in ExamSession.objects.all():
+        rows = list(
+            ExamResult.objects.filter(assignment__exam_session=exam_session)
+            .values_list("student_id", "assignment_id", "score")
+        )
+        if not rows:
+            continue
+
+        # Same students x subjects matrix as results.summaries._score_matrix
+        student_ids = sorted({student_id for student_id, _, _ in rows})
+        assignment_ids = sorted({assignment_id for _, assignment_id, _ in rows})
+        student_index = {pk: i for i, pk in enumerate(student_ids)}
+        assignment_index = {pk: i for i, pk in enumerate(assignment_ids)}
+        matrix = np.full((len(student_ids), len(assignment_ids)), np.nan)
+        for student_id, assignment_id, score in rows:
+            if score is not None:
+                matrix[student_index[student_id], assignment_index[assignment_id]] = score
+
+        graded = scale_for_session(exam_session).grade_session(matrix)
+        counts = graded["counts"]
+        totals = np.nansum(matrix, axis=1)
+        means = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+
+        StudentSessionSummary.objects.bulk_create(
+            [
+                StudentSessionSummary(
+                    student_id=student_id,
+                    exam_session=exam_session,
+                    subjects_count=int(counts[i]),
+                    total=float(totals[i]),
+                    mean=float(means[i]),
+                    best7_points=int(graded["totals"][i]),
+                    division=graded["divisions"][i] if counts[i] else "",
+                    dirty=True,
+                    updated_at=now,
+                )
+                for i, student_id in enumerate(student_ids)
+            ],
+            update_conflicts=True,
+            unique_fields=["student", "exam_session"],
+            update_fields=["subjects_count", "total", "mean", "best7_points", "division", "dirty", "updated_at"],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0006_scoreupload'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_session_summaries, migrations.RunPython.noop),
+    ]
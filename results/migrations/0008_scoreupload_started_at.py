@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0007_build_session_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scoreupload',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
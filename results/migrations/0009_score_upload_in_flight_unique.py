@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('results', '0008_scoreupload_started_at'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='scoreupload',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='scoreupload',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'processing'])), fields=('assignment', 'sha256'), name='unique_in_flight_score_upload'),
+        ),
+    ]
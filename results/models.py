@@ -1,4 +1,9 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from students.models import Student
 from teachers.models import Teacher
 from teachers.models import Subject
@@ -66,3 +71,100 @@ class ExamResult(models.Model):
 
     def __str__(self):
         return f"{self.student.full_name} - {self.assignment.subject.name}: {self.score}"
+
+
+# -----------------------------
+# Score Upload
+# -----------------------------
+class ScoreUpload(models.Model):
+    """
+    A teacher's score sheet, stored as uploaded and processed in the
+    background (see results/uploads.py). The same file sent again while
+    its upload is still pending or processing maps to that row through its
+    SHA-256; once it has finished, sending it again makes a new upload.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    IN_FLIGHT = ["pending", "processing"]
+
+    assignment = models.ForeignKey(SubjectAssignment, on_delete=models.CASCADE, related_name="uploads")
+    filename = models.CharField(max_length=255)
+    content = models.BinaryField(blank=True)  # emptied once the scores are written
+    sha256 = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    rows_parsed = models.PositiveIntegerField(default=0)
+    matched = models.PositiveIntegerField(default=0)
+    missing = models.PositiveIntegerField(default=0)
+    written = models.PositiveIntegerField(default=0)
+    missing_numbers = models.JSONField(default=list, blank=True)  # first few, shown to the teacher
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)  # last time a worker claimed it
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["assignment", "sha256"],
+                condition=Q(status__in=["pending", "processing"]),
+                name="unique_in_flight_score_upload",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} - {self.assignment} ({self.status})"
+
+    @staticmethod
+    def claimable():
+        """Pending uploads, and ones left 'processing' by a worker that died."""
+        stale = timezone.now() - timedelta(seconds=settings.RESULTS_UPLOAD_STALE_AFTER)
+        return Q(status="pending") | (Q(status="processing") & (Q(started_at__lt=stale) | Q(started_at__isnull=True)))
+
+    @property
+    def is_stale(self):
+        """
+        Pending or processing for longer than RESULTS_UPLOAD_STALE_AFTER: the
+        thread that should have run it is gone (e.g. the server restarted).
+        """
+        if self.status == "pending":
+            since = self.created_at
+        elif self.status == "processing":
+            since = self.started_at
+        else:
+            return False
+        stale = timezone.now() - timedelta(seconds=settings.RESULTS_UPLOAD_STALE_AFTER)
+        return since is None or since < stale
+
+
+# -----------------------------
+# Student Session Summary
+# -----------------------------
+class StudentSessionSummary(models.Model):
+    """
+    Aggregates of one student's results in one ExamSession, kept up to date
+    from the ExamResult signals (see results/summaries.py).
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="session_summaries")
+    exam_session = models.ForeignKey(ExamSession, on_delete=models.CASCADE, related_name="summaries")
+    subjects_count = models.PositiveIntegerField(default=0)  # subjects with a score
+    total = models.FloatField(default=0)
+    mean = models.FloatField(default=0)
+    best7_points = models.PositiveIntegerField(default=0)
+    division = models.CharField(max_length=5, blank=True)  # e.g. "I", "" without scores
+    position = models.PositiveIntegerField(null=True, blank=True)  # class position, active students only
+    dirty = models.BooleanField(default=False)  # scores changed, waiting to be recomputed
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("student", "exam_session")
+        indexes = [
+            models.Index(fields=["exam_session", "position"]),
+            models.Index(fields=["exam_session", "dirty"]),
+        ]
+
+    def __str__(self):
+        return f"{self.student.full_name} - {self.exam_session}: {self.best7_points} pts"
@@ -0,0 +1,77 @@
+"""
+Class ranking per ExamSession.
+
+The ranking of a whole session is computed in one pass (two queries) and
+cached; ExamResult and Student changes drop the cached copy (see signals.py).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from students.models import Student
+from .grading import scale_for_session
+from .models import ExamResult
+
+# Students without any score are ranked after everyone else
+NO_RESULTS_POINTS = 9999
+
+
+def _cache_key(exam_session_id):
+    return f"results:ranking:{exam_session_id}"
+
+
+def compute_session_ranking(exam_session):
+    """
+    Rank the active students of the session's class by best-7 NECTA points
+    (lower is better).
+    Returns {student_id: (best7_points, position)}.
+    """
+    scale = scale_for_session(exam_session)
+    classmate_ids = list(
+        Student.objects.filter(
+            form=exam_session.form,
+            stream=exam_session.stream,
+            status="active",
+        ).order_by("id").values_list("id", flat=True)
+    )
+
+    points = {student_id: [] for student_id in classmate_ids}
+    scores = ExamResult.objects.filter(
+        assignment__exam_session=exam_session,
+        student_id__in=classmate_ids,
+        score__isnull=False,
+    ).values_list("student_id", "score")
+
+    for student_id, score in scores:
+        points[student_id].append(scale.points(score))
+
+    best7 = [
+        (student_id, scale.best_total(p) if p else NO_RESULTS_POINTS)
+        for student_id, p in points.items()
+    ]
+    best7.sort(key=lambda x: x[1])
+
+    return {
+        student_id: (total, position)
+        for position, (student_id, total) in enumerate(best7, start=1)
+    }
+
+
+def get_session_ranking(exam_session):
+    """Cached version of compute_session_ranking."""
+    key = _cache_key(exam_session.pk)
+    ranking = cache.get(key)
+    if ranking is None:
+        ranking = compute_session_ranking(exam_session)
+        cache.set(key, ranking, getattr(settings, "RESULTS_RANKING_CACHE_TIMEOUT", 300))
+    return ranking
+
+
+def get_position(student, exam_session):
+    ranking = get_session_ranking(exam_session).get(student.id)
+    return ranking[1] if ranking else None
+
+
+def invalidate_session_ranking(exam_session_ids):
+    """Drop cached rankings, e.g. after scores for these sessions change."""
+    cache.delete_many([_cache_key(pk) for pk in exam_session_ids])
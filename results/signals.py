@@ -0,0 +1,60 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from students.models import Student
+from .models import ExamResult, ExamSession, StudentSessionSummary, SubjectAssignment
+from .ranking import invalidate_session_ranking
+from .summaries import mark_dirty, mark_session_dirty
+
+
+# ================= RANKING CACHE =================
+@receiver([post_save, post_delete], sender=ExamResult, dispatch_uid="exam_result_ranking_invalidate")
+def invalidate_ranking_on_result_change(sender, instance, **kwargs):
+    session_id = SubjectAssignment.objects.filter(
+        pk=instance.assignment_id
+    ).values_list("exam_session_id", flat=True).first()
+    if session_id:
+        invalidate_session_ranking([session_id])
+
+
+@receiver([post_save, post_delete], sender=Student, dispatch_uid="student_ranking_invalidate")
+def invalidate_ranking_on_student_change(sender, instance, **kwargs):
+    # Status, form or stream changes move the student in or out of a class ranking,
+    # so the class they left is dropped as well
+    forms = {instance.form}
+    if hasattr(instance, "_loaded_placement"):
+        forms.add(instance._loaded_placement[0])
+    session_ids = ExamSession.objects.filter(form__in=forms).values_list("id", flat=True)
+    invalidate_session_ranking(list(session_ids))
+
+
+# ================= SESSION SUMMARIES =================
+@receiver([post_save, post_delete], sender=ExamResult, dispatch_uid="exam_result_summary_refresh")
+def mark_summary_dirty_on_result_change(sender, instance, **kwargs):
+    session_id = SubjectAssignment.objects.filter(
+        pk=instance.assignment_id
+    ).values_list("exam_session_id", flat=True).first()
+    if session_id:
+        # No placeholder rows while results are deleted (the session may be going too)
+        mark_dirty(session_id, [instance.student_id], create=kwargs["signal"] is post_save)
+
+
+@receiver([post_save, post_delete], sender=Student, dispatch_uid="student_summary_positions_refresh")
+def refresh_positions_on_student_change(sender, instance, **kwargs):
+    if kwargs["signal"] is post_delete:
+        # Summaries went with the student; the rest of the class moves up
+        session_ids = ExamSession.objects.filter(form=instance.form, stream=instance.stream).values_list("id", flat=True)
+        for session_id in session_ids:
+            mark_session_dirty(session_id)
+        return
+
+    # A new student has no results yet and is ranked last; other edits
+    # (names, parent details) do not move anyone
+    placement = (instance.form, instance.stream, instance.status)
+    if kwargs.get("created") or getattr(instance, "_loaded_placement", None) == placement:
+        return
+
+    # Positions change in the sessions the student has results in
+    session_ids = StudentSessionSummary.objects.filter(student=instance).values_list("exam_session_id", flat=True)
+    for session_id in list(session_ids):
+        mark_session_dirty(session_id)
@@ -5,153 +5,144 @@ Fully Updated & Africa’s Talking Compatible
 
 import re
 import unicodedata
-from datetime import datetime
-from core.sms_utils import send_sms
-from announcements.signals import normalize_number, form_to_swahili
+from functools import lru_cache
+from core.outbox import enqueue_sms
+from core.sms_audit import log_sms as audit_sms
+from core.sms_encoding import (
+    GSM_7, count_segments, split_message, estimate_cost,
+)
+from announcements.utils import normalize_number, form_to_swahili
 from results.models import ExamResult
+from results.summaries import get_session_summaries
 from students.models import Student
 
-# =======================================================
-# GSM-7 CHARACTER SET
-# =======================================================
-
-GSM_7_BASIC = (
-    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞ"
-    " !\"#¤%&'()*+,-./0123456789:;<=>?"
-    "ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿"
-    "abcdefghijklmnopqrstuvwxyzäöñüà"
-)
-GSM_7_EXT = "^{}\\[~]|€"
-GSM_7 = set(GSM_7_BASIC + GSM_7_EXT)
-
-GSM_SMS_LIMIT = 160
-UCS2_SMS_LIMIT = 70
-SMS_LOG_FILE = "sms_sent.log"
+# GSM-7 character set and segment sizes live in core.sms_encoding
 
 # =======================================================
 # LOGGING
 # =======================================================
 
-def log_sms(number: str, message: str, status: str) -> None:
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(SMS_LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] To: {number} | Status: {status} | Message: {message}\n")
+def log_sms(number: str, message: str, status: str, student=None, exam_session=None) -> None:
+    """Results SMS events go to the shared audit log (see core.sms_audit)."""
+    audit_sms(number, message, status, source="results", student=student, exam_session=exam_session)
 
 # =======================================================
 # SANITIZATION
 # =======================================================
 
-def sanitize_unicode(text: str) -> str:
-    if not text:
-        return ""
+# Known problematic symbols and their GSM-7 safe replacements
+SANITIZE_REPLACEMENTS = {
+    "—": "-", "–": "-", "…": "...",
+    "“": '"', "”": '"', "‘": "'", "’": "'",
+    "•": "-", "·": "-", "`": "'", "´": "'",
+    "\u00A0": " ", "\u200B": "", "\u200C": "", "\u200D": "", "\u2060": "",
+    "$": "", "£": "", "€": "", "¥": "Y", "¢": "c",
+    "©": "(c)", "®": "(R)", "™": "(TM)"
+}
+
+# Safe GSM-7 + punctuation; everything else is dropped
+SANITIZE_ALLOWED = frozenset(
+    set(GSM_7)
+    | set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ")
+    | set(",.!?;:'\"-()|")
+)
+
+# Strings up to this length (names, subject codes, terms) are memoized
+SANITIZE_CACHE_MAX_LENGTH = 64
+
+WHITESPACE_RE = re.compile(r"\s+")
+EDGE_NON_WORD_RE = re.compile(r"^\W+|\W+$")
+
+
+def _sanitize_char(char: str) -> str:
+    """
+    NFKD-decompose one character, drop combining marks, apply
+    SANITIZE_REPLACEMENTS and keep only allowed characters.
+    """
+    out = []
+    for c in unicodedata.normalize("NFKD", char):
+        if unicodedata.combining(c):
+            continue
+        out.extend(x for x in SANITIZE_REPLACEMENTS.get(c, c) if x in SANITIZE_ALLOWED)
+    return "".join(out)
+
+
+class _SanitizeTable(dict):
+    """
+    str.translate table filled lazily: each code point is worked out once
+    by _sanitize_char and reused for every later message.
+    """
+
+    def __missing__(self, codepoint):
+        value = self[codepoint] = _sanitize_char(chr(codepoint))
+        return value
 
-    # Normalize & remove accents
-    text = unicodedata.normalize("NFKD", text)
-    text = ''.join(c for c in text if not unicodedata.combining(c))
-
-    # Replace known problematic symbols
-    REPLACEMENTS = {
-        "—": "-", "–": "-", "…": "...",
-        "“": '"', "”": '"', "‘": "'", "’": "'",
-        "•": "-", "·": "-", "`": "'", "´": "'",
-        "\u00A0": " ", "\u200B": "", "\u200C": "", "\u200D": "", "\u2060": "",
-        "$": "", "£": "", "€": "", "¥": "Y", "¢": "c",
-        "©": "(c)", "®": "(R)", "™": "(TM)"
-    }
-    for bad, good in REPLACEMENTS.items():
-        text = text.replace(bad, good)
 
-    # Remove anything outside safe GSM-7 + punctuation
-    allowed = set(GSM_7) | set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 ") | set(",.!?;:'\"-()|")
-    text = ''.join(c for c in text if c in allowed)
+SANITIZE_TABLE = _SanitizeTable()
+# Pre-fill ASCII, Latin-1 and the punctuation block used in typed messages
+SANITIZE_TABLE.update(
+    (cp, _sanitize_char(chr(cp)))
+    for cp in [*range(0x250), *range(0x2000, 0x2070), 0x20AC, 0x2122]
+)
+
+
+def _sanitize(text: str) -> str:
+    return WHITESPACE_RE.sub(" ", text.translate(SANITIZE_TABLE)).strip()
 
-    # Collapse spaces
-    text = re.sub(r"\s+", " ", text).strip()
 
-    return text
+@lru_cache(maxsize=4096)
+def _sanitize_cached(text: str) -> str:
+    return _sanitize(text)
 
-def is_gsm7(text: str) -> bool:
-    return all(c in GSM_7 for c in text)
+
+def sanitize_unicode(text: str) -> str:
+    if not text:
+        return ""
+    if len(text) <= SANITIZE_CACHE_MAX_LENGTH:
+        return _sanitize_cached(text)
+    return _sanitize(text)
 
 def final_clean(text: str) -> str:
+    # sanitize_unicode already turns newlines and runs of whitespace into single spaces
     text = sanitize_unicode(text)
-    text = text.replace("\n", " | ")
-    text = re.sub(r"\s{2,}", " ", text)
-    text = re.sub(r"^\W+|\W+$", "", text)
+    text = EDGE_NON_WORD_RE.sub("", text)
     return text.strip()
 
 def prepare_sms_payload(text: str) -> str:
     return final_clean(text)
 
 # =======================================================
-# NECTA POINTS & DIVISIONS
+# NECTA DIVISIONS
 # =======================================================
 
-def necta_points(score: float) -> int:
-    if score is None: return 0
-    if score >= 75: return 1
-    if score >= 65: return 2
-    if score >= 45: return 3
-    if score >= 30: return 4
-    return 5
-
-def get_division(total_points: int) -> str:
-    if total_points <= 17: return "Daraja 1"
-    if total_points <= 21: return "Daraja 2"
-    if total_points <= 25: return "Daraja 3"
-    if total_points <= 33: return "Daraja 4"
-    return "Daraja 0"
+# SMS spells divisions with digits: "Daraja 1" .. "Daraja 4", "Daraja 0"
+DIVISION_DIGITS = {"I": "1", "II": "2", "III": "3", "IV": "4", "0": "0"}
 
 # =======================================================
 # BUILD STUDENT SMS
 # =======================================================
 
-def build_student_sms(student: Student, exam_session) -> str | None:
-    results = ExamResult.objects.filter(
-        student=student,
-        assignment__exam_session=exam_session
-    ).select_related("assignment__subject")
-
-    if not results.exists():
-        return None
-
+def format_student_sms(student: Student, exam_session, results, summary) -> str:
+    """
+    Build the results message from already loaded ExamResult rows.
+    results: ExamResult rows of this student with assignment__subject loaded
+    summary: the student's StudentSessionSummary (points, mean, division, position)
+    """
     student_name = sanitize_unicode(student.full_name)
     form_name = sanitize_unicode(form_to_swahili(student.form))
     term_name = sanitize_unicode(exam_session.term)
 
-    subject_scores, points_list = [], []
-
+    subject_scores = []
     for r in results:
-        score = r.score
         subject_name = sanitize_unicode(r.assignment.subject.code.strip())
         if len(subject_name) > 12:
             subject_name = subject_name[:12]
-        subject_scores.append((subject_name, score))
-        if score is not None:
-            points_list.append(necta_points(score))
-
-    best7 = sorted(points_list)[:7]
-    total_points = sum(best7)
-
-    valid_scores = [s for _, s in subject_scores if s is not None]
-    mean_score = round(sum(valid_scores) / max(1, len(valid_scores)), 1)
-
-    division = get_division(total_points)
-
-    # Class ranking
-    classmates = Student.objects.filter(
-        form=exam_session.form,
-        stream=exam_session.stream,
-        status="active"
-    )
-    ranking = []
-    for s in classmates:
-        rs = ExamResult.objects.filter(student=s, assignment__exam_session=exam_session)
-        totals = [necta_points(r.score) for r in rs if r.score is not None]
-        b7 = sum(sorted(totals)[:7]) if totals else 9999
-        ranking.append((s.id, b7))
-    ranking.sort(key=lambda x: x[1])
-    position = next(i for i, item in enumerate(ranking, start=1) if item[0] == student.id)
+        subject_scores.append((subject_name, r.score))
+
+    total_points = summary.best7_points
+    mean_score = round(summary.mean, 1)
+    division = f"Daraja {DIVISION_DIGITS.get(summary.division, '-')}"
+    position = summary.position
 
     # Build message
     msg_parts = [
@@ -161,59 +152,185 @@ def build_student_sms(student: Student, exam_session) -> str | None:
     for subject, score in subject_scores:
         msg_parts.append(f"{subject}: {score if score is not None else 'NA'}")
     msg_parts.append(f"Pointi: {total_points} | Wastani: {mean_score}")
-    msg_parts.append(f"Daraja: {division} | Nafasi Darasani: {position}")
+    msg_parts.append(f"Daraja: {division} | Nafasi Darasani: {position or '-'}")
 
     msg = " | ".join(msg_parts)
     return final_clean(msg)
 
+
+def build_student_sms(student: Student, exam_session) -> str | None:
+    results = list(ExamResult.objects.filter(
+        student=student,
+        assignment__exam_session=exam_session
+    ).select_related("assignment__subject").order_by("id"))
+
+    if not results:
+        return None
+
+    summary = get_session_summaries(exam_session, [student.id])[student.id]
+    return format_student_sms(student, exam_session, results, summary)
+
+
+def iter_session_sms(exam_session, student_ids=None):
+    """
+    Build the results message of every student in a session in one pass.
+    All ExamResult rows are loaded with a single query; points, mean,
+    division and position come from the stored session summaries.
+    Yields (student, number, chunks, exam_session); number is None when the
+    parent contact is invalid.
+    """
+    results = ExamResult.objects.filter(
+        assignment__exam_session=exam_session
+    ).select_related("student", "assignment__subject").order_by("id")
+    if student_ids is not None:
+        results = results.filter(student_id__in=student_ids)
+
+    by_student = {}
+    for r in results:
+        by_student.setdefault(r.student_id, []).append(r)
+
+    summaries = get_session_summaries(exam_session, by_student)
+
+    for student_results in by_student.values():
+        student = student_results[0].student
+        number = normalize_number(student.parent_contact)
+        if not number:
+            yield student, None, [], exam_session
+            continue
+
+        msg = format_student_sms(student, exam_session, student_results, summaries[student.id])
+        yield student, number, split_sms(prepare_sms_payload(msg)), exam_session
+
+
+def build_session_sms(exam_session, student_ids=None) -> list[tuple[str, list[str]]]:
+    """
+    Every parent message of a session as (number, chunks) pairs ready for dispatch.
+    """
+    return [
+        (number, chunks)
+        for _, number, chunks, _ in iter_session_sms(exam_session, student_ids)
+        if number
+    ]
+
 # =======================================================
 # SMART SPLIT & SEND SMS
 # =======================================================
 
 def split_sms(message: str) -> list[str]:
     """
-    Split SMS into chunks at | separator to avoid breaking subjects
+    Split SMS into chunks at | separator to avoid breaking subjects.
+    Chunks are sized in real septets / UCS-2 units, and the message is kept
+    whole when one concatenated SMS costs fewer segments.
     """
-    limit = GSM_SMS_LIMIT if is_gsm7(message) else UCS2_SMS_LIMIT
-    parts = message.split(" | ")
-    chunks = []
-    current = ""
+    return split_message(message, " | ")
 
-    for part in parts:
-        part_with_sep = part if current == "" else " | " + part
-        if len(current + part_with_sep) > limit:
-            if current:
-                chunks.append(current.strip())
-            current = part
-        else:
-            current += part_with_sep
 
-    if current:
-        chunks.append(current.strip())
-
-    return chunks
 def send_student_sms(student: Student, exam_session) -> str:
     number = normalize_number(student.parent_contact)
     if not number:
-        log_sms("N/A", "No number", "Failed")
+        log_sms("N/A", "No number", "Failed", student, exam_session)
         return f"Invalid number for {student.full_name} (Parent: {student.parent_name})"
 
     msg = build_student_sms(student, exam_session)
     if not msg:
-        log_sms(number, "No results", "Failed")
+        log_sms(number, "No results", "Failed", student, exam_session)
         return f"No results for {student.full_name} (Parent: {student.parent_name})"
 
     safe_message = prepare_sms_payload(msg)
     messages_chunks = split_sms(safe_message)
 
+    enqueue_sms([(number, chunk) for chunk in messages_chunks], source="results")
     for chunk in messages_chunks:
-        try:
-            send_sms([number], chunk)
-            log_sms(number, chunk, f"Sent to {student.parent_name}")
-        except Exception as e:
-            log_sms(number, chunk, f"Failed: {str(e)}")
+        log_sms(number, chunk, f"Queued for {student.parent_name}", student, exam_session)
+
+    return f"Queued for {student.full_name} (Parent: {student.parent_name}, {len(messages_chunks)} SMS)"
+
+
+def group_by_parent(entries) -> dict[str, tuple[list, list[str]]]:
+    """
+    Collapse (student, number, chunks, exam_session) entries to one entry per
+    parent number. The same student is only counted once per number. Siblings
+    who share a number get one combined message when that needs fewer SMS
+    than sending their messages separately.
+    Returns {number: ([(student, exam_session), ...], chunks)}.
+    """
+    per_number = {}
+
+    def segments(chunks):
+        return sum(count_segments(c) for c in chunks)
+
+    for student, number, chunks, exam_session in entries:
+        students, messages = per_number.setdefault(number, ([], {}))
+        key = " | ".join(chunks)
+        if key not in messages:
+            messages[key] = chunks
+            students.append((student, exam_session))
+
+    grouped = {}
+    for number, (students, messages) in per_number.items():
+        separate = [chunk for chunks in messages.values() for chunk in chunks]
+        combined = split_sms(" | ".join(messages))
+        grouped[number] = (students, combined if segments(combined) < segments(separate) else separate)
+    return grouped
+
+
+def plan_results_sms(entries) -> dict:
+    """
+    Turn entries from iter_session_sms into the (number, message) pairs to
+    queue, one set per parent number.
+    Returns a dict with the outgoing pairs, the (student, exam_session)
+    pairs behind each number, those without a number, counts and
+    estimate_cost(). Nothing is logged or queued, so it is safe for previews.
+    """
+    valid, no_number = [], []
+    for entry in entries:
+        student, number, _, exam_session = entry
+        if not number:
+            no_number.append((student, exam_session))
+            continue
+        valid.append(entry)
+
+    outgoing, parents, students = [], {}, 0
+    for number, (recipients, chunks) in group_by_parent(valid).items():
+        outgoing.extend((number, chunk) for chunk in chunks)
+        parents[number] = recipients
+        students += len(recipients)
+
+    return {
+        "outgoing": outgoing,
+        "parents": parents,
+        "students": students,
+        "no_number": no_number,
+        "failed": len(no_number),
+        "estimate": estimate_cost(outgoing),
+    }
+
+
+def queue_results_sms(entries) -> tuple[int, int, int]:
+    """
+    Queue results SMS built by iter_session_sms, one set per parent number.
+    Returns (queued_students, failed_students, parents).
+    """
+    plan = plan_results_sms(entries)
+    for student, exam_session in plan["no_number"]:
+        log_sms("N/A", "No number", "Failed", student, exam_session)
+
+    for number, chunk in plan["outgoing"]:
+        # Combined sibling messages are recorded against every student in them
+        for student, exam_session in plan["parents"][number]:
+            log_sms(number, chunk, f"Queued for {student.parent_name}", student, exam_session)
+
+    enqueue_sms(plan["outgoing"], source="results")
+    return plan["students"], plan["failed"], len(plan["parents"])
+
+
+def send_session_sms(exam_session, student_ids=None) -> tuple[int, int, int]:
+    """
+    Queue results SMS for a whole session (or the given students).
+    Returns (queued_students, failed_students, parents).
+    """
+    return queue_results_sms(iter_session_sms(exam_session, student_ids))
 
-    return f"Sent to {student.full_name} (Parent: {student.parent_name}, {len(messages_chunks)} SMS)"
 
 # def send_student_sms(student: Student, exam_session) -> str:
 #     number = normalize_number(student.parent_contact)
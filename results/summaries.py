@@ -0,0 +1,195 @@
+"""
+Per-student session summaries (StudentSessionSummary).
+
+Total, mean, best-7 points, division and class position of every student
+in an ExamSession are stored once instead of being recomputed from the raw
+ExamResult rows by each consumer. Scores are graded as one students x
+subjects matrix (results.grading) and written with a single upsert.
+
+Score changes only mark the students' summaries dirty (mark_dirty); the
+session is recomputed RESULTS_SUMMARY_DEBOUNCE seconds after its last
+change, so several subject uploads arriving together share one run that
+covers just the dirty students plus the session's ranking. Reads refresh
+anything still dirty first. The `rebuild_session_summaries` command
+rebuilds them in bulk.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from core.background import run_debounced
+from .grading import scale_for_session
+from .models import ExamResult, ExamSession, StudentSessionSummary
+from .ranking import get_session_ranking, invalidate_session_ranking
+
+SUMMARY_FIELDS = ["subjects_count", "total", "mean", "best7_points", "division", "updated_at"]
+
+
+# ---------------- Build ----------------
+def _score_matrix(rows):
+    """rows: (student_id, assignment_id, score) -> (student ids, students x subjects matrix)"""
+    student_ids = sorted({student_id for student_id, _, _ in rows})
+    assignment_ids = sorted({assignment_id for _, assignment_id, _ in rows})
+    student_index = {pk: i for i, pk in enumerate(student_ids)}
+    assignment_index = {pk: i for i, pk in enumerate(assignment_ids)}
+
+    matrix = np.full((len(student_ids), len(assignment_ids)), np.nan)
+    for student_id, assignment_id, score in rows:
+        if score is not None:
+            matrix[student_index[student_id], assignment_index[assignment_id]] = score
+    return student_ids, matrix
+
+
+def build_summaries(exam_session, rows):
+    """Unsaved StudentSessionSummary objects (without position) from (student_id, assignment_id, score) rows."""
+    student_ids, matrix = _score_matrix(rows)
+    if not student_ids:
+        return []
+
+    graded = scale_for_session(exam_session).grade_session(matrix)
+    counts = graded["counts"]
+    totals = np.nansum(matrix, axis=1)
+    means = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+
+    return [
+        StudentSessionSummary(
+            student_id=student_id,
+            exam_session=exam_session,
+            subjects_count=int(counts[i]),
+            total=float(totals[i]),
+            mean=float(means[i]),
+            best7_points=int(graded["totals"][i]),
+            division=graded["divisions"][i] if counts[i] else "",
+        )
+        for i, student_id in enumerate(student_ids)
+    ]
+
+
+# ---------------- Refresh ----------------
+def refresh_positions(exam_session):
+    """Recompute the class ranking and store the positions that changed."""
+    invalidate_session_ranking([exam_session.pk])
+    ranking = get_session_ranking(exam_session)
+
+    changed = []
+    for summary in StudentSessionSummary.objects.filter(exam_session=exam_session).only("id", "student_id", "position"):
+        position = ranking.get(summary.student_id, (None, None))[1]
+        if summary.position != position:
+            summary.position = position
+            changed.append(summary)
+
+    StudentSessionSummary.objects.bulk_update(changed, ["position"], batch_size=500)
+    return len(changed)
+
+
+def refresh_summaries(exam_session, student_ids=None):
+    """
+    Rebuild the summaries of a session (or only of `student_ids`) and the
+    positions of the whole class. Returns the number of summaries written.
+    """
+    results = ExamResult.objects.filter(assignment__exam_session=exam_session)
+    stale = StudentSessionSummary.objects.filter(exam_session=exam_session)
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        results = results.filter(student_id__in=student_ids)
+        stale = stale.filter(student_id__in=student_ids)
+
+    with transaction.atomic():
+        # Claimed before the scores are read: a change arriving meanwhile marks them again
+        stale.filter(dirty=True).update(dirty=False)
+        summaries = build_summaries(exam_session, list(results.values_list("student_id", "assignment_id", "score")))
+
+        # Students whose last result was removed
+        stale.exclude(student_id__in=[s.student_id for s in summaries]).delete()
+        StudentSessionSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=["student", "exam_session"],
+            update_fields=SUMMARY_FIELDS,
+            batch_size=500,
+        )
+        refresh_positions(exam_session)
+
+    return len(summaries)
+
+
+# ---------------- Dirty Flags ----------------
+def mark_dirty(exam_session_id, student_ids, create=True):
+    """
+    Flag the summaries of these students for recomputation and schedule a
+    debounced refresh of the session once the transaction commits.
+    create: also add placeholder rows for students without a summary (not
+            wanted while their results are being deleted)
+    """
+    student_ids = set(student_ids)
+    if not student_ids:
+        return
+
+    if create:
+        StudentSessionSummary.objects.bulk_create(
+            [StudentSessionSummary(student_id=pk, exam_session_id=exam_session_id, dirty=True) for pk in student_ids],
+            update_conflicts=True,
+            unique_fields=["student", "exam_session"],
+            update_fields=["dirty"],
+            batch_size=500,
+        )
+    else:
+        StudentSessionSummary.objects.filter(exam_session_id=exam_session_id, student_id__in=student_ids).update(dirty=True)
+
+    schedule_flush(exam_session_id)
+
+
+def mark_session_dirty(exam_session_id):
+    """
+    Flag every summary of a session, for changes that can move anyone's
+    position (a student joining, leaving or being deleted from the class).
+    """
+    StudentSessionSummary.objects.filter(exam_session_id=exam_session_id).update(dirty=True)
+    schedule_flush(exam_session_id)
+
+
+def schedule_flush(exam_session_id):
+    """Debounced flush_dirty_summaries of a session, once the transaction commits."""
+    transaction.on_commit(lambda: run_debounced(
+        f"results:summaries:{exam_session_id}",
+        settings.RESULTS_SUMMARY_DEBOUNCE,
+        flush_dirty_summaries,
+        exam_session_id,
+    ))
+
+
+def flush_dirty_summaries(exam_session_id):
+    """Recompute the dirty summaries of a session. Returns the number written."""
+    exam_session = ExamSession.objects.filter(pk=exam_session_id).first()
+    if exam_session is None:
+        return 0
+
+    student_ids = list(
+        StudentSessionSummary.objects.filter(exam_session=exam_session, dirty=True).values_list("student_id", flat=True)
+    )
+    if not student_ids:
+        return 0
+    return refresh_summaries(exam_session, student_ids)
+
+
+# ---------------- Read ----------------
+def get_session_summaries(exam_session, student_ids):
+    """
+    {student_id: StudentSessionSummary} for the given students, in one
+    query. Students with results but no summary yet (e.g. before the first
+    rebuild) and dirty ones are recomputed on the way.
+    """
+    student_ids = set(student_ids)
+    summaries = {
+        s.student_id: s
+        for s in StudentSessionSummary.objects.filter(exam_session=exam_session, student_id__in=student_ids)
+    }
+    outdated = (student_ids - summaries.keys()) | {pk for pk, s in summaries.items() if s.dirty}
+    if outdated:
+        refresh_summaries(exam_session, outdated)
+        summaries.update(
+            (s.student_id, s)
+            for s in StudentSessionSummary.objects.filter(exam_session=exam_session, student_id__in=outdated)
+        )
+    return summaries
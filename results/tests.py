@@ -1,3 +1,600 @@
-from django.test import TestCase
+import datetime
+import hashlib
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from openpyxl import Workbook
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import OutboundSMS
+from students.models import Student
+from teachers.models import Subject, Teacher
+from .grading import NECTA_SCALE, GradeScale, get_scale
+from .models import ExamResult, ExamSession, ScoreUpload, StudentSessionSummary, SubjectAssignment
+from .ranking import NO_RESULTS_POINTS, compute_session_ranking, get_session_ranking
+from .sms_utils import SANITIZE_TABLE, build_session_sms, final_clean, iter_session_sms, plan_results_sms, sanitize_unicode
+from .summaries import build_summaries, flush_dirty_summaries, get_session_summaries, refresh_summaries
+from .uploads import ScoreSheetError, check_score_sheet, iter_score_rows, process_score_upload, save_scores
+
+
+class SessionFixture:
+    """A Form II A Annual 2025 session with seven subjects."""
+
+    subject_count = 7
+
+    def setUp(self):
+        cache.clear()
+        Subject.preload_subjects()
+        self.teacher = Teacher.objects.create(full_name="Asha Mwalimu", gender="F", phone="0710000999")
+        self.session = ExamSession.objects.create(form=2, stream="A", term="Annual", year=2025)
+        self.assignments = [
+            SubjectAssignment.objects.create(
+                exam_session=self.session, subject=subject, teacher=self.teacher,
+                upload_deadline=datetime.date(2030, 1, 1),
+            )
+            for subject in Subject.objects.order_by("id")[:self.subject_count]
+        ]
+
+    def add_student(self, name, scores=(), parent_contact="0710000001", **fields):
+        student = Student.objects.create(
+            full_name=name, gender="F", dob=datetime.date(2010, 1, 1), form=2, stream="A",
+            parent_name=f"Mzazi wa {name}", parent_contact=parent_contact, **fields,
+        )
+        for assignment, score in zip(self.assignments, scores):
+            ExamResult.objects.create(student=student, assignment=assignment, score=score)
+        return student
+
+
+# ---------------- Ranking ----------------
+class RankingTests(SessionFixture, TestCase):
+    def test_ranked_by_best_seven_points(self):
+        middle = self.add_student("MIDDLE", [70] * 7)
+        top = self.add_student("TOP", [80] * 7)
+        bottom = self.add_student("BOTTOM", [20] * 7)
+
+        self.assertEqual(
+            compute_session_ranking(self.session),
+            {top.id: (7, 1), middle.id: (14, 2), bottom.id: (35, 3)},
+        )
+
+    def test_students_without_scores_come_last(self):
+        graded = self.add_student("GRADED", [50, None, 40])
+        empty = self.add_student("EMPTY", [None] * 7)
+        self.add_student("TRANSFERRED", [90] * 7, status="transferred")
+
+        ranking = compute_session_ranking(self.session)
+        self.assertEqual(ranking, {graded.id: (7, 1), empty.id: (NO_RESULTS_POINTS, 2)})
+
+    def test_score_change_drops_the_cached_ranking(self):
+        first = self.add_student("FIRST", [70] * 7)
+        second = self.add_student("SECOND", [60] * 7)
+        self.assertEqual(get_session_ranking(self.session)[first.id][1], 1)
+
+        ExamResult.objects.filter(student=second).update(score=95)
+        # A queryset update sends no signal, so the cached copy is still served
+        self.assertEqual(get_session_ranking(self.session)[first.id][1], 1)
+
+        result = ExamResult.objects.filter(student=second).first()
+        result.save()
+        self.assertEqual(get_session_ranking(self.session)[second.id][1], 1)
+
+
+# ---------------- Session SMS ----------------
+class SessionSMSTests(SessionFixture, TestCase):
+    def test_one_message_per_student_with_a_number(self):
+        top = self.add_student("AMINA JUMA", [80] * 7, parent_contact="0710000001")
+        self.add_student("BARAKA ALLY", [50] * 7, parent_contact="0710000002")
+        self.add_student("NO NUMBER", [50] * 7, parent_contact="12345")
+
+        messages = dict(build_session_sms(self.session))
+        self.assertEqual(list(messages), ["+255710000001", "+255710000002"])
+
+        text = " | ".join(messages["+255710000001"])
+        self.assertIn(f"Matokeo ya {top.full_name}", text)
+        self.assertIn("CIV: 80.0", text)
+        self.assertIn("Pointi: 7 | Wastani: 80.0", text)
+        self.assertIn("Daraja: Daraja 1 | Nafasi Darasani: 1", text)
+
+    def test_only_the_given_students(self):
+        self.add_student("AMINA JUMA", [80] * 7, parent_contact="0710000001")
+        baraka = self.add_student("BARAKA ALLY", [50] * 7, parent_contact="0710000002")
+
+        self.assertEqual([number for number, _ in build_session_sms(self.session, [baraka.id])], ["+255710000002"])
+
+    def test_queries_do_not_grow_with_the_class(self):
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                build_session_sms(self.session)
+            return len(queries)
+
+        for i in range(2):
+            self.add_student(f"STUDENT {i}", [60 + i] * 7, parent_contact=f"07100000{i:02d}")
+        small_class = count_queries()
+
+        for i in range(2, 12):
+            self.add_student(f"STUDENT {i}", [60 + i] * 7, parent_contact=f"07100000{i:02d}")
+        self.assertEqual(count_queries(), small_class)
+
+
+# ---------------- Parent Deduplication ----------------
+@mock.patch("results.sms_utils.audit_sms")
+class ParentDedupeTests(SessionFixture, TestCase):
+    def test_siblings_sharing_a_number_get_one_set_of_messages(self, audit_sms):
+        self.add_student("AMINA JUMA", [80] * 7, parent_contact="0710000001")
+        self.add_student("ASHA JUMA", [70] * 7, parent_contact="+255710000001")
+        self.add_student("BARAKA ALLY", [50] * 7, parent_contact="0710000002")
+
+        plan = plan_results_sms(iter_session_sms(self.session))
+        self.assertEqual(plan["students"], 3)
+        self.assertEqual(sorted(plan["parents"]), ["+255710000001", "+255710000002"])
+        self.assertEqual(len(plan["parents"]["+255710000001"]), 2)
+
+        text = " | ".join(message for number, message in plan["outgoing"] if number == "+255710000001")
+        self.assertIn("AMINA JUMA", text)
+        self.assertIn("ASHA JUMA", text)
+
+    def test_repeated_student_is_counted_once(self, audit_sms):
+        self.add_student("AMINA JUMA", [80] * 7)
+        entries = list(iter_session_sms(self.session))
+
+        plan = plan_results_sms(entries + entries)
+        self.assertEqual(plan["students"], 1)
+        self.assertEqual(plan["outgoing"], plan_results_sms(entries)["outgoing"])
+
+    def test_admin_action_queues_each_parent_once(self, audit_sms):
+        self.add_student("AMINA JUMA", [80] * 7, parent_contact="0710000001")
+        self.add_student("ASHA JUMA", [70] * 7, parent_contact="0710000001")
+        self.add_student("NO NUMBER", [50] * 7, parent_contact="12345")
+
+        admin_user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.force_login(admin_user)
+        url = reverse("admin:results_examresult_changelist")
+        action = {"action": "send_results_to_parents_sms"}
+
+        # One row per subject is selected; the preview counts students and parents
+        preview = self.client.post(url, {**action, "_selected_action": list(ExamResult.objects.values_list("pk", flat=True))})
+        self.assertEqual((preview.context["students"], preview.context["parents"], preview.context["failed"]), (2, 1, 1))
+        self.assertFalse(OutboundSMS.objects.exists())
+
+        self.client.post(url, {
+            **action,
+            "_selected_action": list(preview.context["selected"]),
+            "sms_targets": preview.context["sms_targets"],
+            "confirm": "yes",
+        })
+        self.assertEqual(set(OutboundSMS.objects.values_list("number", flat=True)), {"+255710000001"})
+        self.assertEqual(OutboundSMS.objects.count(), len(plan_results_sms(iter_session_sms(self.session))["outgoing"]))
+
+
+# ---------------- Sanitization ----------------
+class SanitizeTests(SimpleTestCase):
+    def test_accents_and_typographic_symbols(self):
+        self.assertEqual(sanitize_unicode("Zoë “Nyerere” – 5…"), 'Zoe "Nyerere" - 5...')
+        self.assertEqual(sanitize_unicode("Ada™ ©2025 ¥10"), "AdaTM (c)2025 Y10")
+
+    def test_drops_unsupported_characters_and_extra_whitespace(self):
+        self.assertEqual(sanitize_unicode("Hongera 🎉  sana\n\tmwanangu\u200b!"), "Hongera sana mwanangu!")
+        self.assertEqual(sanitize_unicode(""), "")
+        self.assertEqual(sanitize_unicode(None), "")
+
+    def test_long_text_matches_short_text(self):
+        word = "Ngʼombe "
+        self.assertEqual(sanitize_unicode(word * 20), " ".join([sanitize_unicode(word)] * 20))
+
+    def test_characters_outside_the_prefilled_table_are_added(self):
+        codepoint = ord("ア")
+        SANITIZE_TABLE.pop(codepoint, None)
+        self.assertEqual(sanitize_unicode("Xア"), "X")
+        self.assertEqual(SANITIZE_TABLE[codepoint], "")
+
+    def test_final_clean_trims_edge_punctuation(self):
+        self.assertEqual(final_clean(" | Matokeo ya AMINA |\n"), "Matokeo ya AMINA")
+
+
+# ---------------- Grading ----------------
+class GradingTests(SimpleTestCase):
+    def test_grade_boundaries(self):
+        cases = [(100, "A", 1), (75, "A", 1), (74.9, "B", 2), (65, "B", 2), (64, "C", 3),
+                 (45, "C", 3), (44, "D", 4), (30, "D", 4), (29.5, "F", 5), (0, "F", 5)]
+        for score, grade, points in cases:
+            self.assertEqual((NECTA_SCALE.grade(score), NECTA_SCALE.points(score)), (grade, points), score)
+        for missing in (None, "", "abc", float("nan")):
+            self.assertIsNone(NECTA_SCALE.grade(missing))
+
+    def test_divisions(self):
+        cases = [(7, "I"), (17, "I"), (18, "II"), (21, "II"), (22, "III"), (25, "III"),
+                 (26, "IV"), (33, "IV"), (34, "0"), (35, "0"), (6, "0"), (0, "0")]
+        for total, division in cases:
+            self.assertEqual(NECTA_SCALE.division(total), division, total)
+
+    def test_best_seven(self):
+        self.assertEqual(NECTA_SCALE.best_total([1, 5, 2, None, 3, 4, 5, 1, 2]), 18)
+
+    def test_vectorized_matches_scalar(self):
+        rng = np.random.default_rng(7)
+        scores = rng.integers(0, 101, size=(40, 10)).astype(float)
+        scores[rng.random(scores.shape) < 0.3] = np.nan
+
+        graded = NECTA_SCALE.grade_session(scores)
+        for i, row in enumerate(scores):
+            values = [None if np.isnan(v) else v for v in row]
+            points = [NECTA_SCALE.points(v) for v in values]
+            total = NECTA_SCALE.best_total(points)
+
+            self.assertEqual(list(graded["grades"][i]), [NECTA_SCALE.grade(v) or "" for v in values])
+            self.assertEqual(graded["totals"][i], total)
+            self.assertEqual(graded["counts"][i], sum(p is not None for p in points))
+            self.assertEqual(graded["divisions"][i], NECTA_SCALE.division(total))
+
+    def test_empty_session(self):
+        graded = NECTA_SCALE.grade_session(np.empty((3, 0)))
+        self.assertEqual(list(graded["totals"]), [0, 0, 0])
+        self.assertEqual(list(graded["divisions"]), ["0", "0", "0"])
+
+    def test_scale_needs_matching_tables(self):
+        with self.assertRaises(ValueError):
+            GradeScale(thresholds=(50,), grades=("P", "F"), points=(1,))
+
+    @override_settings(RESULTS_GRADING_SCALES=[
+        {"term": "Monthly Test", "thresholds": (50,), "grades": ("P", "F"), "points": (1, 2),
+         "remarks": ("Pass", "Fail"), "remarks_sw": ("Amefaulu", "Amefeli")},
+    ])
+    def test_scale_per_exam_type(self):
+        with mock.patch.dict("results.grading._scales", clear=True):
+            self.assertEqual(get_scale("Monthly Test", 2025).grade(55), "P")
+            self.assertIs(get_scale("Annual", 2025), NECTA_SCALE)
+
+
+# ---------------- Session Summaries ----------------
+class SessionSummaryTests(SessionFixture, TestCase):
+    def summaries(self):
+        return {s.student.full_name: s for s in StudentSessionSummary.objects.select_related("student")}
+
+    def test_refresh_stores_every_aggregate(self):
+        self.add_student("TOP", [80, 80, 80, 80, 80, 80, 60])
+        self.add_student("PARTIAL", [50, None])
+        refresh_summaries(self.session)
+
+        top, partial = self.summaries()["TOP"], self.summaries()["PARTIAL"]
+        self.assertEqual(
+            (top.subjects_count, top.total, round(top.mean, 2), top.best7_points, top.division),
+            (7, 540, 77.14, 9, "I"),
+        )
+        self.assertEqual(
+            (partial.subjects_count, partial.total, partial.mean, partial.best7_points, partial.division),
+            (1, 50, 50, 3, "0"),
+        )
+        self.assertEqual({top.position, partial.position}, {1, 2})
+        self.assertFalse(any(s.dirty for s in self.summaries().values()))
+
+    def test_student_without_scores_has_no_division(self):
+        student = self.add_student("EMPTY", [None] * 7)
+        refresh_summaries(self.session)
+
+        summary = self.summaries()["EMPTY"]
+        self.assertEqual((summary.subjects_count, summary.division, summary.position), (0, "", 1))
+        self.assertEqual(get_session_summaries(self.session, [student.id])[student.id].pk, summary.pk)
+
+    def test_read_is_one_query_once_built(self):
+        students = [self.add_student(f"STUDENT {i}", [score] * 7) for i, score in enumerate([40, 50, 66, 80, 20])]
+        get_session_summaries(self.session, [s.id for s in students])
+
+        with self.assertNumQueries(1):
+            summaries = get_session_summaries(self.session, [s.id for s in students])
+        self.assertEqual([summaries[s.id].position for s in students], [4, 3, 2, 1, 5])
+
+    def test_rebuild_command(self):
+        self.add_student("TOP", [80] * 7)
+        other = ExamSession.objects.create(form=3, stream="A", term="Annual", year=2025)
+
+        call_command("rebuild_session_summaries", str(self.session.pk), stdout=StringIO())
+        self.assertEqual(StudentSessionSummary.objects.get().best7_points, 7)
+
+        StudentSessionSummary.objects.update(best7_points=0, dirty=True)
+        out = StringIO()
+        call_command("rebuild_session_summaries", "--dirty", stdout=out)
+        self.assertEqual(StudentSessionSummary.objects.get().best7_points, 7)
+        self.assertNotIn(str(other), out.getvalue())
+
+
+# ---------------- Summary Invalidation ----------------
+@mock.patch("results.summaries.run_debounced")
+class SummaryInvalidationTests(SessionFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.top = self.add_student("TOP", [70] * 7)
+        self.middle = self.add_student("MIDDLE", [60] * 7)
+        self.bottom = self.add_student("BOTTOM", [20] * 7)
+        refresh_summaries(self.session)
+
+    def dirty(self):
+        return set(StudentSessionSummary.objects.filter(dirty=True).values_list("student__full_name", flat=True))
+
+    def positions(self):
+        flush_dirty_summaries(self.session.pk)
+        return dict(StudentSessionSummary.objects.values_list("student__full_name", "position"))
+
+    def test_score_change_marks_the_student_and_schedules_one_flush(self, run_debounced):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = ExamResult.objects.get(student=self.bottom, assignment=self.assignments[0])
+            result.score = 100
+            result.save()
+
+        self.assertEqual(self.dirty(), {"BOTTOM"})
+        run_debounced.assert_called_once_with(
+            f"results:summaries:{self.session.pk}", settings.RESULTS_SUMMARY_DEBOUNCE,
+            flush_dirty_summaries, self.session.pk,
+        )
+
+    def test_flush_recomputes_only_dirty_students(self, run_debounced):
+        ExamResult.objects.filter(student=self.bottom).update(score=95)
+        ExamResult.objects.filter(student=self.bottom).first().save()
+
+        with mock.patch("results.summaries.build_summaries", wraps=build_summaries) as build:
+            self.assertEqual(flush_dirty_summaries(self.session.pk), 1)
+        self.assertEqual({student_id for student_id, _, _ in build.call_args.args[1]}, {self.bottom.id})
+
+        self.assertEqual(self.positions(), {"BOTTOM": 1, "TOP": 2, "MIDDLE": 3})
+        self.assertEqual(self.dirty(), set())
+        self.assertEqual(flush_dirty_summaries(self.session.pk), 0)
+
+    def test_removing_the_last_result_removes_the_summary(self, run_debounced):
+        for result in ExamResult.objects.filter(student=self.middle):
+            result.delete()
+        flush_dirty_summaries(self.session.pk)
+
+        self.assertEqual(self.positions(), {"TOP": 1, "BOTTOM": 2})
+
+    def test_class_change_moves_everyone_up(self, run_debounced):
+        self.top.stream = "B"
+        self.top.save()
+
+        self.assertEqual(self.dirty(), {"TOP", "MIDDLE", "BOTTOM"})
+        self.assertEqual(self.positions(), {"TOP": None, "MIDDLE": 1, "BOTTOM": 2})
+
+    def test_other_edits_do_not_mark_anything(self, run_debounced):
+        self.top.parent_contact = "0710000999"
+        self.top.save()
+        self.assertEqual(self.dirty(), set())
+        run_debounced.assert_not_called()
+
+    def test_deleted_student_moves_the_class_up(self, run_debounced):
+        self.top.delete()
+        self.assertEqual(self.dirty(), {"MIDDLE", "BOTTOM"})
+        self.assertEqual(self.positions(), {"MIDDLE": 1, "BOTTOM": 2})
+
+
+# ---------------- Saving Scores ----------------
+@mock.patch("results.summaries.run_debounced")
+class SaveScoresTests(SessionFixture, TestCase):
+    def test_scores_are_inserted_and_updated(self, run_debounced):
+        amina = self.add_student("AMINA", [40])
+        baraka = self.add_student("BARAKA")
+        assignment = self.assignments[0]
+
+        save_scores(assignment, {amina.id: 75, baraka.id: 62.5})
+
+        self.assertEqual(
+            dict(ExamResult.objects.filter(assignment=assignment).values_list("student_id", "score")),
+            {amina.id: 75, baraka.id: 62.5},
+        )
+        assignment.refresh_from_db()
+        self.assertTrue(assignment.is_uploaded)
+
+    def test_one_upsert_however_many_students(self, run_debounced):
+        def count_queries(students):
+            with CaptureQueriesContext(connection) as queries:
+                save_scores(self.assignments[0], {s.id: 50 for s in students})
+            return len(queries)
+
+        students = [self.add_student(f"STUDENT {i}") for i in range(12)]
+        self.assertEqual(count_queries(students[:2]), count_queries(students))
+
+    def test_summaries_and_ranking_follow_the_upload(self, run_debounced):
+        amina = self.add_student("AMINA", [60] * 7)
+        baraka = self.add_student("BARAKA", [50] * 7)
+        self.assertEqual(get_session_ranking(self.session)[amina.id][1], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for assignment in self.assignments:
+                save_scores(assignment, {baraka.id: 90})
+
+        self.assertTrue(StudentSessionSummary.objects.get(student=baraka).dirty)
+        self.assertEqual(get_session_ranking(self.session)[baraka.id][1], 1)
+        self.assertEqual(get_session_summaries(self.session, [baraka.id])[baraka.id].position, 1)
+
+
+# ---------------- Score Sheets ----------------
+def xlsx_sheet(rows, name="scores.xlsx"):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    output = BytesIO()
+    workbook.save(output)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+def csv_sheet(text, name="scores.csv", encoding="utf-8"):
+    return SimpleUploadedFile(name, text.encode(encoding))
+
+
+class ScoreSheetTests(SimpleTestCase):
+    def rows(self, file):
+        return list(iter_score_rows(file, file.name))
+
+    def test_xlsx_reads_only_the_two_columns(self):
+        sheet = xlsx_sheet([
+            ["Name", " Admission Number", "Remarks", "SCORE"],
+            ["Amina", "PAR/2025/001", "ok", 78],
+            ["Baraka", 12, "", 64.5],
+            ["Blank score", "PAR/2025/003", "", None],
+            [None, None, None, None],
+            ["Chausiku", "PAR/2025/004", "", "0"],
+        ])
+        self.assertEqual(self.rows(sheet), [
+            (2, "PAR/2025/001", 78.0), (3, "12", 64.5), (6, "PAR/2025/004", 0.0),
+        ])
+
+    def test_csv(self):
+        sheet = csv_sheet("\ufeffadmission_number,score\nPAR/2025/001,55\n,\nPAR/2025/002, 61 \n")
+        self.assertEqual(self.rows(sheet), [(2, "PAR/2025/001", 55.0), (4, "PAR/2025/002", 61.0)])
+
+    def test_rejected_sheets(self):
+        cases = [
+            (xlsx_sheet([["Name", "Score"], ["Amina", 50]]), "'Admission Number' and 'Score'"),
+            (xlsx_sheet([]), "empty"),
+            (xlsx_sheet([["Admission Number", "Score"], ["PAR/2025/001", "abc"]]), "Row 2: Score is not a number"),
+            (csv_sheet("admission_number,score\nPAR/2025/001,101\n"), "between 0 and 100"),
+            (csv_sheet("admission_number,score\nJosé,50\n", encoding="latin-1"), "UTF-8"),
+            (SimpleUploadedFile("scores.xlsx", b"not a workbook"), "not a valid Excel"),
+            (SimpleUploadedFile("scores.pdf", b"%PDF"), "Excel (.xlsx) or CSV"),
+        ]
+        for sheet, message in cases:
+            with self.assertRaisesMessage(ScoreSheetError, message):
+                self.rows(sheet)
+
+    @override_settings(RESULTS_UPLOAD_MAX_ROWS=3)
+    def test_stops_past_the_row_limit(self):
+        rows = iter_score_rows(csv_sheet("admission_number,score\n" + "PAR/2025/001,50\n" * 10))
+        self.assertEqual(len([next(rows) for _ in range(3)]), 3)
+        with self.assertRaisesMessage(ScoreSheetError, "more than 3 filled rows"):
+            next(rows)
+
+    def test_check_reads_the_header_and_rewinds(self):
+        sheet = csv_sheet("admission_number,score\nPAR/2025/001,50\nPAR/2025/002,oops\n")
+        check_score_sheet(sheet, sheet.name)
+        self.assertEqual(sheet.tell(), 0)
+
+        with self.assertRaises(ScoreSheetError):
+            check_score_sheet(csv_sheet("name,score\n"), "scores.csv")
+
+    @override_settings(RESULTS_UPLOAD_MAX_BYTES=10)
+    def test_check_rejects_large_files(self):
+        with self.assertRaisesMessage(ScoreSheetError, "too large"):
+            check_score_sheet(csv_sheet("admission_number,score\n"), "scores.csv")
+
+
+# ---------------- Background Uploads ----------------
+@mock.patch("results.summaries.run_debounced")
+@mock.patch("results.views.run_after_commit")
+class ScoreUploadTests(SessionFixture, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.assignments[0]
+        self.url = reverse("results:upload_results", args=[self.assignment.upload_token])
+        self.amina = self.add_student("AMINA")
+        self.baraka = self.add_student("BARAKA")
+
+    def sheet(self, amina_score=70):
+        return csv_sheet(
+            "Admission Number,Score\n"
+            f"{self.amina.admission_number.lower()},{amina_score}\n"
+            f"{self.baraka.admission_number},55\n"
+            "PAR/1999/999,40\n"
+        )
+
+    def post(self, sheet):
+        return self.client.post(self.url, {"file": sheet})
+
+    def scores(self):
+        return dict(ExamResult.objects.filter(assignment=self.assignment).values_list("student__full_name", "score"))
+
+    def test_upload_is_stored_then_processed(self, run_after_commit, run_debounced):
+        response = self.post(self.sheet())
+
+        upload = ScoreUpload.objects.get()
+        self.assertRedirects(response, f"{self.url}?upload={upload.pk}", fetch_redirect_response=False)
+        run_after_commit.assert_called_once_with(process_score_upload, upload.pk)
+        self.assertEqual(self.scores(), {})
+
+        process_score_upload(upload.pk)
+        upload.refresh_from_db()
+        self.assertEqual(
+            (upload.status, upload.rows_parsed, upload.matched, upload.missing, upload.written, upload.missing_numbers),
+            ("done", 3, 2, 1, 2, ["PAR/1999/999"]),
+        )
+        self.assertEqual(bytes(upload.content), b"")
+        self.assertEqual(self.scores(), {"AMINA": 70, "BARAKA": 55})
+
+        status = self.client.get(reverse("results:upload_status", args=[self.assignment.upload_token, upload.pk])).json()
+        self.assertTrue(status["finished"])
+        self.assertIn("2 results uploaded", status["message"])
+
+    def test_bad_header_is_rejected_before_storing(self, run_after_commit, run_debounced):
+        response = self.post(csv_sheet("Name,Score\nAmina,50\n"))
+
+        self.assertContains(response, "Admission Number")
+        self.assertFalse(ScoreUpload.objects.exists())
+        run_after_commit.assert_not_called()
+
+    def test_same_file_in_flight_is_reused(self, run_after_commit, run_debounced):
+        self.post(self.sheet())
+        self.post(self.sheet())
+        self.assertEqual(ScoreUpload.objects.count(), 1)
+        run_after_commit.assert_called_once()
+
+    def test_same_file_after_it_finished_is_a_new_upload(self, run_after_commit, run_debounced):
+        # A, then B, then A again: the last upload wins
+        for amina_score in (70, 11, 70):
+            self.post(self.sheet(amina_score))
+            process_score_upload(ScoreUpload.objects.latest("pk").pk)
+
+        self.assertEqual(ScoreUpload.objects.filter(status="done").count(), 3)
+        self.assertEqual(self.scores()["AMINA"], 70)
+
+    def test_stale_upload_is_started_again(self, run_after_commit, run_debounced):
+        self.post(self.sheet())
+        upload = ScoreUpload.objects.get()
+        long_ago = timezone.now() - datetime.timedelta(seconds=settings.RESULTS_UPLOAD_STALE_AFTER + 1)
+        ScoreUpload.objects.update(status="processing", started_at=long_ago)
+
+        self.client.get(reverse("results:upload_status", args=[self.assignment.upload_token, upload.pk]))
+        self.assertEqual(run_after_commit.call_count, 2)
+
+        process_score_upload(upload.pk)
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, "done")
+
+    def test_live_upload_is_not_claimed_twice(self, run_after_commit, run_debounced):
+        self.post(self.sheet())
+        ScoreUpload.objects.update(status="processing", started_at=timezone.now())
+
+        process_score_upload(ScoreUpload.objects.get().pk)
+        self.assertEqual(ScoreUpload.objects.get().status, "processing")
+        self.assertEqual(self.scores(), {})
+
+    def test_locked_session_fails_the_upload(self, run_after_commit, run_debounced):
+        self.post(self.sheet())
+        ExamSession.objects.update(is_locked=True)
+
+        process_score_upload(ScoreUpload.objects.get().pk)
+        upload = ScoreUpload.objects.get()
+        self.assertEqual((upload.status, upload.error), ("failed", "This exam session is locked. Uploads disabled."))
+
+    def test_retry_command(self, run_after_commit, run_debounced):
+        content = self.sheet().read()
+        sha256 = hashlib.sha256(content).hexdigest()
+        failed = ScoreUpload.objects.create(
+            assignment=self.assignment, filename="scores.csv", content=content, sha256=sha256, status="failed",
+        )
+        live = ScoreUpload.objects.create(
+            assignment=self.assignments[1], filename="scores.csv", content=content, sha256=sha256,
+            status="processing", started_at=timezone.now(),
+        )
+
+        call_command("process_score_uploads", "--retry", stdout=StringIO())
+        failed.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(failed.status, "done")
+        self.assertEqual(live.status, "processing")
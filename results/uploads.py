@@ -0,0 +1,244 @@
+"""
+Score sheet parsing for teacher uploads.
+
+Sheets are read row by row: XLSX through openpyxl in read-only mode (only
+the two needed columns are materialized), CSV through the csv module. The
+header row is checked before any data row is read, and parsing stops at
+the first invalid row or once more than RESULTS_UPLOAD_MAX_ROWS filled
+rows are found, so a wrong or oversized file is rejected without being loaded.
+
+check_score_sheet runs the size and header checks while the teacher waits;
+sheets that pass are stored as ScoreUpload rows and processed by
+process_score_upload on the background pool; the counters on the row are
+what the teacher's upload page polls.
+"""
+
+import csv
+import io
+import logging
+import zipfile
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from students.utils import resolve_admission_numbers
+from .models import ExamResult, ScoreUpload
+from .ranking import invalidate_session_ranking
+from .summaries import mark_dirty
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ("admission_number", "score")
+ALLOWED_EXTENSIONS = ("xlsx", "xlsm", "csv")
+
+# Rows between progress updates while a stored upload is parsed
+PROGRESS_EVERY = 200
+# Missing admission numbers kept on the upload for the teacher
+MISSING_NUMBERS_SHOWN = 20
+
+
+class ScoreSheetError(Exception):
+    """The uploaded sheet cannot be used; the message is shown to the teacher."""
+
+
+def normalize_header(value):
+    """'Admission Number ' -> 'admission_number'"""
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+# ---------------- Row Readers ----------------
+def _column_indexes(header):
+    headers = [normalize_header(h) for h in header]
+    for column in REQUIRED_COLUMNS:
+        if column not in headers:
+            raise ScoreSheetError("Sheet must have 'Admission Number' and 'Score' columns.")
+    return [headers.index(column) for column in REQUIRED_COLUMNS]
+
+
+def _xlsx_rows(file):
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError):
+        raise ScoreSheetError("File is not a valid Excel (.xlsx) workbook.")
+
+    try:
+        sheet = workbook.worksheets[0]
+        header = next(sheet.iter_rows(max_row=1, values_only=True), None)
+        if not header:
+            raise ScoreSheetError("Sheet is empty.")
+
+        indexes = _column_indexes(header)
+        first, last = min(indexes), max(indexes)
+        # Only the cells between the two needed columns are read
+        for row in sheet.iter_rows(min_row=2, min_col=first + 1, max_col=last + 1, values_only=True):
+            yield tuple(row[i - first] if i - first < len(row) else None for i in indexes)
+    finally:
+        workbook.close()
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if not header:
+            raise ScoreSheetError("Sheet is empty.")
+
+        indexes = _column_indexes(header)
+        for row in reader:
+            yield tuple(row[i] if i < len(row) else None for i in indexes)
+    except UnicodeDecodeError:
+        raise ScoreSheetError("CSV file must be saved as UTF-8 text.")
+    except csv.Error as e:
+        raise ScoreSheetError(f"CSV file could not be read: {e}")
+    finally:
+        # Leave the uploaded file open for the caller
+        text.detach()
+
+
+# ---------------- Values ----------------
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_admission_number(value):
+    # Numeric cells come back as 123 or 123.0
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def parse_score(value, line):
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        raise ScoreSheetError(f"Row {line}: Score is not a number ({value}).")
+    if not 0 <= score <= 100:
+        raise ScoreSheetError(f"Row {line}: Score must be between 0 and 100 (found {value}).")
+    return score
+
+
+# ---------------- Parser ----------------
+def iter_score_rows(file, filename=""):
+    """
+    Yield (row number, admission number, score) for every filled row.
+    Rows missing the admission number or the score are skipped.
+    Raises ScoreSheetError on a bad header, an invalid score or too many rows.
+    """
+    extension = (filename or getattr(file, "name", "") or "").rsplit(".", 1)[-1].lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise ScoreSheetError("Upload an Excel (.xlsx) or CSV (.csv) file.")
+
+    rows = _csv_rows(file) if extension == "csv" else _xlsx_rows(file)
+    max_rows = settings.RESULTS_UPLOAD_MAX_ROWS
+
+    filled = 0
+    try:
+        for line, (admission_number, score) in enumerate(rows, start=2):
+            if _blank(admission_number) or _blank(score):
+                continue
+            filled += 1
+            if filled > max_rows:
+                raise ScoreSheetError(f"Sheet has more than {max_rows} filled rows.")
+            yield line, parse_admission_number(admission_number), parse_score(score, line)
+    finally:
+        # Closes the workbook / detaches the CSV reader even when stopped early
+        rows.close()
+
+
+def check_score_sheet(file, filename=""):
+    """
+    Checks run before an upload is stored: file type, size, header and the
+    first filled row. Raises ScoreSheetError; leaves the file at its start.
+    """
+    max_bytes = settings.RESULTS_UPLOAD_MAX_BYTES
+    if getattr(file, "size", 0) > max_bytes:
+        raise ScoreSheetError(f"File is too large (limit {max_bytes // (1024 * 1024)} MB).")
+
+    rows = iter_score_rows(file, filename)
+    try:
+        next(rows, None)
+    finally:
+        rows.close()
+        file.seek(0)
+
+
+# ---------------- Writing ----------------
+def save_scores(assignment, scores):
+    """
+    Upsert the scores of one subject in a single statement.
+    scores: {student_id: score}
+    bulk_create skips the ExamResult signals, so the ranking and summaries
+    of the session are refreshed here.
+    """
+    exam_session_id = assignment.exam_session_id
+    with transaction.atomic():
+        ExamResult.objects.bulk_create(
+            [ExamResult(student_id=pk, assignment=assignment, score=score) for pk, score in scores.items()],
+            update_conflicts=True,
+            unique_fields=["student", "assignment"],
+            update_fields=["score"],
+            batch_size=500,
+        )
+        assignment.is_uploaded = True
+        assignment.save(update_fields=["is_uploaded"])
+        mark_dirty(exam_session_id, scores)
+        transaction.on_commit(lambda: invalidate_session_ranking([exam_session_id]))
+
+
+# ---------------- Background Job ----------------
+def process_score_upload(upload_id):
+    """
+    Parse, match and write one stored upload, recording progress on the
+    row. Only runs for uploads still 'pending' (or stuck in 'processing'
+    past RESULTS_UPLOAD_STALE_AFTER), so scheduling it twice is harmless.
+    """
+    claimed = ScoreUpload.objects.filter(ScoreUpload.claimable(), pk=upload_id).update(
+        status="processing", started_at=timezone.now()
+    )
+    if not claimed:
+        return
+
+    upload = ScoreUpload.objects.select_related("assignment__exam_session").get(pk=upload_id)
+    progress = ScoreUpload.objects.filter(pk=upload_id)
+    result = {"status": "failed", "finished_at": timezone.now()}
+    try:
+        if upload.assignment.exam_session.is_locked:
+            raise ScoreSheetError("This exam session is locked. Uploads disabled.")
+
+        # --- Parse ---
+        sheet_scores, rows = {}, 0
+        for _, admission_number, score in iter_score_rows(io.BytesIO(bytes(upload.content)), upload.filename):
+            sheet_scores[admission_number] = score  # the last row of a student wins
+            rows += 1
+            if rows % PROGRESS_EVERY == 0:
+                progress.update(rows_parsed=rows)
+
+        # --- Match (one query, tolerant of case / separators / leading zeros) ---
+        students = resolve_admission_numbers(sheet_scores)
+        missing = [n for n in sheet_scores if n not in students]
+        progress.update(
+            rows_parsed=rows,
+            matched=len(set(students.values())),
+            missing=len(missing),
+            missing_numbers=missing[:MISSING_NUMBERS_SHOWN],
+        )
+
+        # --- Write ---
+        scores = {students[n]: score for n, score in sheet_scores.items() if n in students}
+        save_scores(upload.assignment, scores)
+        result.update(status="done", written=len(scores), content=b"", finished_at=timezone.now())
+        logger.info(f"{upload.filename}: {len(scores)} results written for {upload.assignment}")
+
+    except ScoreSheetError as e:
+        result["error"] = str(e)
+
+    except Exception as e:
+        logger.error(f"Score upload {upload_id} failed: {e}", exc_info=True)
+        result["error"] = f"Error processing file: {e}"
+
+    finally:
+        progress.update(**result)
@@ -5,4 +5,5 @@ app_name = "results"
 
 urlpatterns = [
     path("upload/<uuid:token>/", views.upload_results_view, name="upload_results"),
+    path("upload/<uuid:token>/status/<int:upload_id>/", views.upload_status_view, name="upload_status"),
 ]
@@ -1,122 +1,29 @@
 # utils.py
+# Kept for older imports; the grading rules live in results/grading.py
 
-def get_grade_and_remark(score):
+from .grading import NECTA_SCALE
+
+
+def get_grade_and_remark(score, scale=NECTA_SCALE):
     """
-    NECTA official grading scale:
-    A: 75–100 → Excellent
-    B: 60–74  → Very Good
-    C: 50–59  → Good
-    D: 40–49  → Pass
-    E: 0–39   → Fail
+    (grade, remark) of a score, e.g. ("A", "Excellent").
+    ("", "") for a missing or invalid score.
     """
-    try:
-        score = float(score)
-    except (TypeError, ValueError):
+    if scale.grade_index(score) is None:
         return "", ""
-
-    if score >= 75:
-        return "A", "Excellent"
-    elif score >= 60:
-        return "B", "Very Good"
-    elif score >= 50:
-        return "C", "Good"
-    elif score >= 40:
-        return "D", "Pass"
-    else:
-        return "E", "Fail"
+    return scale.grade(score), scale.remark(score)
 
 
-def score_to_necta_point(score):
+def score_to_necta_point(score, scale=NECTA_SCALE):
     """
     NECTA points (LOWER IS BETTER)
-    A=1, B=2, C=3, D=4, E/F=5
+    A=1, B=2, C=3, D=4, F=5
     """
-    if score is None:
-        return None
-    if score >= 75:
-        return 1
-    elif score >= 60:
-        return 2
-    elif score >= 50:
-        return 3
-    elif score >= 40:
-        return 4
-    else:
-        return 5
+    return scale.points(score)
 
 
-def get_division_from_total_points(total_points):
+def get_division_from_total_points(total_points, scale=NECTA_SCALE):
     """
-    NECTA Division from best 7 subjects
+    NECTA Division from best 7 subjects, e.g. ("I", "Excellent")
     """
-    if 7 <= total_points <= 17:
-        return "I", "Excellent"
-    elif 18 <= total_points <= 21:
-        return "II", "Very Good"
-    elif 22 <= total_points <= 25:
-        return "III", "Good"
-    elif 26 <= total_points <= 33:
-        return "IV", "Pass"
-    else:
-        return "0", "Fail"
-
-# # utils.py
-
-# def get_grade_and_remark(score):
-#     """
-#     NECTA official grading scale (adjusted):
-#     A: 75–100 → Excellent
-#     B: 60–74  → Very Good
-#     C: 50–59  → Good
-#     D: 40–49  → Pass
-#     E: 0–39   → Fail
-#     """
-#     try:
-#         score = float(score)
-#     except (TypeError, ValueError):
-#         return "", ""  # empty for invalid scores
-
-#     if score >= 75:
-#         return "A", "Excellent"
-#     elif score >= 60:
-#         return "B", "Very Good"
-#     elif score >= 50:
-#         return "C", "Good"
-#     elif score >= 40:
-#         return "D", "Pass"
-#     else:
-#         return "E", "Fail"
-
-
-# def score_to_necta_point(score):
-#     """
-#     Convert numeric score to NECTA point (lower is better)
-#     A=1, B=2, C=3, D=4, E/F=5
-#     """
-#     if score >= 75:
-#         return 1
-#     elif score >= 60:
-#         return 2
-#     elif score >= 50:
-#         return 3
-#     elif score >= 40:
-#         return 4
-#     else:
-#         return 5
-
-
-# def get_division_from_total_points(total_points):
-#     """
-#     Determine NECTA Division from total grade points (best 7 subjects)
-#     """
-#     if 7 <= total_points <= 17:
-#         return "I", "Excellent"
-#     elif 18 <= total_points <= 21:
-#         return "II", "Very Good"
-#     elif 22 <= total_points <= 25:
-#         return "III", "Good/Satisfactory"
-#     elif 26 <= total_points <= 33:
-#         return "IV", "Pass"
-#     else:
-#         return "0", "Fail"
-
+    return scale.division(total_points), scale.division_remark(total_points)
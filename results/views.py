@@ -1,14 +1,33 @@
-from django.shortcuts import render, get_object_or_404
-from .models import SubjectAssignment, ExamResult
-from students.models import Student
+from django.shortcuts import render, get_object_or_404, redirect
+from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from core.background import run_after_commit
+from .models import SubjectAssignment, ScoreUpload
+from .uploads import process_score_upload, check_score_sheet, ScoreSheetError
 from datetime import date
-import pandas as pd
+import hashlib
+
+
+def upload_feedback(upload):
+    """Template feedback for a finished upload, None while it is still running."""
+    if upload.status == "failed":
+        return {"type": "error", "message": upload.error}
+    if upload.status != "done":
+        return None
+
+    message = f"✅ {upload.written} results uploaded successfully!"
+    if upload.missing:
+        message += f" ⚠️ {upload.missing} student(s) not found: {', '.join(upload.missing_numbers[:5])}"
+        if upload.missing > 5:
+            message += " ..."
+    return {"type": "success", "message": message}
 
 
 def upload_results_view(request, token):
     assignment = get_object_or_404(SubjectAssignment, upload_token=token)
     exam_session = assignment.exam_session
     feedback = None  # message for the template
+    upload = None
 
     # --- Step 1: Check if uploads are allowed ---
     if exam_session.is_locked:
@@ -16,70 +35,71 @@ def upload_results_view(request, token):
     elif date.today() > assignment.upload_deadline:
         feedback = {"type": "error", "message": "Upload closed. Deadline passed."}
 
-    # --- Step 2: Handle Excel upload ---
+    # --- Step 2: Store the Excel / CSV upload, processed in the background ---
     if request.method == "POST" and not feedback:
         file = request.FILES.get("file")
 
-        try:
-            # --- Read Excel file ---
-            df = pd.read_excel(file)
-
-            # --- Normalize headers (case-insensitive, trim, and underscores) ---
-            df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-
-            print("DEBUG: Excel Columns →", list(df.columns))  # <-- useful for debugging
-
-            # --- Check required columns ---
-            if "admission_number" not in df.columns or "score" not in df.columns:
-                feedback = {
-                    "type": "error",
-                    "message": "Excel must have 'Admission Number' and 'Score' columns."
-                }
+        if not file:
+            feedback = {"type": "error", "message": "Choose an Excel or CSV file to upload."}
+        else:
+            # Type, size and header are checked before anything is stored
+            try:
+                check_score_sheet(file, file.name)
+            except ScoreSheetError as e:
+                feedback = {"type": "error", "message": str(e)}
             else:
-                count_uploaded = 0
-                missing_students = []
-
-                # --- Process each student record ---
-                for _, row in df.iterrows():
-                    admission_number = str(row["admission_number"]).strip()
-                    score = row["score"]
-
-                    if pd.isna(admission_number) or pd.isna(score):
-                        continue  # skip blank rows
-
-                    # --- Find the student by admission number ---
-                    student = Student.objects.filter(admission_number=admission_number).first()
-                    if not student:
-                        missing_students.append(admission_number)
-                        continue
-
-                    # --- Save or update score ---
-                    ExamResult.objects.update_or_create(
-                        student=student,
-                        assignment=assignment,
-                        defaults={"score": score},
-                    )
-                    count_uploaded += 1
-
-                # --- Mark assignment as uploaded ---
-                assignment.is_uploaded = True
-                assignment.save()
-
-                # --- Build success message ---
-                message = f"✅ {count_uploaded} results uploaded successfully!"
-                if missing_students:
-                    message += f" ⚠️ {len(missing_students)} student(s) not found: {', '.join(missing_students[:5])}"
-                    if len(missing_students) > 5:
-                        message += " ..."
-
-                feedback = {"type": "success", "message": message}
-
-        except Exception as e:
-            feedback = {"type": "error", "message": f"Error processing file: {str(e)}"}
-
-    # --- Step 3: Render Template ---
+                content = file.read()
+                sha256 = hashlib.sha256(content).hexdigest()
+                # The same file sent again while it is still being processed (double
+                # submit, retry on a slow line) reuses that upload; a finished one does not
+                in_flight = assignment.uploads.filter(sha256=sha256, status__in=ScoreUpload.IN_FLIGHT)
+                upload = in_flight.first()
+                if upload is None:
+                    try:
+                        with transaction.atomic():
+                            upload = ScoreUpload.objects.create(
+                                assignment=assignment, sha256=sha256, filename=file.name, content=content,
+                            )
+                        run_after_commit(process_score_upload, upload.pk)
+                    except IntegrityError:
+                        # A concurrent post of the same file created it first
+                        upload = in_flight.first()
+                elif upload.is_stale:
+                    run_after_commit(process_score_upload, upload.pk)  # its worker died; claim it again
+
+                if upload is None:
+                    return redirect(request.path)
+
+                # --- Redirect so a page refresh does not post the file again ---
+                return redirect(f"{request.path}?upload={upload.pk}")
+
+    # --- Step 3: Progress of a stored upload ---
+    if request.GET.get("upload", "").isdigit():
+        upload = assignment.uploads.filter(pk=request.GET["upload"]).first()
+        if upload:
+            feedback = upload_feedback(upload) or feedback
+
+    # --- Step 4: Render Template ---
     return render(
         request,
         "results/upload_form.html",
-        {"assignment": assignment, "feedback": feedback}
+        {"assignment": assignment, "feedback": feedback, "upload": upload}
     )
+
+
+def upload_status_view(request, token, upload_id):
+    """Progress counters polled by the upload page."""
+    upload = get_object_or_404(ScoreUpload, pk=upload_id, assignment__upload_token=token)
+    if upload.is_stale:
+        # The worker died mid-way: start it again instead of polling forever
+        run_after_commit(process_score_upload, upload.pk)
+    feedback = upload_feedback(upload)
+    return JsonResponse({
+        "status": upload.status,
+        "rows_parsed": upload.rows_parsed,
+        "matched": upload.matched,
+        "missing": upload.missing,
+        "written": upload.written,
+        "finished": feedback is not None,
+        "message": feedback["message"] if feedback else "",
+    })
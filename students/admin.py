@@ -18,7 +18,7 @@ from reportlab.lib.enums import TA_LEFT
 
 from PIL import Image as PILImage, ImageDraw
 
-from .models import Student
+from .models import Student, AdmissionSequence
 
 
 # ====================== EXPORT ACTIONS ======================
@@ -470,3 +470,9 @@ class StudentAdmin(admin.ModelAdmin):
     ]
     actions_on_top = True
     actions_on_bottom = False
+
+
+@admin.register(AdmissionSequence)
+class AdmissionSequenceAdmin(admin.ModelAdmin):
+    list_display = ("year", "last")
+    ordering = ("-year",)
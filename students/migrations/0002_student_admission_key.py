@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:04
+
+import re
+
+from django.db import migrations, models
+
+
+def normalize_admission_number(value):
+    # Copy of students.models.normalize_admission_number as of this migration
+    parts = re.findall(r"[A-Z0-9]+", str(value or "").upper())
+    return "-".join(str(int(p)) if p.isdigit() else p for p in parts)
+
+
+def fill_admission_keys(apps, schema_editor):
+    Student = apps.get_model("students", "Student")
+    batch = []
+    for student in Student.objects.only("id", "admission_number").iterator(chunk_size=1000):
+        student.admission_key = normalize_admission_number(student.admission_number)
+        batch.append(student)
+        if len(batch) >= 1000:
+            Student.objects.bulk_update(batch, ["admission_key"])
+            batch = []
+    Student.objects.bulk_update(batch, ["admission_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='admission_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40),
+        ),
+        migrations.RunPython(fill_admission_keys, migrations.RunPython.noop),
+    ]
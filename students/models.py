@@ -1,6 +1,91 @@
-from django.db import models
+import re
+
+from django.db import models, transaction
 from django.utils import timezone
 
+
+def normalize_admission_number(value):
+    """
+    Lookup key of an admission number: case, whitespace, separators and
+    leading zeros are ignored, e.g. "PAR/2025/001" and " par-2025-1" -> "PAR-2025-1".
+    """
+    parts = re.findall(r"[A-Z0-9]+", str(value or "").upper())
+    return "-".join(str(int(p)) if p.isdigit() else p for p in parts)
+
+
+def format_admission_number(year, number):
+    return f"PAR/{year}/{number:03d}"
+
+
+def split_admission_number(value):
+    """(year, number) of a PAR/<year>/<n> admission number, None for any other format."""
+    parts = normalize_admission_number(value).split("-")
+    if len(parts) == 3 and parts[0] == "PAR" and parts[1].isdigit() and parts[2].isdigit():
+        return int(parts[1]), int(parts[2])
+    return None
+
+
+class AdmissionSequence(models.Model):
+    """Last admission number handed out for each year (see reserve_admission_numbers)."""
+    year = models.PositiveIntegerField(unique=True)
+    last = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.year}: {self.last}"
+
+    @staticmethod
+    def highest_issued(year):
+        """Highest number already used in a PAR/<year>/<n> admission number, 0 if none."""
+        prefix = normalize_admission_number(format_admission_number(year, 0))[:-1]  # "PAR-2025-"
+        highest = 0
+        for key in Student.objects.filter(admission_key__startswith=prefix).values_list("admission_key", flat=True):
+            number = key[len(prefix):]
+            if number.isdigit():
+                highest = max(highest, int(number))
+        return highest
+
+    @classmethod
+    def reserve(cls, year, count=1):
+        """
+        Reserve `count` consecutive numbers of a year and return them as a range.
+        The year's counter row is locked (SELECT ... FOR UPDATE) until the
+        surrounding transaction ends, so concurrent callers get distinct blocks.
+        The first reservation of a year starts after the numbers already issued.
+        """
+        with transaction.atomic():
+            # Callable default: issued numbers are only scanned when the year's row is created
+            sequence, _ = cls.objects.select_for_update().get_or_create(
+                year=year, defaults={"last": lambda: cls.highest_issued(year)}
+            )
+            first = sequence.last + 1
+            sequence.last += count
+            sequence.save(update_fields=["last"])
+        return range(first, first + count)
+
+    @classmethod
+    def advance(cls, year, number):
+        """
+        Move the year's counter to at least `number`, for admission numbers
+        assigned outside reserve() (e.g. supplied by an import file).
+        """
+        with transaction.atomic():
+            sequence, _ = cls.objects.select_for_update().get_or_create(
+                year=year, defaults={"last": lambda: cls.highest_issued(year)}
+            )
+            if sequence.last < number:
+                sequence.last = number
+                sequence.save(update_fields=["last"])
+
+
+def reserve_admission_numbers(count=1, year=None):
+    """
+    `count` new admission numbers, e.g. ["PAR/2025/041", "PAR/2025/042"],
+    for filling Student objects before a bulk_create.
+    """
+    year = year or timezone.now().year
+    return [format_admission_number(year, n) for n in AdmissionSequence.reserve(year, count)]
+
+
 class Student(models.Model):
     GENDER_CHOICES = [
         ('M', 'Male'),
@@ -14,6 +99,8 @@ class Student(models.Model):
     ]
 
     admission_number = models.CharField(max_length=20, unique=True, blank=True)
+    # normalize_admission_number(admission_number), see students.utils.resolve_admission_numbers
+    admission_key = models.CharField(max_length=40, blank=True, db_index=True, editable=False)
     necta_number = models.CharField(
         max_length=20, blank=True, null=True,
         help_text="Required for Form II, Form III, and Form IV only"
@@ -37,12 +124,20 @@ class Student(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Class placement as loaded, so saves can tell when a student changed class (see results.signals)
+        loaded = dict(zip(field_names, values))
+        instance._loaded_placement = tuple(loaded.get(f) for f in ("form", "stream", "status"))
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.admission_number:
-            current_year = timezone.now().year
-            count = Student.objects.filter(created_at__year=current_year).count() + 1
-            self.admission_number = f"PAR/{current_year}/{count:03d}"
+            self.admission_number = reserve_admission_numbers()[0]
+        self.admission_key = normalize_admission_number(self.admission_number)
         super().save(*args, **kwargs)
+        self._loaded_placement = (self.form, self.stream, self.status)
 
     def __str__(self):
         return f"{self.full_name} ({self.admission_number})"
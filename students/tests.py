@@ -1,3 +1,212 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import AdmissionSequence, Student, normalize_admission_number, reserve_admission_numbers, split_admission_number
+from .utils import resolve_admission_numbers
+
+
+def add_student(name, admission_number="", **fields):
+    values = {
+        "gender": "F", "dob": datetime.date(2010, 1, 1), "form": 1, "stream": "A",
+        "parent_name": "Mzazi", "parent_contact": "0710000001",
+    }
+    return Student.objects.create(full_name=name, admission_number=admission_number, **{**values, **fields})
+
+
+# ---------------- Admission Number Lookup ----------------
+class NormalizeAdmissionNumberTests(SimpleTestCase):
+    def test_case_separators_and_leading_zeros_are_ignored(self):
+        for value in ["PAR/2025/001", " par-2025-1 ", "Par 2025 0001", "par.2025.01"]:
+            self.assertEqual(normalize_admission_number(value), "PAR-2025-1")
+
+    def test_empty(self):
+        self.assertEqual(normalize_admission_number(None), "")
+        self.assertEqual(normalize_admission_number(" / "), "")
+
+
+class ResolveAdmissionNumbersTests(TestCase):
+    def test_sheet_values_match_in_one_query(self):
+        amina = add_student("AMINA", "PAR/2025/001")
+        baraka = add_student("BARAKA", "S.1234")
+
+        with self.assertNumQueries(1):
+            resolved = resolve_admission_numbers(["par/2025/1", "PAR-2025-001", "s 1234", "PAR/2025/999", ""])
+        self.assertEqual(resolved, {"par/2025/1": amina.id, "PAR-2025-001": amina.id, "s 1234": baraka.id})
+
+    def test_ambiguous_key_needs_an_exact_match(self):
+        first = add_student("FIRST", "PAR/2025/001")
+        add_student("SECOND", "PAR/2025/1")
+
+        self.assertEqual(resolve_admission_numbers(["PAR/2025/001", "par-2025-1"]), {"PAR/2025/001": first.id})
+
+    def test_key_follows_the_admission_number(self):
+        student = add_student("AMINA", "par/2025/007")
+        student.admission_number = "PAR/2025/008"
+        student.save()
+
+        self.assertEqual(Student.objects.get().admission_key, "PAR-2025-8")
+
+
+# ---------------- Admission Sequence ----------------
+class AdmissionSequenceTests(TestCase):
+    def test_new_students_get_consecutive_numbers(self):
+        year = timezone.now().year
+        numbers = [add_student(f"STUDENT {i}").admission_number for i in range(3)]
+        self.assertEqual(numbers, [f"PAR/{year}/001", f"PAR/{year}/002", f"PAR/{year}/003"])
+
+    def test_later_numbers_only_touch_the_counter_row(self):
+        add_student("FIRST")
+        with CaptureQueriesContext(connection) as queries:
+            reserve_admission_numbers(5)
+
+        statements = [q["sql"].split()[0] for q in queries if "students_" in q["sql"]]
+        self.assertEqual(statements, ["SELECT", "UPDATE"])
+        self.assertFalse(any("students_student" in q["sql"] for q in queries))
+
+    def test_counter_starts_after_numbers_already_issued(self):
+        add_student("OLD", "PAR/2024/041")
+        add_student("OLDER", "par-2024-7")
+        add_student("OTHER FORMAT", "S.9999")
+
+        self.assertEqual(reserve_admission_numbers(2, year=2024), ["PAR/2024/042", "PAR/2024/043"])
+        self.assertEqual(reserve_admission_numbers(1, year=2023), ["PAR/2023/001"])
+
+    def test_blocks_do_not_overlap(self):
+        first = AdmissionSequence.reserve(2025, 3)
+        second = AdmissionSequence.reserve(2025, 2)
+        self.assertEqual((list(first), list(second)), ([1, 2, 3], [4, 5]))
+
+    def test_advance_only_moves_forward(self):
+        AdmissionSequence.reserve(2025, 5)
+        AdmissionSequence.advance(2025, 3)
+        self.assertEqual(AdmissionSequence.objects.get(year=2025).last, 5)
+
+        AdmissionSequence.advance(2025, 40)
+        self.assertEqual(reserve_admission_numbers(1, year=2025), ["PAR/2025/041"])
+
+    def test_numbers_past_999_keep_counting(self):
+        AdmissionSequence.objects.create(year=2025, last=999)
+        self.assertEqual(reserve_admission_numbers(1, year=2025), ["PAR/2025/1000"])
+
+    def test_split(self):
+        self.assertEqual(split_admission_number("par/2025/007"), (2025, 7))
+        self.assertIsNone(split_admission_number("S.1234"))
+
+
+# ---------------- Bulk Import ----------------
+class ImportStudentsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.year = timezone.now().year
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        out = StringIO()
+        call_command("import_students", path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_csv_with_aliases_and_defaults(self):
+        path = self.write("students.csv", (
+            "Student Name,Sex,Date of Birth,Parent Phone,Parent Name\n"
+            "amina  juma,female,2010-03-01,0710000001,Juma\n"
+            "Baraka Ally,M,2011-07-15,0710000002,Ally\n"
+        ))
+        out = self.run_import(path, "--form", "1", "--stream", "B")
+
+        self.assertIn("2 student(s) imported", out)
+        students = list(Student.objects.order_by("pk").values_list("full_name", "gender", "form", "stream", "admission_number"))
+        self.assertEqual(students, [
+            ("amina juma", "F", 1, "B", f"PAR/{self.year}/001"),
+            ("Baraka Ally", "M", 1, "B", f"PAR/{self.year}/002"),
+        ])
+
+    def test_invalid_rows_import_nothing(self):
+        path = self.write("students.csv", (
+            "full_name,gender,dob,form,stream,parent_name,parent_contact\n"
+            "Amina Juma,F,2010-03-01,1,A,Juma,0710000001\n"
+            "No Birthday,F,,1,A,Juma,0710000002\n"
+            "Bad Date,F,01/03/2010,1,A,Juma,0710000003\n"
+        ))
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "2 invalid row(s), nothing imported."):
+            call_command("import_students", path, stdout=out)
+
+        self.assertIn("Row 3: missing dob", out.getvalue())
+        self.assertIn("Row 4: dob", out.getvalue())
+        self.assertFalse(Student.objects.exists())
+
+    def test_duplicates_are_skipped(self):
+        add_student("AMINA JUMA", dob=datetime.date(2010, 3, 1))
+        path = self.write("students.json", json.dumps([
+            {"full_name": "Amina Juma", "dob": "2010-03-01"},
+            {"full_name": "Baraka Ally", "dob": "2011-07-15"},
+            {"full_name": "BARAKA ALLY", "dob": "2011-07-15"},
+        ]))
+        out = self.run_import(path, "--form", "2", "--stream", "A", "--gender", "M")
+
+        self.assertIn("1 student(s) imported, 2 duplicate(s) skipped", out)
+        self.assertEqual(Student.objects.count(), 2)
+
+    def test_supplied_admission_numbers_move_the_counter(self):
+        path = self.write("students.csv", (
+            "full_name,dob,admission_number\n"
+            f"Amina Juma,2010-03-01,PAR/{self.year}/010\n"
+            "Baraka Ally,2011-07-15,\n"
+        ))
+        self.run_import(path, "--form", "1", "--stream", "A", "--gender", "F")
+
+        self.assertEqual(
+            set(Student.objects.values_list("admission_number", flat=True)),
+            {f"PAR/{self.year}/010", f"PAR/{self.year}/011"},
+        )
+        self.assertEqual(add_student("NEXT").admission_number, f"PAR/{self.year}/012")
+
+    def test_admission_number_clash_imports_nothing(self):
+        add_student("AMINA JUMA", "PAR/2020/005")
+        path = self.write("students.csv", "full_name,dob,admission_number\nBaraka Ally,2011-07-15,par-2020-5\n")
+
+        with self.assertRaisesMessage(CommandError, "already in use: par-2020-5"):
+            self.run_import(path, "--form", "1", "--stream", "A", "--gender", "M")
+        self.assertEqual(Student.objects.count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write("students.csv", "full_name,dob\nAmina Juma,2010-03-01\n")
+        out = self.run_import(path, "--form", "1", "--stream", "A", "--gender", "F", "--dry-run")
+
+        self.assertIn("1 student(s) would be imported", out)
+        self.assertFalse(Student.objects.exists())
+        self.assertFalse(AdmissionSequence.objects.exists())
+
+    def test_xlsx_in_batches(self):
+        workbook = Workbook()
+        workbook.active.append(["Full Name", "Gender", "DOB", "Form", "Stream", "Parent Name", "Parent Contact"])
+        for i in range(25):
+            workbook.active.append([f"Student {i}", "F", datetime.datetime(2010, 1, 1), 2.0, "A", "Mzazi", 255710000000.0 + i])
+        path = os.path.join(self.directory, "students.xlsx")
+        workbook.save(path)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.run_import(path, "--batch-size", "10")
+
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "students_student"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(Student.objects.filter(form=2, parent_contact="255710000024").count(), 1)
+        self.assertEqual(Student.objects.values("admission_number").distinct().count(), 25)
@@ -0,0 +1,32 @@
+from .models import Student, normalize_admission_number
+
+
+def resolve_admission_numbers(values):
+    """
+    Map raw admission numbers (as typed in sheets and imports) to Student
+    ids with one query on the normalized admission_key.
+    Returns {raw value: student id}; values matching no student are left
+    out. When several students share a key only an exact match is used.
+    """
+    raw_by_key = {}
+    for value in values:
+        key = normalize_admission_number(value)
+        if key:
+            raw_by_key.setdefault(key, []).append(value)
+
+    candidates = {}
+    rows = Student.objects.filter(admission_key__in=raw_by_key).values_list("admission_key", "id", "admission_number")
+    for key, pk, admission_number in rows:
+        candidates.setdefault(key, []).append((pk, admission_number))
+
+    resolved = {}
+    for key, raw_values in raw_by_key.items():
+        matches = candidates.get(key, [])
+        for value in raw_values:
+            if len(matches) == 1:
+                resolved[value] = matches[0][0]
+                continue
+            exact = [pk for pk, admission_number in matches if admission_number == str(value).strip()]
+            if len(exact) == 1:
+                resolved[value] = exact[0]
+    return resolved